@@ -2,6 +2,14 @@ from flask import Flask
 
 from .extentions import db, migrate, bcrypt
 from .models import User, Book, Borrowing, Activity, Favorite
+from .search_index import catalog_index
+from .auth import principal_cache
+from .passwords import password_hasher
+from .rate_limit import rate_limiter
+from .activity_sink import activity_sink
+from .overdue_sweeper import overdue_sweeper
+from .purger import purger
+from .cache import cache
 
 from .routes.borrowings_routes import borrowings_routes
 from .routes.activities_routes import activities_routes
@@ -10,8 +18,19 @@ from .routes.books_routes import books_routes
 from .routes.user_routes import user_routes
 from .routes.auth_routes import auth_routes
 from .routes.admin_routes import admin
+from .routes.stats_routes import stats_routes
+from .routes.export_routes import export_routes
 from .routes.main_routes import main
 
+from .commands.books_commands import books_cli
+from .commands.stats_commands import stats_cli
+from .commands.users_commands import users_cli
+from .commands.borrowings_commands import borrowings_cli
+from .commands.export_commands import export
+from .commands.activities_commands import activities_cli
+from .commands.indexes_commands import indexes_cli
+from .commands.cache_commands import cache_cli
+
 def create_app():
     app = Flask(__name__)
 
@@ -29,5 +48,25 @@ def create_app():
     app.register_blueprint(borrowings_routes, url_prefix="/api/borrowings")
     app.register_blueprint(activities_routes, url_prefix="/api/activities")
     app.register_blueprint(favorites_routes, url_prefix="/api/favorites")
+    app.register_blueprint(stats_routes, url_prefix="/api/admin")
+    app.register_blueprint(export_routes, url_prefix="/api/admin")
+
+    app.cli.add_command(books_cli)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(users_cli)
+    app.cli.add_command(borrowings_cli)
+    app.cli.add_command(export)
+    app.cli.add_command(activities_cli)
+    app.cli.add_command(indexes_cli)
+    app.cli.add_command(cache_cli)
+
+    catalog_index.init_app(app)
+    principal_cache.init_app(app)
+    rate_limiter.init_app(app)
+    password_hasher.init_app(app)
+    activity_sink.init_app(app)
+    overdue_sweeper.init_app(app)
+    purger.init_app(app)
+    cache.init_app(app)
     
     return app
\ No newline at end of file
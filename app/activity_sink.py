@@ -0,0 +1,156 @@
+from datetime import datetime, timezone
+from queue import Empty, Full, Queue
+from threading import Event, Lock, Thread
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+import atexit
+import os
+import time
+
+from .extentions import db
+from .repositories.activities_repository import ActivitiesRepository
+
+SINK_MODES = ("sync", "async")
+
+
+class ActivitySink:
+    '''
+    Where activity events end up. "sync" writes each one on the calling
+    thread in its own transaction. "async" puts it on a bounded in-memory
+    queue that a background thread writes with multi-row inserts, once
+    `batch_size` events are waiting or `interval` seconds after the first
+    one, so requests don't wait on the audit log.
+
+    When the queue is full the caller writes its event itself, so a slow
+    database slows requests down rather than losing events. The queue is
+    flushed at exit; a killed process loses what was still queued, at
+    most `interval` seconds' worth under normal load.
+    '''
+
+    RETRIES = 3
+
+    def __init__(self):
+        self.mode = "sync"
+        self.batch_size = 500
+        self.interval = 1.0
+        self.queue_size = 10000
+        self.app = None
+        self._lock = Lock()
+        self._queue = None
+        self._stopping = None
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.mode = app.config.get("ACTIVITY_SINK_MODE", self.mode)
+        if self.mode not in SINK_MODES:
+            raise ValueError("ACTIVITY_SINK_MODE must be 'sync' or 'async'")
+
+        self.batch_size = app.config.get("ACTIVITY_SINK_BATCH", self.batch_size)
+        self.interval = app.config.get("ACTIVITY_SINK_INTERVAL", self.interval)
+        self.queue_size = app.config.get("ACTIVITY_SINK_QUEUE", self.queue_size)
+        self.app = app
+
+        if self.mode == "async":
+            atexit.register(self.shutdown)
+
+    def record(self, activity_type, user_id, target_id=None):
+        event = {
+            "activity_type": activity_type,
+            "user_id": user_id,
+            "target_id": target_id,
+            # the time it happened, not the time it was written
+            "created_at": datetime.now(timezone.utc)
+        }
+
+        if self.mode == "async":
+            try:
+                self._worker().put_nowait(event)
+                return
+            except Full:
+                pass
+
+        ActivitiesRepository(db).create_many([event])
+
+    def shutdown(self, timeout=10):
+        '''write out whatever is still queued, then stop the thread'''
+        with self._lock:
+            thread = self._thread
+            if thread is None or self._pid != os.getpid():
+                return
+            self._stopping.set()
+            self._thread = None
+
+        thread.join(timeout)
+        if thread.is_alive():
+            self.app.logger.error(
+                "Activity sink still writing after %ss, %d event(s) may be lost",
+                timeout,
+                self._queue.qsize()
+            )
+
+    # one thread per process, web workers forked after startup get their own
+    def _worker(self):
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = Queue(self.queue_size)
+                self._stopping = Event()
+                self._thread = Thread(
+                    target=self._run,
+                    args=(self._queue, self._stopping),
+                    name="activity-sink",
+                    daemon=True
+                )
+                self._thread.start()
+                self._pid = os.getpid()
+            return self._queue
+
+    def _run(self, queue, stopping):
+        with self.app.app_context():
+            while not (stopping.is_set() and queue.empty()):
+                batch = self._collect(queue, stopping)
+                if batch:
+                    self._write(batch)
+
+    def _collect(self, queue, stopping):
+        # wait for a first event, waking up now and then to check for stop
+        try:
+            batch = [queue.get(timeout=self.interval)]
+        except Empty:
+            return []
+
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            try:
+                if stopping.is_set():
+                    batch.append(queue.get_nowait())
+                else:
+                    batch.append(queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        repo = ActivitiesRepository(db)
+
+        for attempt in range(self.RETRIES):
+            try:
+                repo.create_many(batch)
+                return
+
+            except IntegrityError:
+                # e.g. the user was deleted meanwhile, keep the others
+                for event in batch:
+                    try:
+                        repo.create_many([event])
+                    except IntegrityError:
+                        self.app.logger.warning("Dropped activity event %r", event)
+                return
+
+            except SQLAlchemyError:
+                self.app.logger.exception("Writing %d activity event(s) failed", len(batch))
+                time.sleep(0.5 * 2 ** attempt)
+
+        self.app.logger.error("Dropped %d activity event(s): %r", len(batch), batch)
+
+
+activity_sink = ActivitySink()
@@ -0,0 +1,116 @@
+from flask import current_app, g, request
+from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
+from threading import Lock
+import time
+import jwt
+
+from .extentions import db
+from .models import User
+
+TOKEN_COOKIE = "access_token"
+TOKEN_ISSUER = "lms-api"
+
+
+class PrincipalCache:
+    '''
+    user id -> is_admin, so auth checks don't hit the database on every
+    request. Users that are gone or queued for the purger map to None.
+    Entries live for PRINCIPAL_CACHE_TTL seconds. UserService drops them
+    on updates and deletes, but only in its own process, so the TTL is how
+    long another worker may keep an outdated role.
+    '''
+
+    def __init__(self, max_size=10000):
+        self.lock = Lock()
+        self.ttl = 60
+        self.max_size = max_size
+        self.entries = {}  # id -> (is_admin or None, expires_at)
+
+    def init_app(self, app):
+        self.ttl = app.config.get("PRINCIPAL_CACHE_TTL", 60)
+        app.before_request(load_claims)
+
+    def lookup(self, user_id):
+        now = time.monotonic()
+
+        entry = self.entries.get(user_id)
+        if entry and entry[1] > now:
+            return entry[0]
+
+        # None when the user no longer exists or is being purged
+        is_admin = (
+            db.session.query(User.is_admin)
+            .filter(User.id == user_id, User.purge_requested_at == None)
+            .first()
+        )
+        is_admin = bool(is_admin[0]) if is_admin else None
+
+        if self.ttl:
+            with self.lock:
+                if len(self.entries) >= self.max_size:
+                    self._evict(now)
+                self.entries[user_id] = (is_admin, now + self.ttl)
+        return is_admin
+
+    def exists(self, user_id):
+        return self.lookup(user_id) is not None
+
+    def is_admin(self, user_id):
+        return bool(self.lookup(user_id))
+
+    def _evict(self, now):
+        self.entries = {k: v for k, v in self.entries.items() if v[1] > now}
+
+        # every entry is still fresh, start over rather than grow
+        if len(self.entries) >= self.max_size:
+            self.entries.clear()
+
+    def invalidate(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def decode_token(token):
+    return jwt.decode(
+        jwt=token,
+        key=current_app.config["SECRET_KEY"],
+        algorithms=["HS256"],
+        issuer=TOKEN_ISSUER
+    )
+
+# runs once per request, the auth decorators only read what it leaves in g
+def load_claims():
+    g.claims = None
+    g.current_user_id = None
+    g.auth_error = "Unauthorized"
+
+    if request.endpoint == "static":
+        return
+
+    token = request.cookies.get(TOKEN_COOKIE)
+    if not token:
+        return
+
+    try:
+        claims = decode_token(token)
+
+        # tokens outlive their user, a deleted or queued one is signed out
+        if not principal_cache.exists(claims["user_id"]):
+            g.auth_error = "Invalid token"
+            return
+
+        g.claims = claims
+        g.current_user_id = claims["user_id"]
+
+    except ExpiredSignatureError:
+        g.auth_error = "Token expired"
+    except (InvalidTokenError, KeyError):
+        g.claims = None
+        g.auth_error = "Invalid token"
+
+
+principal_cache = PrincipalCache()
@@ -0,0 +1,347 @@
+from collections import OrderedDict
+from flask import current_app
+from threading import Lock, local
+import json
+import os
+import pickle
+import random
+import sqlite3
+import time
+
+
+class MemoryBackend:
+    '''
+    LRU of at most `max_entries` for a single process. Invalidations only
+    reach this process, so another worker may serve an entry until its
+    TTL runs out.
+
+    Tag versions come from one counter and are never handed out twice.
+    Past `max_entries` tags the least recently invalidated are forgotten,
+    and every tag not on record moves to a fresh version, so an entry
+    stored under a forgotten tag is a miss.
+    '''
+
+    def __init__(self, max_entries):
+        self.lock = Lock()
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (value, expires_at, {tag: version})
+        self.tags = OrderedDict()     # tag -> version, least recently invalidated first
+        self.clock = 0                # last version handed out
+        self.floor = 0                # version of every tag not in `tags`
+        self.counts = {}              # name -> [hits, misses]
+
+    def get(self, key, now):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+
+            value, expires_at, versions = entry
+            if expires_at <= now or any(self.tags.get(t, self.floor) != v for t, v in versions.items()):
+                del self.entries[key]
+                return False, None
+
+            self.entries.move_to_end(key)
+            return True, value
+
+    def versions(self, tags):
+        with self.lock:
+            return {tag: self.tags.get(tag, self.floor) for tag in tags}
+
+    def set(self, key, value, expires_at, versions):
+        with self.lock:
+            self.entries[key] = (value, expires_at, versions)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, tags):
+        with self.lock:
+            for tag in tags:
+                self.clock += 1
+                self.tags[tag] = self.clock
+                self.tags.move_to_end(tag)
+
+            if len(self.tags) > self.max_entries:
+                self.clock += 1
+                self.floor = self.clock
+                # a quarter at once, each trim misses every untracked tag
+                while len(self.tags) > self.max_entries * 3 // 4:
+                    self.tags.popitem(last=False)
+
+    def add_metrics(self, counts):
+        with self.lock:
+            for name, (hits, misses) in counts.items():
+                total = self.counts.setdefault(name, [0, 0])
+                total[0] += hits
+                total[1] += misses
+
+    def metrics(self):
+        with self.lock:
+            return {name: tuple(c) for name, c in self.counts.items()}
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class SQLiteBackend:
+    '''
+    Entries in a local SQLite file (WAL mode), shared by every worker
+    process on the host, so an invalidation reaches all of them at once.
+    A read is one SELECT that also checks the entry's tag versions.
+    Expired entries, then the oldest ones, are dropped now and then, and
+    tags are forgotten past `max_entries` as in MemoryBackend; the version
+    of untracked tags is kept under the empty tag.
+    '''
+
+    GET = """
+        SELECT value FROM entries
+        WHERE key = ?1 AND expires_at > ?2 AND NOT EXISTS (
+            SELECT 1 FROM json_each(entries.tags) AS t
+            LEFT JOIN tags ON tags.tag = t.key
+            WHERE coalesce(tags.version, (SELECT version FROM tags WHERE tag = ''), 0) != t.value
+        )
+    """
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self.local = local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, "
+            "tags TEXT NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tags ("
+            "tag TEXT PRIMARY KEY, version INTEGER NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS metrics ("
+            "name TEXT PRIMARY KEY, hits INTEGER NOT NULL, misses INTEGER NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)")
+
+    # sqlite connections can't be shared between threads or forked processes
+    def _connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=0.05, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key, now):
+        row = self._connect().execute(self.GET, (key, now)).fetchone()
+        if row is None:
+            return False, None
+        return True, pickle.loads(row[0])
+
+    def versions(self, tags):
+        tags = list(tags)
+        if not tags:
+            return {}
+
+        rows = dict(self._connect().execute(
+            f"SELECT tag, version FROM tags WHERE tag IN ('', {', '.join('?' * len(tags))})",
+            tags
+        ))
+        floor = rows.pop("", 0)
+        return {tag: rows.get(tag, floor) for tag in tags}
+
+    def set(self, key, value, expires_at, versions):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, value, expires_at, tags) VALUES (?, ?, ?, ?)",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires_at, json.dumps(versions))
+        )
+
+        # about one write in a hundred trims the file
+        if random.random() < 0.01:
+            self._trim(conn, time.time())
+
+    def _trim(self, conn, now):
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "DELETE FROM entries WHERE key IN ("
+            "SELECT key FROM entries ORDER BY expires_at "
+            "LIMIT max((SELECT count(*) FROM entries) - ?, 0))",
+            (self.max_entries,)
+        )
+
+        if conn.execute("SELECT count(*) FROM tags").fetchone()[0] <= self.max_entries:
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO tags (tag, version) "
+                "SELECT '', coalesce(max(version), 0) + 1 FROM tags WHERE true "
+                "ON CONFLICT (tag) DO UPDATE SET version = excluded.version"
+            )
+            conn.execute(
+                "DELETE FROM tags WHERE tag IN ("
+                "SELECT tag FROM tags WHERE tag != '' ORDER BY version "
+                "LIMIT max((SELECT count(*) FROM tags) - 1 - ?, 0))",
+                (self.max_entries * 3 // 4,)
+            )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    # versions come from one counter shared by every tag, never reused
+    def invalidate(self, tags):
+        self._connect().executemany(
+            "INSERT INTO tags (tag, version) "
+            "SELECT ?, coalesce(max(version), 0) + 1 FROM tags WHERE true "
+            "ON CONFLICT (tag) DO UPDATE SET version = excluded.version",
+            [(tag,) for tag in tags]
+        )
+
+    def add_metrics(self, counts):
+        self._connect().executemany(
+            "INSERT INTO metrics (name, hits, misses) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET "
+            "hits = hits + excluded.hits, misses = misses + excluded.misses",
+            [(name, hits, misses) for name, (hits, misses) in counts.items()]
+        )
+
+    def metrics(self):
+        rows = self._connect().execute("SELECT name, hits, misses FROM metrics")
+        return {name: (hits, misses) for name, hits, misses in rows}
+
+    def clear(self):
+        self._connect().execute("DELETE FROM entries")
+
+
+class Cache:
+    '''
+    Read-through cache for service results and whole responses, off unless
+    CACHE_ENABLED. Entries carry tags ("catalog", "book:<id>", "user:<id>")
+    and writes invalidate them by bumping the tag's version; an entry
+    stored with an older version is a miss. Tag versions are read before
+    the value is built, so a read racing a write never outlives it.
+
+    Nothing is served older than CACHE_TTL seconds, whatever the backend.
+    Hits and misses are counted per name and flushed to the backend every
+    few seconds.
+    '''
+
+    FLUSH_INTERVAL = 5.0
+
+    def __init__(self):
+        self.enabled = False
+        self.ttl = 30
+        self.backend = None
+        self.lock = Lock()
+        self.counts = {}  # name -> [hits, misses] not flushed yet
+        self.flushed_at = 0
+
+    def init_app(self, app):
+        self.enabled = app.config.get("CACHE_ENABLED", False)
+        if not self.enabled:
+            return
+
+        self.ttl = app.config.get("CACHE_TTL", self.ttl)
+        self.backend = self._backend(app, app.config.get("CACHE_MAX_ENTRIES", 10000))
+
+    def _backend(self, app, max_entries):
+        uri = app.config.get("CACHE_STORAGE_URI") or "memory://"
+        if uri == "memory://":
+            return MemoryBackend(max_entries)
+
+        if not uri.startswith("sqlite:///"):
+            raise ValueError("CACHE_STORAGE_URI must be memory:// or sqlite:///<path>")
+
+        path = uri[len("sqlite:///"):]
+        if not path:
+            os.makedirs(app.instance_path, exist_ok=True)
+            path = os.path.join(app.instance_path, "cache.sqlite3")
+        return SQLiteBackend(path, max_entries)
+
+    def get_or_set(self, name, key, build, tags=()):
+        '''the cached value for (name, key), else build(), stored under `tags`'''
+        if not self.enabled:
+            return build()
+
+        key = f"{name}:{key}"
+        try:
+            found, value = self.backend.get(key, time.time())
+            if found:
+                self._count(name, hit=True)
+                return value
+
+            versions = self.backend.versions(tags)
+        except sqlite3.Error:
+            # a cache outage must not take the site down with it
+            current_app.logger.warning("Cache unavailable")
+            return build()
+
+        value = build()
+        try:
+            self.backend.set(key, value, time.time() + self.ttl, versions)
+        except sqlite3.Error:
+            current_app.logger.warning("Cache unavailable")
+
+        self._count(name, hit=False)
+        return value
+
+    def invalidate(self, *tags):
+        if not self.enabled or not tags:
+            return
+
+        try:
+            self.backend.invalidate(tags)
+        except sqlite3.Error:
+            # entries may be served until their TTL runs out
+            current_app.logger.exception("Cache invalidation failed")
+
+    def clear(self):
+        if self.enabled:
+            self.backend.clear()
+
+    def _count(self, name, hit):
+        with self.lock:
+            counts = self.counts.setdefault(name, [0, 0])
+            counts[0 if hit else 1] += 1
+
+            now = time.monotonic()
+            if now - self.flushed_at < self.FLUSH_INTERVAL:
+                return
+            counts, self.counts, self.flushed_at = self.counts, {}, now
+
+        self._flush(counts)
+
+    def _flush(self, counts):
+        try:
+            self.backend.add_metrics(counts)
+        except sqlite3.Error:
+            current_app.logger.warning("Cache metrics dropped")
+
+    def metrics(self):
+        '''{name: {hits, misses, hit_rate}}, per process with memory://'''
+        if not self.enabled:
+            return {}
+
+        with self.lock:
+            counts, self.counts, self.flushed_at = self.counts, {}, time.monotonic()
+        self._flush(counts)
+
+        return {
+            name: {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None
+            }
+            for name, (hits, misses) in sorted(self.backend.metrics().items())
+        }
+
+
+cache = Cache()
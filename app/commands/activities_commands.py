@@ -0,0 +1,41 @@
+from flask import current_app
+from flask.cli import AppGroup
+import click
+
+from ..routes.dependencies.deps import activity_service
+from ..extentions import db
+
+activities_cli = AppGroup("activities", help="Activity log maintenance, run both daily.")
+
+# create the coming monthly partitions of activities
+@activities_cli.command("partitions")
+@click.option("--ahead", type=int, help="Months to create ahead, ACTIVITY_PARTITIONS_AHEAD by default.")
+def partitions(ahead):
+    service = activity_service(db)
+    if ahead is None:
+        ahead = current_app.config["ACTIVITY_PARTITIONS_AHEAD"]
+
+    try:
+        created = service.maintain_partitions(months_ahead=ahead)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"Created {len(created)} partition(s) {' '.join(created)}".rstrip())
+
+# roll old months up into daily counts and drop their partitions
+@activities_cli.command("retention")
+@click.option("--keep-months", type=int, help="Full months to keep, ACTIVITY_RETENTION_MONTHS by default.")
+def retention(keep_months):
+    service = activity_service(db)
+    if keep_months is None:
+        keep_months = current_app.config["ACTIVITY_RETENTION_MONTHS"]
+
+    try:
+        cutoff, dropped = service.apply_retention(keep_months=keep_months)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(
+        f"Rolled up activities before {cutoff:%Y-%m-%d}, "
+        f"dropped {len(dropped)} partition(s) {' '.join(dropped)}".rstrip()
+    )
@@ -0,0 +1,138 @@
+from flask import current_app
+from flask.cli import AppGroup
+from statistics import quantiles
+import json
+import random
+import time
+import click
+
+from ..routes.dependencies.deps import book_service, book_import_service
+from ..services.book_import_service import IMPORT_FORMATS, import_format
+from ..search_index import CatalogIndex
+from ..extentions import db
+from ..models import Book
+
+books_cli = AppGroup("books", help="Catalog maintenance commands.")
+
+# rebuild books.available_copies and borrow_count from the borrowings
+@books_cli.command("reconcile-counters")
+def reconcile_counters():
+    service = book_service(db)
+    fixed = service.reconcile_counters()
+    click.echo(f"Reconciled counters for {fixed} book(s)")
+
+# load a CSV / JSONL catalog, e.g. flask books import catalog.csv
+@books_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(IMPORT_FORMATS), help="Taken from the file extension by default.")
+@click.option("--on-conflict", type=click.Choice(["update", "skip"]), default="update", show_default=True, help="What to do with ISBNs already in the catalog.")
+@click.option("--batch-size", type=click.IntRange(1, 10000), help="Rows per INSERT, BOOK_IMPORT_BATCH_SIZE by default.")
+@click.option("--rejects", type=click.File("w"), help="Write every rejected row to this JSONL file.")
+def import_books(path, fmt, on_conflict, batch_size, rejects):
+    fmt = fmt or import_format(path)
+    if not fmt:
+        raise click.ClickException("Can't tell the format from the extension, pass --format")
+
+    service = book_import_service(
+        db,
+        batch_size=batch_size or current_app.config["BOOK_IMPORT_BATCH_SIZE"]
+    )
+    started = time.perf_counter()
+
+    def progress(report):
+        elapsed = time.perf_counter() - started
+        click.echo(
+            f"{report['read']:>10} read  {report['inserted']:>10} added  "
+            f"{report['updated']:>10} updated  {report['rejected']:>8} rejected  "
+            f"{report['read'] / elapsed:>8.0f} rows/s"
+        )
+
+    def on_reject(line, isbn, msg):
+        if rejects:
+            rejects.write(json.dumps({"line": line, "isbn": isbn, "msg": msg}) + "\n")
+
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as stream:
+            report = service.run(
+                stream,
+                fmt,
+                update_existing=on_conflict == "update",
+                progress=progress,
+                on_reject=on_reject
+            )
+    except (ValueError, UnicodeDecodeError) as e:
+        raise click.ClickException(str(e))
+
+    click.echo(
+        f"Done in {time.perf_counter() - started:.1f}s: {report['inserted']} added, "
+        f"{report['updated']} updated, {report['rejected']} rejected"
+    )
+    for r in report["rejects"][:20]:
+        click.echo(f"  line {r['line']} ({r['isbn']}): {r['msg']}")
+    if report["rejected"] > 20 and not rejects:
+        click.echo("  ... pass --rejects to keep them all")
+
+def _report(label, timings):
+    total = sum(timings)
+    p50, p99 = (quantiles(timings, n=100)[i] for i in (49, 98))
+    click.echo(
+        f"{label:<6} {len(timings) / total:>10.1f} req/s"
+        f"   p50 {p50 * 1000:>8.3f} ms   p99 {p99 * 1000:>8.3f} ms"
+    )
+
+# compare the SQL search path with the in-memory catalog index
+@books_cli.command("bench-search")
+@click.option("--requests", default=500, show_default=True, help="Searches per path.")
+@click.option("--per-page", default=8, show_default=True)
+@click.option("--seed", default=0, show_default=True)
+def bench_search(requests, per_page, seed):
+    service = book_service(db)
+
+    # realistic queries: whole and partial words taken from the catalog
+    titles = [t for (t,) in db.session.query(Book.title).limit(5000)]
+    if not titles:
+        raise click.ClickException("The catalog is empty")
+
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(requests):
+        words = rng.choice(titles).split()
+        word = rng.choice(words)
+        queries.append(word[:rng.randint(2, len(word))] if len(word) > 2 else word)
+
+    index = CatalogIndex()
+    started = time.perf_counter()
+    index.rebuild()
+    click.echo(f"Index built over {len(index.books)} book(s) in {time.perf_counter() - started:.2f}s")
+
+    for label, search in (
+        ("sql", lambda q: service.repo.all(page=1, per_page=per_page, q=q)),
+        ("index", lambda q: index.search(q=q, page=1, per_page=per_page)),
+    ):
+        timings = []
+        for q in queries:
+            started = time.perf_counter()
+            page = search(q)
+            service.serialize_books(page.items)
+            timings.append(time.perf_counter() - started)
+        db.session.rollback()
+        _report(label, timings)
+
+# delete a book with a large history in batches, or finish the queued ones
+@books_cli.command("purge")
+@click.argument("book_id", type=int, required=False)
+@click.option("--pending", is_flag=True, help="Purge every book queued for deletion.")
+@click.option("--batch-size", type=click.IntRange(1, 100000), help="Rows per table per transaction, PURGE_BATCH_SIZE by default.")
+def purge(book_id, pending, batch_size):
+    if (book_id is None) == (not pending):
+        raise click.UsageError("Pass a book id or --pending")
+
+    service = book_service(db)
+    batch_size = batch_size or current_app.config["PURGE_BATCH_SIZE"]
+
+    if pending:
+        click.echo(f"Purged {service.purge_pending(batch_size)} book(s)")
+    elif service.purge_book(book_id, batch_size):
+        click.echo(f"Purged book {book_id}")
+    else:
+        raise click.ClickException(f"Book {book_id} not found")
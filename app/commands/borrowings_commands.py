@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from flask import current_app
+from flask.cli import AppGroup
+import random
+import time
+import uuid
+import click
+
+from ..routes.dependencies.deps import borrowing_service
+from ..repositories.books_repository import BooksRepository
+from ..repositories.users_repository import UsersRepository
+from ..extentions import db
+from ..models import Book, Borrowing
+
+borrowings_cli = AppGroup("borrowings", help="Borrowing maintenance commands.")
+
+# many users borrowing the same few titles at once, then check the stock
+@borrowings_cli.command("stress")
+@click.option("--threads", default=16, show_default=True)
+@click.option("--attempts", default=400, show_default=True, help="Borrow attempts in total.")
+@click.option("--books", default=2, show_default=True, help="Popular titles fought over.")
+@click.option("--copies", default=50, show_default=True, help="Copies of each title.")
+@click.option("--seed", default=0, show_default=True)
+def stress(threads, attempts, books, copies, seed):
+    app = current_app._get_current_object()
+    run = uuid.uuid4().hex[:8]
+    users_repo = UsersRepository(db)
+    books_repo = BooksRepository(db)
+
+    # throwaway data, removed again at the end
+    book_ids = [
+        books_repo.create(
+            isbn=f"stress-{run}-{i}",
+            title=f"Stress test {run} #{i}",
+            subtitle=None,
+            author="Stress test",
+            page_count=1,
+            description=None,
+            book_img=None,
+            language="en",
+            total_copies=copies,
+            publisher="Stress test",
+            published_at=None
+        ).id
+        for i in range(books)
+    ]
+    user_ids = [
+        users_repo.create(
+            username=f"stress-{run}-{i}",
+            email=f"stress-{run}-{i}@example.com",
+            password=None
+        ).id
+        for i in range(attempts)
+    ]
+
+    rng = random.Random(seed)
+    plan = [(user_id, rng.choice(book_ids)) for user_id in user_ids]
+    due_at = datetime.now(timezone.utc) + timedelta(days=1)
+
+    def borrow(args):
+        with app.app_context():
+            try:
+                borrowing_service(db).create_new_borrowing(*args, due_at=due_at)
+                return "borrowed"
+            except ValueError as e:
+                return str(e)
+
+    oversold = []
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(borrow, plan))
+        elapsed = time.perf_counter() - started
+
+        borrowed = results.count("borrowed")
+        click.echo(
+            f"{attempts} attempts from {threads} threads on {books} title(s) x {copies} copies: "
+            f"{borrowed} borrowed, {len(results) - borrowed} refused, "
+            f"{attempts / elapsed:.1f} attempts/s"
+        )
+
+        # every copy handed out exactly once, and the counters agree
+        for book_id in book_ids:
+            db.session.expire_all()
+            book = db.session.get(Book, book_id)
+            loans = Borrowing.query.filter_by(book_id=book_id, returned_at=None).count()
+            click.echo(f"  book {book_id}: {loans} loan(s), {book.available_copies} left")
+            if loans > copies or book.available_copies != copies - loans or book.available_copies < 0:
+                oversold.append(book_id)
+
+        if borrowed != min(attempts, books * copies) and not oversold:
+            click.echo("  note: some titles ran out before others were exhausted")
+
+    finally:
+        # the loans go with their book
+        for book_id in book_ids:
+            books_repo.delete(book_id)
+        for user_id in user_ids:
+            users_repo.delete(user_id)
+
+    if oversold:
+        raise click.ClickException(f"Oversold book(s): {oversold}")
+    click.echo("No overselling")
+
+# mark the loans gone past their due date, run every minute or so
+@borrowings_cli.command("sweep-overdue")
+@click.option("--batch-size", type=int, help="Loans marked per transaction, OVERDUE_SWEEP_BATCH by default.")
+@click.option("--resync", is_flag=True, help="Also recount every user's overdue loans.")
+def sweep_overdue(batch_size, resync):
+    service = borrowing_service(db)
+    if batch_size is None:
+        batch_size = current_app.config["OVERDUE_SWEEP_BATCH"]
+
+    try:
+        marked = service.sweep_overdue(batch_size=batch_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Marked {marked} loan(s) overdue")
+
+    if resync:
+        fixed = service.resync_overdue()
+        click.echo(f"Fixed the overdue count of {fixed} user(s)")
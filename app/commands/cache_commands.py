@@ -0,0 +1,25 @@
+from flask.cli import AppGroup
+import click
+
+from ..cache import cache
+
+cache_cli = AppGroup("cache", help="Response cache commands.")
+
+# e.g. after editing the database by hand; only this process's entries
+# with memory://, every worker's with a sqlite store
+@cache_cli.command("clear")
+def clear():
+    if not cache.enabled:
+        raise click.ClickException("The cache is off (CACHE_ENABLED)")
+    cache.clear()
+    click.echo("Cache cleared")
+
+# hit rates per endpoint, across workers with a sqlite store
+@cache_cli.command("stats")
+def stats():
+    if not cache.enabled:
+        raise click.ClickException("The cache is off (CACHE_ENABLED)")
+
+    for name, m in cache.metrics().items():
+        rate = "-" if m["hit_rate"] is None else f"{m['hit_rate']:.1%}"
+        click.echo(f"{name:<20} {m['hits']:>10} hits {m['misses']:>10} misses {rate:>8}")
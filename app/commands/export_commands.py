@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+from flask import current_app
+from flask.cli import with_appcontext
+import os
+import time
+import click
+
+from ..routes.dependencies.deps import export_service
+from ..repositories.export_repository import EXPORT_TABLES
+from ..services.export_service import EXPORT_FORMATS
+from ..extentions import db
+
+# written next to the target and renamed over it only once complete;
+# click's atomic=True renames the partial file even when writing failed
+@contextmanager
+def _output(path):
+    if path == "-":
+        yield click.get_binary_stream("stdout")
+        return
+
+    partial = f"{path}.{os.getpid()}.part"
+    try:
+        with open(partial, "wb") as out:
+            yield out
+        os.replace(partial, path)
+    except BaseException:
+        os.remove(partial)
+        raise
+
+# e.g. nightly: flask export borrowings --incremental --feed warehouse -f parquet -o out/
+@click.command("export")
+@click.argument("table", type=click.Choice(list(EXPORT_TABLES)))
+@click.option("-f", "--format", "fmt", type=click.Choice(list(EXPORT_FORMATS)), default="csv", show_default=True)
+@click.option("-o", "--output", default="-", show_default=True, help="File or directory to write to, - for stdout.")
+@click.option("--since", help="Rows changed at or after this ISO 8601 time.")
+@click.option("--until", help="Rows changed before this ISO 8601 time.")
+@click.option("--incremental", is_flag=True, help="Rows changed since the feed's last export.")
+@click.option("--feed", help="Name the incremental mark is kept under, the table by default.")
+@with_appcontext
+def export(table, fmt, output, since, until, incremental, feed):
+    service = export_service(
+        db,
+        chunk_size=current_app.config["EXPORT_CHUNK_SIZE"],
+        lag=current_app.config["EXPORT_LAG"]
+    )
+    try:
+        plan = service.plan(table, fmt=fmt, since=since, until=until, feed=feed, incremental=incremental)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    if output != "-" and os.path.isdir(output):
+        output = os.path.join(output, plan.filename)
+
+    # a failed export never leaves half a file, and the feed mark only
+    # moves once the whole file is in place
+    started = time.perf_counter()
+    size = 0
+    with _output(output) as out:
+        for chunk in service.stream(plan):
+            out.write(chunk)
+            size += len(chunk)
+    service.save_mark(plan)
+
+    if output != "-":
+        click.echo(
+            f"Exported {table} to {output} ({size / 1024:.0f} KiB) "
+            f"in {time.perf_counter() - started:.1f}s",
+            err=True
+        )
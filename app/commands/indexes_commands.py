@@ -0,0 +1,156 @@
+from flask.cli import AppGroup
+from sqlalchemy import event, text
+import click
+import re
+
+from ..repositories.activities_repository import ActivitiesRepository
+from ..repositories.borrowings_repository import BorrowingsRepository
+from ..repositories.favorites_repository import FavoritesRepository
+from ..extentions import db
+
+indexes_cli = AppGroup("indexes", help="Check that the hot queries are served by indexes.")
+
+# tables the checked queries may only read through their indexes
+CHECKED_TABLES = ("borrowings", "favorites", "activities")
+
+# repository read -> (the call making it, with placeholder ids since only
+# the plan matters, the indexes it may read the checked tables through)
+def _checks():
+    borrowings = BorrowingsRepository(db)
+    favorites = FavoritesRepository(db)
+    activities = ActivitiesRepository(db)
+
+    user_active = "ix_borrowings_user_id_active"
+    book_active = "ix_borrowings_book_id_active"
+    overdue = "ix_borrowings_overdue"
+    user_book = "ix_favorites_user_id_book_id"
+    recent = "ix_activities_created_at_id"
+
+    return {
+        "borrowings.eligibility": (lambda: borrowings.eligibility(1, 1), {user_active, book_active}),
+        "borrowings.active_by_user": (lambda: borrowings.active_by_user(1), {user_active}),
+        "borrowings.active_by_book": (lambda: borrowings.active_by_book(1), {book_active}),
+        "borrowings.overdue_by_user": (lambda: borrowings.overdue_by_user(1), {user_active, overdue}),
+        "borrowings.has_copy": (lambda: borrowings.has_copy(1, 1), {user_active, book_active}),
+        "borrowings.limit_reached": (lambda: borrowings.limit_reached(1), {user_active}),
+        "borrowings.current_by_user": (lambda: borrowings.current_by_user(1), {user_active}),
+        "borrowings.listing(overdue)": (lambda: borrowings.listing(status="overdue"), {overdue}),
+        "borrowings.history_by_user": (lambda: borrowings.history_by_user(1), {"ix_borrowings_user_id"}),
+        "borrowings.by_user": (lambda: borrowings.by_user(1), {"ix_borrowings_user_id"}),
+        "borrowings.by_book": (lambda: borrowings.by_book(1), {"ix_borrowings_book_id"}),
+        "favorites.exists": (lambda: favorites.exists(1, 1), {user_book}),
+        "favorites.by_user": (lambda: favorites.by_user(1), {user_book}),
+        "favorites.titles_by_user": (lambda: favorites.titles_by_user(1), {user_book}),
+        "favorites.by_book": (lambda: favorites.by_book(1), {"ix_favorites_book_id"}),
+        "activities.latest_by_limit": (lambda: activities.latest_by_limit(10), {recent}),
+        "activities.by_limit": (lambda: activities.by_limit(10), {recent}),
+        "activities.feed": (lambda: activities.feed(), {recent}),
+        "activities.feed(user_id)": (lambda: activities.feed(user_id=1), {recent, "ix_activities_user_id"}),
+    }
+
+def _captured(call):
+    '''the statements `call` sends to the database, with their parameters'''
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        call()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+    return statements
+
+def _scans(plan):
+    '''({index read: its conditions}, tables read sequentially) in a JSON plan'''
+    indexes, seq_scans = {}, set()
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get("Plans", []))
+        if "Index Name" in node:
+            indexes.setdefault(node["Index Name"], []).append(node.get("Index Cond", ""))
+        if node["Node Type"] == "Seq Scan":
+            seq_scans.add(node["Relation Name"])
+    return indexes, seq_scans
+
+def _relations(names):
+    '''
+    {index or table: (name, table, leading column, rows)}, partitions and
+    their indexes under the partitioned table's names
+    '''
+    rows = db.session.execute(text("""
+        SELECT c.relname,
+               COALESCE(pg_partition_root(c.oid), c.oid)::regclass::text,
+               COALESCE(pg_partition_root(i.indrelid), i.indrelid, pg_partition_root(c.oid), c.oid)::regclass::text,
+               a.attname,
+               heap.reltuples
+        FROM pg_class c
+        LEFT JOIN pg_index i ON i.indexrelid = c.oid
+        LEFT JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        JOIN pg_class heap ON heap.oid = COALESCE(i.indrelid, c.oid)
+        WHERE c.relname = ANY(:names)
+    """), {"names": list(names)}).all()
+    return {row[0]: row[1:] for row in rows}
+
+def _lookup(conditions, column):
+    # the index is searched on its leading column, not walked end to end
+    return all(re.search(rf"\(+{column} ", condition) for condition in conditions)
+
+# EXPLAIN every checked repository query with sequential scans turned
+# off, so a small table doesn't hide a missing index. Which index wins
+# still depends on the statistics, run it on a copy of production data
+@indexes_cli.command("check")
+@click.option("--verbose", "-v", is_flag=True, help="Show the plans of failing queries.")
+def check(verbose):
+    session = db.session
+    failed = []
+
+    for name, (call, allowed) in _checks().items():
+        session.execute(text("SET LOCAL enable_seqscan = off"))
+        statements = _captured(call)
+
+        used, scanned = {}, set()
+        plans = []
+        for statement, parameters in statements:
+            plan = session.connection().exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {statement}", parameters
+            ).scalar()[0]["Plan"]
+            indexes, seq_scans = _scans(plan)
+            for index, conditions in indexes.items():
+                used.setdefault(index, []).extend(conditions)
+            scanned |= seq_scans
+            plans.append(plan)
+
+        relations = _relations(used.keys() | scanned)
+        session.rollback()
+
+        # a checked table read whole, or through an index other than the
+        # expected ones without seeking on it (a full index scan); empty
+        # tables and partitions cost nothing whichever way they are read
+        wrong, served = set(), set()
+        for table in scanned:
+            root, parent, _, rows = relations[table]
+            if parent in CHECKED_TABLES and rows > 0:
+                wrong.add(root)
+        for index, conditions in used.items():
+            root, table, column, rows = relations[index]
+            if table not in CHECKED_TABLES or rows <= 0:
+                continue
+            if root in allowed or _lookup(conditions, column):
+                served.add(root)
+            else:
+                wrong.add(root)
+
+        if wrong:
+            failed.append(name)
+            click.echo(f"FAIL {name}: reads {', '.join(sorted(wrong))}, expected {' or '.join(sorted(allowed))}")
+            if verbose:
+                for plan in plans:
+                    click.echo(plan)
+        else:
+            click.echo(f"ok   {name}: {', '.join(sorted(served)) or 'empty tables'}")
+
+    if failed:
+        raise click.ClickException(f"{len(failed)} query(ies) not served by their index")
@@ -0,0 +1,14 @@
+from flask.cli import AppGroup
+import click
+
+from ..routes.dependencies.deps import stats_service
+from ..extentions import db
+
+stats_cli = AppGroup("stats", help="Admin dashboard counters.")
+
+# recount every dashboard counter from the tables
+@stats_cli.command("rebuild")
+def rebuild():
+    service = stats_service(db)
+    rows = service.rebuild()
+    click.echo(f"Rebuilt {rows} counter row(s)")
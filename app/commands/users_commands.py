@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from flask.cli import AppGroup
+from statistics import quantiles
+from werkzeug.security import generate_password_hash
+import time
+import click
+
+from ..passwords import PasswordHasher, HasherBusy
+from ..routes.dependencies.deps import user_service
+from ..extentions import db
+
+users_cli = AppGroup("users", help="User account commands.")
+
+# sign-in throughput (password checks per second) for each pool size
+@users_cli.command("bench-signin")
+@click.option("--workers", default="0,1,2,4", show_default=True, help="Pool sizes to try, 0 hashes inline.")
+@click.option("--requests", default=200, show_default=True, help="Sign-ins per pool size.")
+@click.option("--concurrency", default=16, show_default=True, help="Concurrent request threads.")
+@click.option("--queue", default=0, help="Queue limit, defaults to the configured one.")
+def bench_signin(workers, requests, concurrency, queue):
+    method = current_app.config["PASSWORD_HASH_METHOD"]
+    pwhash = generate_password_hash("correct horse", method)
+    click.echo(f"{method}, {requests} sign-ins from {concurrency} threads")
+
+    for count in (int(w) for w in workers.split(",")):
+        hasher = PasswordHasher()
+        hasher.method = method
+        hasher.workers = count
+        hasher.queue_size = queue or current_app.config.get("PASSWORD_HASH_QUEUE") or max(count, 1) * 4
+        hasher.timeout = current_app.config.get("PASSWORD_HASH_TIMEOUT", 10)
+
+        # start the worker processes before timing anything
+        for _ in range(count):
+            hasher.verify(pwhash, "correct horse")
+
+        def sign_in(_):
+            started = time.perf_counter()
+            try:
+                hasher.verify(pwhash, "correct horse")
+                return time.perf_counter() - started
+            except HasherBusy:
+                return None
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as threads:
+            results = list(threads.map(sign_in, range(requests)))
+        elapsed = time.perf_counter() - started
+        hasher.shutdown()
+
+        timings = [r for r in results if r is not None]
+        rejected = len(results) - len(timings)
+        p50, p99 = (quantiles(timings, n=100)[i] for i in (49, 98)) if len(timings) > 1 else (0, 0)
+        click.echo(
+            f"workers {count:>2}   {len(timings) / elapsed:>8.1f} sign-ins/s"
+            f"   p50 {p50 * 1000:>8.1f} ms   p99 {p99 * 1000:>8.1f} ms"
+            f"   503s {rejected}"
+        )
+
+# delete a user with a large history in batches, or finish the queued ones
+@users_cli.command("purge")
+@click.argument("user_id", type=int, required=False)
+@click.option("--pending", is_flag=True, help="Purge every user queued for deletion.")
+@click.option("--batch-size", type=click.IntRange(1, 100000), help="Rows per table per transaction, PURGE_BATCH_SIZE by default.")
+def purge(user_id, pending, batch_size):
+    if (user_id is None) == (not pending):
+        raise click.UsageError("Pass a user id or --pending")
+
+    service = user_service(db)
+    batch_size = batch_size or current_app.config["PURGE_BATCH_SIZE"]
+
+    if pending:
+        click.echo(f"Purged {service.purge_pending(batch_size)} user(s)")
+    elif service.purge_user(user_id, batch_size):
+        click.echo(f"Purged user {user_id}")
+    else:
+        raise click.ClickException(f"User {user_id} not found")
@@ -0,0 +1,39 @@
+from flask import current_app, request
+from hashlib import blake2b
+from werkzeug.http import is_resource_modified
+
+
+def make_etag(*parts):
+    '''an opaque tag for whatever version `parts` describe'''
+    return blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+
+def cacheable(response, etag, last_modified=None, weak=False):
+    '''
+    Add the validators and Cache-Control. Clients revalidate every time
+    unless CATALOG_CACHE_MAX_AGE lets them reuse a response for a while.
+    '''
+    response.set_etag(etag, weak=weak)
+    if last_modified:
+        response.last_modified = last_modified
+
+    max_age = current_app.config.get("CATALOG_CACHE_MAX_AGE", 0)
+    response.cache_control.public = True
+    if max_age > 0:
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(etag, last_modified=None, weak=False):
+    '''
+    A 304 when the request's If-None-Match already holds this version,
+    None otherwise. If-Modified-Since alone is not trusted: updated_at is
+    stamped when a transaction starts, not when it commits.
+    '''
+    if is_resource_modified(request.environ, etag=etag):
+        return None
+
+    response = current_app.response_class(status=304)
+    return cacheable(response, etag, last_modified, weak)
@@ -1,5 +1,15 @@
 from . import db
 from datetime import datetime, timezone
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+# weighted document behind the books full-text search
+BOOK_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(author, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(subtitle, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(publisher, '')), 'C') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'D')"
+)
 
 class User(db.Model):
     __tablename__ = "users"
@@ -9,8 +19,21 @@ class User(db.Model):
     email = db.Column(db.String(50), unique=True, nullable=False)
     password = db.Column(db.String(255), nullable=True)
     is_admin = db.Column(db.Boolean, default=False)
+    # loans out past their due date, kept by the overdue sweeper so a
+    # borrow only reads this row
+    overdue_loans = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # set when a large history is left to the purger, no new loans after it
+    purge_requested_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
 
+    __table_args__ = (
+        db.Index(
+            "ix_users_purge_requested_at",
+            "purge_requested_at",
+            postgresql_where=db.text("purge_requested_at IS NOT NULL")
+        ),
+    )
+
     def __repr__(self):
         return f"<User {self.username}>"
 
@@ -30,6 +53,8 @@ class Book(db.Model):
     book_img = db.Column(db.String(255), nullable=True)
     language = db.Column(db.String(50), nullable=False)
     total_copies = db.Column(db.Integer, nullable=False, default=1)    
+    available_copies = db.Column(db.Integer, nullable=False, default=1)
+    borrow_count = db.Column(db.Integer, nullable=False, default=0)
     publisher = db.Column(db.String(255), nullable=False)
     published_at = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
@@ -38,19 +63,56 @@ class Book(db.Model):
         onupdate=db.func.now(), 
         server_default=db.func.now()
     )
+    # maintained by postgres, never loaded or serialized
+    search_vector = db.deferred(db.Column(
+        TSVECTOR,
+        db.Computed(BOOK_SEARCH_DOCUMENT, persisted=True),
+        info={"hidden": True}
+    ))
+    # set when a large history is left to the purger, no new loans after it
+    purge_requested_at = db.Column(db.DateTime, nullable=True, info={"hidden": True})
+
+    __table_args__ = (
+        # one index per catalog sort order, id breaks ties
+        db.Index("ix_books_created_at_id", "created_at", "id"),
+        db.Index("ix_books_title_id", "title", "id"),
+        db.Index("ix_books_author_id", "author", "id"),
+        db.Index("ix_books_borrow_count_id", "borrow_count", "id"),
+        # incremental exports read the books changed since the last one
+        db.Index("ix_books_updated_at_id", "updated_at", "id"),
+        db.Index("ix_books_search_vector", "search_vector", postgresql_using="gin"),
+        db.Index(
+            "ix_books_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"}
+        ),
+        db.Index(
+            "ix_books_author_trgm",
+            "author",
+            postgresql_using="gin",
+            postgresql_ops={"author": "gin_trgm_ops"}
+        ),
+        db.Index(
+            "ix_books_purge_requested_at",
+            "purge_requested_at",
+            postgresql_where=db.text("purge_requested_at IS NOT NULL")
+        ),
+    )
 
     def __repr__(self):
         return f"<Book {self.title}>"
     
     def to_json(self):
-        data = {c.name: getattr(self, c.name) for c in self.__table__.columns}
-        data["available_copies"] = self.available_copies # include available copies
-        return data
+        return {
+            c.name: getattr(self, c.name)
+            for c in self.__table__.columns
+            if not c.info.get("hidden")
+        }
 
     @property
-    def available_copies(self):
-        borrowed_copies = Borrowing.query.filter_by(book_id=self.id, returned_at=None).count()
-        return self.total_copies - borrowed_copies
+    def borrowed_copies(self):
+        return self.total_copies - self.available_copies
     
     @property
     def is_available(self):
@@ -65,9 +127,50 @@ class Borrowing(db.Model):
     borrowed_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     due_at = db.Column(db.DateTime, nullable=False)
     returned_at = db.Column(db.DateTime, nullable=True)
+    # set by the overdue sweeper once due_at has passed, cleared when the
+    # due date is moved back into the future
+    overdue_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(
+        db.DateTime,
+        onupdate=db.func.now(),
+        server_default=db.func.now()
+    )
 
     user = db.relationship("User", backref="borrowings")
     book = db.relationship("Book", backref="borrowings")
+
+    __table_args__ = (
+        # loans the overdue sweeper has still to look at
+        db.Index(
+            "ix_borrowings_due_at_pending",
+            "due_at",
+            postgresql_where=db.text("returned_at IS NULL AND overdue_at IS NULL")
+        ),
+        # the overdue listing, newest first
+        db.Index(
+            "ix_borrowings_overdue",
+            "borrowed_at",
+            "id",
+            postgresql_where=db.text("returned_at IS NULL AND overdue_at IS NOT NULL")
+        ),
+        # a user's current loans, read by every borrow
+        db.Index(
+            "ix_borrowings_user_id_active",
+            "user_id",
+            "book_id",
+            postgresql_where=db.text("returned_at IS NULL")
+        ),
+        # who has a book out right now
+        db.Index(
+            "ix_borrowings_book_id_active",
+            "book_id",
+            postgresql_where=db.text("returned_at IS NULL")
+        ),
+        # whole histories, and the foreign key checks on deletes
+        db.Index("ix_borrowings_user_id", "user_id"),
+        db.Index("ix_borrowings_book_id", "book_id"),
+        db.Index("ix_borrowings_updated_at_id", "updated_at", "id"),
+    )
     
     def __repr__(self):
         return f"<Borrowing user {self.user_id} book {self.book_id}>"
@@ -75,17 +178,34 @@ class Borrowing(db.Model):
     def to_json(self):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
     
+# range partitioned by month on created_at, see ActivitiesRepository
+# for the partition maintenance and retention
 class Activity(db.Model):
     __tablename__ = "activities"
 
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     activity_type = db.Column(db.String(255), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     target_id = db.Column(db.Integer, db.ForeignKey("books.id"), nullable=True)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    # part of the primary key because postgres wants the partition key in it
+    created_at = db.Column(
+        db.DateTime,
+        primary_key=True,
+        default=lambda: datetime.now(timezone.utc),
+        server_default=db.func.now()
+    )
 
     user = db.relationship("User", backref="activities")
     book = db.relationship("Book", backref="activities")
+
+    __table_args__ = (
+        db.Index("ix_activities_created_at_id", "created_at", "id"),
+        db.Index("ix_activities_user_id", "user_id"),
+        db.Index("ix_activities_target_id", "target_id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    # rows are still looked up by id alone
+    __mapper_args__ = {"primary_key": [id]}
     
     def to_json(self):
         return {
@@ -106,6 +226,13 @@ class Favorite(db.Model):
     book_id = db.Column(db.Integer, db.ForeignKey("books.id"), nullable=False)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
 
+    __table_args__ = (
+        db.Index("ix_favorites_created_at_id", "created_at", "id"),
+        # a book is favorited once per user
+        db.Index("ix_favorites_user_id_book_id", "user_id", "book_id", unique=True),
+        db.Index("ix_favorites_book_id", "book_id"),
+    )
+
     def __repr__(self):
         return f"<Favorite book {self.book_id} for user {self.user_id}>"
     
@@ -113,4 +240,47 @@ class Favorite(db.Model):
         return {c.name: getattr(self, c.name) for c in self.__table__.columns}
 
     user = db.relationship("User", backref="favorites")
-    book = db.relationship("Book", backref="favorites")
\ No newline at end of file
+    book = db.relationship("Book", backref="favorites")
+
+# running totals behind the admin dashboard, see StatsRepository
+class StatCounter(db.Model):
+    __tablename__ = "stats_counters"
+
+    # "total" or the UTC day (YYYY-MM-DD) the count belongs to
+    period = db.Column(db.String(10), primary_key=True)
+    name = db.Column(db.String(50), primary_key=True)
+    # hot counters are spread over a few rows to avoid lock queues
+    shard = db.Column(db.SmallInteger, primary_key=True, default=0)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<StatCounter {self.period}/{self.name} {self.value}>"
+
+
+# how far each incremental export feed has got, see ExportRepository
+class ExportMark(db.Model):
+    __tablename__ = "export_marks"
+
+    feed = db.Column(db.String(100), primary_key=True)
+    # rows changed before this time have been exported
+    exported_until = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(
+        db.DateTime,
+        onupdate=db.func.now(),
+        server_default=db.func.now()
+    )
+
+    def __repr__(self):
+        return f"<ExportMark {self.feed} {self.exported_until}>"
+
+
+# per-day counts of activities whose partitions were dropped by retention
+class ActivityDailyCount(db.Model):
+    __tablename__ = "activity_daily_counts"
+
+    day = db.Column(db.Date, primary_key=True)
+    activity_type = db.Column(db.String(255), primary_key=True)
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ActivityDailyCount {self.day} {self.activity_type} {self.count}>"
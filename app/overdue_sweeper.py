@@ -0,0 +1,78 @@
+from threading import Event, Lock, Thread
+from sqlalchemy.exc import SQLAlchemyError
+import atexit
+import os
+
+from .extentions import db
+from .routes.dependencies.deps import borrowing_service
+
+
+class OverdueSweeper:
+    '''
+    Runs the overdue sweep every `interval` seconds on a background thread
+    of each web worker, for deployments without a scheduler to run
+    `flask borrowings sweep-overdue`. Off when the interval is 0.
+
+    The thread starts with the worker's first request, so CLI commands and
+    a preloading master process never run it. Workers sweeping at the same
+    time skip each other's locked loans, no loan is marked twice.
+    '''
+
+    def __init__(self):
+        self.interval = 0
+        self.batch_size = 1000
+        self.app = None
+        self._lock = Lock()
+        self._stopping = None
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.interval = app.config.get("OVERDUE_SWEEP_INTERVAL", self.interval)
+        self.batch_size = app.config.get("OVERDUE_SWEEP_BATCH", self.batch_size)
+        self.app = app
+
+        if self.interval > 0:
+            app.before_request(self._start)
+            atexit.register(self.shutdown)
+
+    def shutdown(self, timeout=10):
+        with self._lock:
+            thread = self._thread
+            if thread is None or self._pid != os.getpid():
+                return
+            self._stopping.set()
+            self._thread = None
+        thread.join(timeout)
+
+    # one thread per process, like the activity sink
+    def _start(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._stopping = Event()
+                self._thread = Thread(
+                    target=self._run,
+                    args=(self._stopping,),
+                    name="overdue-sweeper",
+                    daemon=True
+                )
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _run(self, stopping):
+        with self.app.app_context():
+            while not stopping.wait(self.interval):
+                try:
+                    marked = borrowing_service(db).sweep_overdue(batch_size=self.batch_size)
+                    if marked:
+                        self.app.logger.info("Marked %d loan(s) overdue", marked)
+                except SQLAlchemyError:
+                    self.app.logger.exception("Overdue sweep failed, retrying in %ss", self.interval)
+                finally:
+                    db.session.remove()
+
+
+overdue_sweeper = OverdueSweeper()
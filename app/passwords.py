@@ -0,0 +1,99 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from threading import BoundedSemaphore, Lock
+from werkzeug.security import check_password_hash, generate_password_hash
+import multiprocessing
+import os
+
+
+# the pool starts inside a threaded server, and a forked child can inherit
+# a lock another thread was holding; forkserver forks from a clean
+# single-threaded process instead, spawn is the fallback where it's missing
+def _pool_context():
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+class HasherBusy(Exception):
+    '''every hashing slot is taken, the request should be retried later'''
+
+
+class PasswordHasher:
+    '''
+    Runs the password KDF in a small process pool so sign-in bursts can't
+    pin the request threads. At most `queue_size` hashes may be running
+    or waiting; past that callers get HasherBusy straight away instead of
+    queueing behind work that would time out anyway.
+    '''
+
+    def __init__(self):
+        self.method = "scrypt:32768:8:1"
+        self.workers = 2
+        self.queue_size = 8
+        self.timeout = 10
+        self._lock = Lock()
+        self._pool = None
+        self._pid = None
+        self._slots = None
+
+    def init_app(self, app):
+        self.method = app.config.get("PASSWORD_HASH_METHOD", self.method)
+        self.workers = app.config.get("PASSWORD_HASH_WORKERS", self.workers)
+        self.queue_size = app.config.get("PASSWORD_HASH_QUEUE") or self.workers * 4
+        self.timeout = app.config.get("PASSWORD_HASH_TIMEOUT", self.timeout)
+        self.shutdown()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        if not pwhash:
+            return False
+        return self._run(check_password_hash, pwhash, password)
+
+    # hashed with other parameters than the configured ones
+    def needs_rehash(self, pwhash):
+        return bool(pwhash) and pwhash.split("$", 1)[0] != self.method
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _executor(self):
+        # one pool per process, web workers forked after startup get their own
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=_pool_context()
+                )
+                self._pid = os.getpid()
+                self._slots = BoundedSemaphore(self.queue_size)
+            return self._pool, self._slots
+
+    def _run(self, fn, *args):
+        # no pool configured, hash on the calling thread
+        if not self.workers:
+            return fn(*args)
+
+        pool, slots = self._executor()
+        if not slots.acquire(blocking=False):
+            raise HasherBusy("Too many sign-in attempts, try again shortly")
+
+        try:
+            future = pool.submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise HasherBusy("Too many sign-in attempts, try again shortly")
+
+
+password_hasher = PasswordHasher()
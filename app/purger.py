@@ -0,0 +1,82 @@
+from threading import Event, Lock, Thread
+from sqlalchemy.exc import SQLAlchemyError
+import atexit
+import os
+
+from .extentions import db
+
+
+class Purger:
+    '''
+    Deletes users and books whose history is too large for one request.
+    The request marks the row (no new loans from then on) and wakes this
+    thread, which deletes the history `batch_size` rows per table per
+    transaction and then the row itself, so no lock is held for long.
+
+    Every marked row is picked up again on the next wake-up, so a purge
+    cut short by a restart resumes with the next queued delete, or with
+    `flask users purge --pending` / `flask books purge --pending`.
+    '''
+
+    def __init__(self):
+        self.batch_size = 1000
+        self.threshold = 10000
+        self.app = None
+        self._lock = Lock()
+        self._wake = None
+        self._stopping = None
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.batch_size = app.config.get("PURGE_BATCH_SIZE", self.batch_size)
+        self.threshold = app.config.get("PURGE_THRESHOLD", self.threshold)
+        self.app = app
+        atexit.register(self.shutdown)
+
+    # a row was marked, purge it (and any left from before) soon
+    def wake(self):
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._wake = Event()
+                self._stopping = Event()
+                self._thread = Thread(
+                    target=self._run,
+                    args=(self._wake, self._stopping),
+                    name="purger",
+                    daemon=True
+                )
+                self._thread.start()
+                self._pid = os.getpid()
+            self._wake.set()
+
+    def shutdown(self, timeout=10):
+        '''stop after the current batch, the rest is resumed later'''
+        with self._lock:
+            thread = self._thread
+            if thread is None or self._pid != os.getpid():
+                return
+            self._stopping.set()
+            self._wake.set()
+            self._thread = None
+        thread.join(timeout)
+
+    def _run(self, wake, stopping):
+        # imported here, the services are built with this purger
+        from .routes.dependencies.deps import book_service, user_service
+
+        with self.app.app_context():
+            while wake.wait() and not stopping.is_set():
+                wake.clear()
+                try:
+                    users = user_service(db).purge_pending(self.batch_size, stopping)
+                    books = book_service(db).purge_pending(self.batch_size, stopping)
+                    if users or books:
+                        self.app.logger.info("Purged %d user(s) and %d book(s)", users, books)
+                except SQLAlchemyError:
+                    self.app.logger.exception("Purge failed, resumed on the next wake-up")
+                finally:
+                    db.session.remove()
+
+
+purger = Purger()
@@ -0,0 +1,202 @@
+from flask import current_app, g, jsonify, request
+from threading import Lock, local
+from math import ceil
+import os
+import random
+import sqlite3
+import time
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# methods that are throttled, reads stay free
+WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+
+def parse_rate(rate):
+    '''"10/minute" -> (capacity 10, refill 10/60 tokens a second)'''
+    try:
+        count, period = rate.split("/")
+        count = int(count)
+        return count, count / PERIODS[period.strip().rstrip("s")]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit '{rate}', use e.g. '10/minute'")
+
+
+class MemoryStore:
+    '''buckets for a single process, e.g. development or tests'''
+
+    def __init__(self):
+        self.lock = Lock()
+        self.buckets = {}  # key -> (tokens, updated_at)
+
+    def take(self, key, capacity, rate, now, count=1):
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+
+            if tokens < 1:
+                return 0, (1 - tokens) / rate
+
+            granted = min(count, int(tokens))
+            self.buckets[key] = (tokens - granted, now)
+            return granted, 0
+
+    def purge(self, before):
+        with self.lock:
+            self.buckets = {k: v for k, v in self.buckets.items() if v[1] >= before}
+
+
+class SQLiteStore:
+    '''
+    Buckets in a local SQLite file (WAL mode), shared by every worker
+    process on the host. A take is one UPSERT that refills the bucket and
+    hands out up to `count` whole tokens atomically.
+    '''
+
+    TAKE = """
+        INSERT INTO buckets (key, tokens, updated_at, granted)
+        VALUES (?1, ?2 - min(?5, ?2), ?4, min(?5, ?2))
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = min(?2, tokens + (?4 - updated_at) * ?3)
+                - min(?5, CAST(min(?2, tokens + (?4 - updated_at) * ?3) AS INTEGER)),
+            granted = min(?5, CAST(min(?2, tokens + (?4 - updated_at) * ?3) AS INTEGER)),
+            updated_at = ?4
+        WHERE min(?2, tokens + (?4 - updated_at) * ?3) >= 1
+        RETURNING granted
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.local = local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, "
+            "granted INTEGER NOT NULL DEFAULT 0"
+            ") WITHOUT ROWID"
+        )
+
+    # sqlite connections can't be shared between threads or forked processes
+    def _connect(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=0.05, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self.local.conn, self.local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, capacity, rate, now, count=1):
+        conn = self._connect()
+        row = conn.execute(self.TAKE, (key, capacity, rate, now, count)).fetchone()
+        if row:
+            return row[0], 0
+
+        tokens, updated = conn.execute(
+            "SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)
+        ).fetchone()
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        return 0, (1 - tokens) / rate
+
+    def purge(self, before):
+        self._connect().execute("DELETE FROM buckets WHERE updated_at < ?", (before,))
+
+
+class RateLimiter:
+    '''
+    Token buckets per route and client (the signed-in user, else the IP),
+    for write requests to the blueprints listed in RATELIMIT_RULES.
+
+    A worker may take a few tokens at once (RATELIMIT_LEASE of the bucket)
+    and spend them locally for up to LEASE_TTL seconds, so busy clients
+    don't cost a store round trip per request. Unspent leased tokens are
+    dropped, which can only make the limit stricter, never looser.
+    '''
+
+    LEASE_TTL = 1.0
+
+    def __init__(self):
+        self.enabled = False
+        self.store = None
+        self.rules = {}  # blueprint -> (capacity, refill per second)
+        self.lease = 0.1
+        self.leases = {}  # key -> (tokens left, expires_at)
+        self.lock = Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get("RATELIMIT_ENABLED", True)
+        if not self.enabled:
+            return
+
+        self.lease = app.config.get("RATELIMIT_LEASE", self.lease)
+
+        self.rules = {
+            blueprint: parse_rate(rate)
+            for blueprint, rate in app.config.get("RATELIMIT_RULES", {}).items()
+        }
+        self.store = self._store(app)
+
+        # after auth.load_claims, so signed-in users are keyed by id
+        app.before_request(self.check)
+
+    def _store(self, app):
+        uri = app.config.get("RATELIMIT_STORAGE_URI")
+        if uri == "memory://":
+            return MemoryStore()
+
+        if not uri:
+            os.makedirs(app.instance_path, exist_ok=True)
+            return SQLiteStore(os.path.join(app.instance_path, "ratelimit.sqlite3"))
+
+        if not uri.startswith("sqlite:///"):
+            raise ValueError("RATELIMIT_STORAGE_URI must be memory:// or sqlite:///<path>")
+        return SQLiteStore(uri[len("sqlite:///"):])
+
+    def check(self):
+        rule = self.rules.get(request.blueprint)
+        if not rule or request.method not in WRITE_METHODS:
+            return
+
+        client = getattr(g, "current_user_id", None) or request.remote_addr
+        key = f"{request.endpoint}:{client}"
+        now = time.time()
+
+        try:
+            allowed, retry_after = self.take(key, *rule, now)
+        except sqlite3.Error:
+            # a limiter outage must not take the site down with it
+            current_app.logger.warning("Rate limit store unavailable")
+            return
+
+        # now and then drop buckets that have been full for a day
+        if random.random() < 0.001:
+            self.purge(now)
+
+        if not allowed:
+            retry_after = ceil(retry_after)
+            return jsonify({
+                "type": "error",
+                "msg": f"Too many requests, try again in {retry_after}s"
+            }), 429, {"Retry-After": str(retry_after)}
+
+    def take(self, key, capacity, rate, now):
+        with self.lock:
+            left, expires_at = self.leases.get(key, (0, 0))
+            if left and expires_at > now:
+                self.leases[key] = (left - 1, expires_at)
+                return True, 0
+
+        batch = max(1, int(capacity * self.lease))
+        granted, retry_after = self.store.take(key, capacity, rate, now, batch)
+
+        if granted > 1:
+            with self.lock:
+                self.leases[key] = (granted - 1, now + self.LEASE_TTL)
+        return granted > 0, retry_after
+
+    def purge(self, now):
+        with self.lock:
+            self.leases = {k: v for k, v in self.leases.items() if v[1] > now}
+        self.store.purge(now - PERIODS["day"])
+
+
+rate_limiter = RateLimiter()
@@ -1,7 +1,34 @@
 from datetime import datetime, timedelta, timezone
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import delete, insert, select, text, tuple_, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
+import re
 
-from ..models import Activity
+from ..models import Activity, User, Book
+from .pagination import keyset_paginate
+
+# activities is range partitioned by month: activities_pYYYY_MM holds
+# [1st of the month, 1st of the next), the default partition anything else
+DEFAULT_PARTITION = "activities_default"
+PARTITION_NAME = re.compile(r"^activities_p(\d{4})_(\d{2})$")
+
+ROLLUP = """
+    INSERT INTO activity_daily_counts (day, activity_type, count)
+    SELECT created_at::date, activity_type, COUNT(*)
+    FROM {table} {where}
+    GROUP BY 1, 2
+    ON CONFLICT (day, activity_type)
+    DO UPDATE SET count = activity_daily_counts.count + EXCLUDED.count
+"""
+
+def month_start(value, months=0):
+    '''1st of value's month, moved by `months` months'''
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def partition_name(month):
+    return f"activities_p{month.year:04d}_{month.month:02d}"
 
 class ActivitiesRepository:
     def __init__(self, db: SQLAlchemy):
@@ -17,6 +44,15 @@ class ActivitiesRepository:
         self.db.session.commit()
         return new
     
+    # one multi-row insert for a batch of {activity_type, user_id, ...}
+    def create_many(self, events):
+        try:
+            self.db.session.execute(insert(Activity), events)
+            self.db.session.commit()
+        except SQLAlchemyError:
+            self.db.session.rollback()
+            raise
+    
     def all(self):
         return (
             Activity.query
@@ -24,12 +60,58 @@ class ActivitiesRepository:
             .all()
         )
     
+    # newest first, one joined query per page
+    def feed(
+            self,
+            cursor=None,
+            per_page=50,
+            activity_type=None,
+            user_id=None,
+            since=None,
+            until=None
+    ):
+        query = (
+            self.db.session.query(
+                Activity.id,
+                Activity.activity_type,
+                Activity.user_id,
+                User.username,
+                Activity.target_id,
+                Book.title.label("book_title"),
+                Activity.created_at
+            )
+            .join(User, Activity.user_id == User.id)
+            .outerjoin(Book, Activity.target_id == Book.id)
+        )
+
+        if activity_type:
+            query = query.filter(Activity.activity_type == activity_type)
+
+        if user_id:
+            query = query.filter(Activity.user_id == user_id)
+
+        if since:
+            query = query.filter(Activity.created_at >= since)
+
+        if until:
+            query = query.filter(Activity.created_at < until)
+
+        return keyset_paginate(
+            query,
+            keys=(Activity.created_at, Activity.id),
+            descending=True,
+            per_page=per_page,
+            cursor=cursor,
+            scope="activities"
+        )
+    
     def by_id(self, id):
         return Activity.query.get(id)
     
     def by_limit(self, limit):
         return (
             Activity.query
+            .options(joinedload(Activity.user), joinedload(Activity.book))
             .order_by(Activity.created_at.desc())
             .limit(limit=limit)
             .all()
@@ -37,11 +119,16 @@ class ActivitiesRepository:
     
     # get activities in the last 24 hours by a specific limit
     def latest_by_limit(self, limit):
-        since = datetime.now(timezone.utc) - timedelta(hours=24)
+        now = datetime.now(timezone.utc)
+        since = now - timedelta(hours=24)
+        # bounded on both sides so only this month's partition (and the
+        # previous one on the 1st) is read, not the future or default ones
+        until = month_start(now, 1)
 
         return (
             Activity.query\
-            .filter(Activity.created_at >= since)\
+            .options(joinedload(Activity.user), joinedload(Activity.book))\
+            .filter(Activity.created_at >= since, Activity.created_at < until)\
             .order_by(Activity.created_at.desc())\
             .limit(limit=limit)\
             .all()
@@ -57,10 +144,130 @@ class ActivitiesRepository:
         except:
             return False
         
-    def delete_by_user(self, user_id):
-        acts = Activity.query.filter_by(user_id=user_id).all()
+    # the whole key, so a batch delete can prune partitions per row
+    def _limited(self, condition, limit):
+        if not limit:
+            return condition
+        key = tuple_(Activity.id, Activity.created_at)
+        return key.in_(select(Activity.id, Activity.created_at).where(condition).limit(limit))
+
+    # at most `limit` of them when given, returns how many went
+    def delete_by_user(self, user_id, limit=None, commit=True):
+        deleted = self.db.session.execute(
+            delete(Activity)
+            .where(self._limited(Activity.user_id == user_id, limit))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if commit:
+            self.db.session.commit()
+        return deleted
+
+    # other users' history of a deleted book stays, without the book
+    def detach_book(self, book_id, limit=None, commit=True):
+        detached = self.db.session.execute(
+            update(Activity)
+            .where(self._limited(Activity.target_id == book_id, limit))
+            .values(target_id=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if commit:
+            self.db.session.commit()
+        return detached
+
+    # ---------- partitions ----------
+
+    def partitions(self):
+        '''{1st of the month: partition name} for the monthly partitions'''
+        names = self.db.session.execute(text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'activities'::regclass
+        """)).scalars()
+
+        months = {}
+        for name in names:
+            match = PARTITION_NAME.match(name)
+            if match:
+                months[datetime(int(match[1]), int(match[2]), 1)] = name
+        return months
+
+    def ensure_partitions(self, months_ahead=2):
+        '''
+        Make sure the default partition and the monthly ones from this
+        month to `months_ahead` months out exist, plus one for every month
+        that ended up in the default partition (e.g. the job didn't run).
+        Those rows are moved into their new partition. Returns the names
+        of the partitions created.
+        '''
+        session = self.db.session
+        try:
+            session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF activities DEFAULT"
+            ))
+
+            this_month = month_start(datetime.now(timezone.utc))
+            wanted = {month_start(this_month, n) for n in range(months_ahead + 1)}
+            wanted |= set(session.execute(text(
+                f"SELECT DISTINCT date_trunc('month', created_at) FROM {DEFAULT_PARTITION}"
+            )).scalars())
+
+            existing = self.partitions()
+            created = []
+            for month in sorted(wanted - existing.keys()):
+                name = partition_name(month)
+                self._create_partition(name, month, month_start(month, 1))
+                created.append(name)
+
+            session.commit()
+            return created
+
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    def _create_partition(self, name, start, end):
+        # built aside and attached, so rows already in the default
+        # partition for that month can be moved over first
+        bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        for statement in (
+            f"CREATE TABLE {name} (LIKE activities INCLUDING DEFAULTS)",
+            f"""
+                WITH moved AS (
+                    DELETE FROM {DEFAULT_PARTITION}
+                    WHERE created_at >= '{start.isoformat()}' AND created_at < '{end.isoformat()}'
+                    RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """,
+            f"ALTER TABLE activities ATTACH PARTITION {name} FOR VALUES {bounds}",
+        ):
+            self.db.session.execute(text(statement))
+
+    def drop_before(self, cutoff):
+        '''
+        Roll every activity older than `cutoff` (a 1st of the month) up into
+        activity_daily_counts, then drop the monthly partitions before it
+        and delete such rows from the default partition. One transaction,
+        so each activity is either counted or still there.
+        Returns the names of the partitions dropped.
+        '''
+        session = self.db.session
+        try:
+            dropped = []
+            for month, name in sorted(self.partitions().items()):
+                if month_start(month, 1) > cutoff:
+                    continue
+                session.execute(text(ROLLUP.format(table=name, where="")))
+                session.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+
+            where = "WHERE created_at < :cutoff"
+            session.execute(text(ROLLUP.format(table=DEFAULT_PARTITION, where=where)), {"cutoff": cutoff})
+            session.execute(text(f"DELETE FROM {DEFAULT_PARTITION} {where}"), {"cutoff": cutoff})
 
-        for act in acts:
-            self.db.session.delete(act)
+            session.commit()
+            return dropped
 
-        self.db.session.commit()
\ No newline at end of file
+        except SQLAlchemyError:
+            session.rollback()
+            raise
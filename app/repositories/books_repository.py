@@ -1,12 +1,81 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import func, or_
+from sqlalchemy.exc import SQLAlchemyError, OperationalError
+from sqlalchemy import Column, Integer, MetaData, Table, Text
+from sqlalchemy import delete, func, literal_column, or_, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.schema import CreateTable
+import csv
+import io
+import re
 
-from ..models import Book
+from ..models import Activity, Book, Borrowing, Favorite, StatCounter, User
+from .activities_repository import ActivitiesRepository
+from .borrowings_repository import BorrowingsRepository
+from .favorites_repository import FavoritesRepository
+from .pagination import keyset_paginate, estimate_count
+from .stats_repository import StatsRepository, TOTAL, CATALOG_VERSION
+
+# columns the admin grid can be sorted by
+SORTABLE_COLUMNS = {
+    "id": Book.id,
+    "title": Book.title,
+    "author": Book.author,
+    "language": Book.language,
+    "publisher": Book.publisher,
+    "total_copies": Book.total_copies,
+    "available_copies": Book.available_copies,
+    "created_at": Book.created_at,
+    "updated_at": Book.updated_at,
+}
+
+# catalog sort orders: (column, descending)
+BOOK_SORTS = {
+    "newest": (Book.created_at, True),
+    "title": (Book.title, False),
+    "author": (Book.author, False),
+    "most_borrowed": (Book.borrow_count, True),
+}
+
+# columns an import may leave empty without wiping what is stored
+OPTIONAL_COLUMNS = ("subtitle", "description", "book_img", "published_at")
+
+# per-connection temp table catalog imports are COPYed into, kept out of
+# db.metadata so migrations never see it
+IMPORT_COLUMNS = (
+    "isbn",
+    "title",
+    "subtitle",
+    "author",
+    "page_count",
+    "description",
+    "book_img",
+    "language",
+    "total_copies",
+    "publisher",
+    "published_at"
+)
+IMPORT_STAGING = Table(
+    "import_books",
+    MetaData(),
+    *(
+        Column(name, Integer if name in ("page_count", "total_copies") else Text)
+        for name in IMPORT_COLUMNS
+    ),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DELETE ROWS"
+)
+
+# words a full-text search query is split into
+SEARCH_TERM = re.compile(r"\w+")
 
 class BooksRepository:
     def __init__(self, db: SQLAlchemy):
         self.db = db
+        self.stats = StatsRepository(db)
+        self.borrowings = BorrowingsRepository(db)
+        self.favorites = FavoritesRepository(db)
+        self.activities = ActivitiesRepository(db)
 
     def create(
             self,
@@ -32,11 +101,21 @@ class BooksRepository:
                 book_img=book_img,
                 language=language,
                 total_copies=total_copies,
+                available_copies=total_copies,
                 publisher=publisher,
                 description=description,
                 published_at=published_at
             )
             self.db.session.add(new_book)
+            self.db.session.flush()
+            self.stats.bump(
+                books=1,
+                copies=total_copies,
+                available_copies=total_copies,
+                out_of_stock_books=int(total_copies <= 0),
+                catalog_version=1
+            )
+
             self.db.session.commit()
             return new_book
         
@@ -44,10 +123,37 @@ class BooksRepository:
             self.db.session.rollback()
             raise e
         
+    def _full_text(self):
+        return current_app.config.get("BOOK_SEARCH_MODE", "fulltext") == "fulltext"
+
+    # "quoted words" are matched as a phrase, otherwise every word has to
+    # match and the last one may be a prefix (search as you type)
+    def _tsquery(self, q):
+        if '"' in q:
+            return func.websearch_to_tsquery("simple", q)
+
+        terms = SEARCH_TERM.findall(q.lower())
+        if not terms:
+            return None
+
+        terms[-1] += ":*"
+        return func.to_tsquery("simple", " & ".join(terms))
+
+    # books waiting for the purger are out of every listing and search
     def _base_query(self, q=None):
-        query = Book.query
+        query = Book.query.filter(Book.purge_requested_at == None)
+
+        if q and self._full_text():
+            tsquery = self._tsquery(q)
+            if tsquery is None:
+                return query.filter(Book.isbn == q.strip())
+
+            query = query.filter(or_(
+                Book.search_vector.bool_op("@@")(tsquery),
+                Book.isbn == q.strip()
+            ))
 
-        if q:
+        elif q:
             query = query.filter(or_(
                 Book.isbn.ilike(f"%{q}%"),
                 Book.title.ilike(f"%{q}%"),
@@ -56,17 +162,190 @@ class BooksRepository:
             
         return query
 
-    def all(self, page=1, per_page=10, q=None):
+    # best matches first when searching, catalog order otherwise
+    def _ranked(self, query, q=None):
+        tsquery = self._tsquery(q) if q and self._full_text() else None
+        if tsquery is None:
+            return query.order_by(Book.id.asc())
+
+        return query.order_by(
+            func.ts_rank(Book.search_vector, tsquery).desc(),
+            Book.id.asc()
+        )
+
+    def _filtered_query(
+            self,
+            q=None,
+            language=None,
+            publisher=None,
+            author=None,
+            availability=None
+    ):
+        query = self._base_query(q)
+
+        if language:
+            query = query.filter(func.lower(Book.language) == language.lower())
+
+        if publisher:
+            query = query.filter(Book.publisher.ilike(f"%{publisher}%"))
+
+        if author:
+            query = query.filter(Book.author.ilike(f"%{author}%"))
+
+        if availability == "available":
+            query = query.filter(Book.available_copies > 0)
+        elif availability == "unavailable":
+            query = query.filter(Book.available_copies <= 0)
+
+        return query
+
+    def admin_page(
+            self,
+            page=1,
+            per_page=25,
+            sort="id",
+            descending=False,
+            **filters
+    ):
+        query = self._filtered_query(**filters)
+
+        # id breaks ties so pages never overlap
+        column = SORTABLE_COLUMNS[sort]
+        if descending:
+            query = query.order_by(column.desc(), Book.id.desc())
+        else:
+            query = query.order_by(column.asc(), Book.id.asc())
+
+        return query.paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+
+    # cursor pagination, count is "exact", "estimate" or "none"
+    def keyset(self, sort="newest", cursor=None, per_page=10, q=None, count="estimate"):
+        column, descending = BOOK_SORTS[sort]
         query = self._base_query(q)
 
+        total = None
+        if count == "exact":
+            total = query.count()
+        elif count == "estimate":
+            total = estimate_count(self.db.session, query)
+
+        page = keyset_paginate(
+            query,
+            keys=(column, Book.id),
+            descending=descending,
+            per_page=per_page,
+            cursor=cursor,
+            scope=f"books:{sort}"
+        )
+        page.total = total
+        return page
+
+    def all(self, page=1, per_page=10, q=None):
+        query = self._ranked(self._base_query(q), q)
+
         return query.paginate(
             page=page,
             per_page=per_page,
             error_out=False
         )
 
+    # id, title, author and cover only, capped at timeout_ms
+    def suggest(self, q, limit, timeout_ms):
+        columns = (Book.id, Book.title, Book.author, Book.book_img)
+
+        if self._full_text():
+            tsquery = self._tsquery(q)
+            if tsquery is None:
+                return []
+
+            query = (
+                self.db.session.query(*columns)
+                .filter(
+                    Book.search_vector.bool_op("@@")(tsquery),
+                    Book.purge_requested_at == None
+                )
+                .order_by(
+                    func.ts_rank(Book.search_vector, tsquery).desc(),
+                    Book.id.asc()
+                )
+            )
+        else:
+            query = (
+                self.db.session.query(*columns)
+                .filter(
+                    or_(
+                        Book.title.ilike(f"{q}%"),
+                        Book.author.ilike(f"{q}%")
+                    ),
+                    Book.purge_requested_at == None
+                )
+                .order_by(Book.title.asc())
+            )
+
+        return self._within(query.limit(limit), timeout_ms)
+
+    # closest titles and authors by trigram similarity ("did you mean")
+    def similar(self, q, limit, timeout_ms):
+        score = func.greatest(
+            func.similarity(Book.title, q),
+            func.similarity(Book.author, q)
+        )
+
+        query = (
+            self.db.session.query(Book.id, Book.title, Book.author, Book.book_img)
+            .filter(
+                or_(
+                    Book.title.bool_op("%")(q),
+                    Book.author.bool_op("%")(q)
+                ),
+                Book.purge_requested_at == None
+            )
+            .order_by(score.desc(), Book.id.asc())
+            .limit(limit)
+        )
+
+        return self._within(query, timeout_ms)
+
+    # run a read under a statement timeout, give up with no rows
+    def _within(self, query, timeout_ms):
+        try:
+            self.db.session.execute(
+                text(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+            )
+            rows = query.all()
+            self.db.session.execute(text("SET LOCAL statement_timeout TO DEFAULT"))
+            return rows
+        
+        except OperationalError:
+            self.db.session.rollback()
+            return []
+
+    def catalog_version(self):
+        '''
+        (last change, version): the version is a counter every book write
+        bumps in its own transaction, so it moves when the write commits,
+        unlike updated_at, which is stamped when it began. One backward
+        step on ix_books_updated_at_id and one counter lookup.
+        '''
+        return tuple(self.db.session.execute(select(
+            select(func.max(Book.updated_at)).scalar_subquery(),
+            select(func.coalesce(func.sum(StatCounter.value), 0))
+            .where(StatCounter.period == TOTAL, StatCounter.name == CATALOG_VERSION)
+            .scalar_subquery()
+        )).one())
+
     def by_id(self, id):
         return Book.query.get(id)
+
+    # the columns a book page's ETag is built from, by primary key
+    def version(self, id):
+        return self.db.session.execute(
+            select(Book.id, Book.updated_at, Book.available_copies).where(Book.id == id)
+        ).first()
     
     def by_title(self, title):
         return Book.query.filter(func.lower(title) == title).first()
@@ -81,13 +360,46 @@ class BooksRepository:
         return Book.query.filter(Book.title.ilike(f"%{text}%")).all()
     
     def update(self, id: int, updates: dict):
+        session = self.db.session
         try:
-            book = Book.query.get(id)
+            # locked and re-read, so a borrow or return committed since the
+            # caller loaded the book is neither lost nor double counted
+            book = session.execute(
+                select(Book)
+                .where(Book.id == id)
+                .with_for_update(key_share=True)
+                .execution_options(populate_existing=True)
+            ).scalar()
+            if book is None:
+                session.rollback()
+                raise ValueError("Book not found")
+
+            # keep the shelf count in step with the stock change
+            total_copies = updates.get("total_copies")
+            if total_copies is not None:
+                if total_copies < book.borrowed_copies:
+                    session.rollback()
+                    raise ValueError("Total copies cannot be less than borrowed copies")
+
+                delta = total_copies - book.total_copies
+                was_out = book.available_copies <= 0
+                book.available_copies += delta
+
+                stock = {
+                    "copies": delta,
+                    "available_copies": delta,
+                    "out_of_stock_books": int(book.available_copies <= 0) - int(was_out)
+                }
+            else:
+                stock = {}
 
             for key, value in updates.items():
                 if value is not None:
                     setattr(book, key, value)
 
+            self.db.session.flush()
+            self.stats.bump(catalog_version=1, **stock)
+
             self.db.session.commit()
             return book
         
@@ -96,14 +408,267 @@ class BooksRepository:
             raise e
 
     def delete(self, id):
-        book: Book = Book.query.get(id)
-        
+        '''
+        Delete the book with its borrowings and favorites in one
+        transaction of set-based DELETEs; activities keep their row
+        without the book. Locks borrowings, then borrowers, then the book.
+        '''
+        session = self.db.session
         try:
-            self.db.session.delete(book)
-            self.db.session.commit()
+            self.borrowings.lock_where(Borrowing.book_id == id)
+            # the borrowers whose overdue count the delete lowers, in id order
+            session.execute(
+                select(User.id)
+                .where(User.id.in_(
+                    select(Borrowing.user_id).where(
+                        Borrowing.book_id == id,
+                        Borrowing.returned_at == None,
+                        Borrowing.overdue_at != None
+                    )
+                ))
+                .order_by(User.id)
+                .with_for_update(key_share=True)
+            )
+            book = session.execute(
+                select(Book.id).where(Book.id == id).with_for_update()
+            ).first()
+            if book is None:
+                session.rollback()
+                return False
+
+            self.borrowings.delete_by_book_id(id, commit=False)
+            self.favorites.delete_by_book(id, commit=False)
+            self.activities.detach_book(id, commit=False)
+
+            # read after the loans put their copies back
+            total, available = session.execute(
+                delete(Book)
+                .where(Book.id == id)
+                .returning(Book.total_copies, Book.available_copies)
+                .execution_options(synchronize_session=False)
+            ).one()
+            self.stats.bump(
+                books=-1,
+                copies=-total,
+                available_copies=-available,
+                out_of_stock_books=-int(available <= 0),
+                catalog_version=1
+            )
+
+            session.commit()
             return True
         except SQLAlchemyError:
-            self.db.session.rollback()
+            session.rollback()
             return False
 
-    
\ No newline at end of file
+    # rows hanging off the book, counted up to `cap` per table
+    def history_size(self, id, cap):
+        return sum(
+            self.db.session.execute(
+                select(func.count()).select_from(
+                    select(1).where(column == id).limit(cap).subquery()
+                )
+            ).scalar()
+            for column in (Borrowing.book_id, Favorite.book_id, Activity.target_id)
+        )
+
+    # stop new loans now, the purger deletes the rest in batches
+    def request_purge(self, id):
+        self.db.session.execute(
+            update(Book)
+            .where(Book.id == id, Book.purge_requested_at == None)
+            .values(purge_requested_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+        # it just left the listings
+        self.stats.bump(catalog_version=1)
+        self.db.session.commit()
+
+    def pending_purges(self):
+        return self.db.session.execute(
+            select(Book.id)
+            .where(Book.purge_requested_at != None)
+            .order_by(Book.purge_requested_at, Book.id)
+        ).scalars().all()
+
+    def purge_batch(self, id, batch_size):
+        '''
+        Delete up to `batch_size` of the book's borrowings and favorites and
+        detach as many activities, in one short transaction. Returns how
+        many rows were touched, 0 once only the book row is left.
+        '''
+        session = self.db.session
+        try:
+            touched = (
+                self.borrowings.delete_by_book_id(id, limit=batch_size, commit=False)
+                + self.favorites.delete_by_book(id, limit=batch_size, commit=False)
+                + self.activities.detach_book(id, limit=batch_size, commit=False)
+            )
+            session.commit()
+            return touched
+
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    def _stage(self, rows):
+        '''COPY a batch into this connection's import_books temp table'''
+        connection = self.db.session.connection()
+        connection.execute(CreateTable(IMPORT_STAGING, if_not_exists=True))
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            # an unquoted empty field is NULL to COPY
+            writer.writerow(["" if v is None else v for v in (row[c] for c in IMPORT_COLUMNS)])
+        buffer.seek(0)
+
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {IMPORT_STAGING.name} ({', '.join(IMPORT_COLUMNS)}) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+        finally:
+            cursor.close()
+
+    def upsert_many(self, rows, update_existing=True):
+        '''
+        Save a batch of validated books (one dict per book, unique isbns):
+        COPY into a temp table, then one INSERT ... SELECT ... ON CONFLICT
+        (isbn), and commit. Existing books are updated, or skipped when
+        `update_existing` is false.
+        Returns (inserted isbns, updated isbns, {skipped isbn: reason}).
+        '''
+        session = self.db.session
+        staged = IMPORT_STAGING.c
+        try:
+            self._stage(rows)
+
+            # the stored copies, locked so the counter deltas stay exact
+            existing = {
+                r.isbn: r
+                for r in session.execute(
+                    select(Book.isbn, Book.total_copies, Book.available_copies)
+                    .join(IMPORT_STAGING, staged.isbn == Book.isbn)
+                    .order_by(Book.id)
+                    .with_for_update(of=Book, key_share=True)
+                )
+            }
+
+            skipped = {}
+            for row in rows:
+                old = existing.get(row["isbn"])
+                if not old:
+                    continue
+                if not update_existing:
+                    skipped[row["isbn"]] = "Book already exists!"
+                elif row["total_copies"] < old.total_copies - old.available_copies:
+                    skipped[row["isbn"]] = "Total copies cannot be less than borrowed copies"
+
+            if len(skipped) == len(rows):
+                session.rollback()
+                return [], [], skipped
+
+            source = select(*staged, staged.total_copies)
+            if skipped:
+                source = source.where(staged.isbn.not_in(list(skipped)))
+
+            statement = insert(Book).from_select([*IMPORT_COLUMNS, "available_copies"], source)
+            if update_existing:
+                new = statement.excluded
+                statement = statement.on_conflict_do_update(
+                    index_elements=[Book.isbn],
+                    set_={
+                        **{
+                            name: func.coalesce(new[name], Book.__table__.c[name])
+                            if name in OPTIONAL_COLUMNS else new[name]
+                            for name in IMPORT_COLUMNS if name != "isbn"
+                        },
+                        "available_copies": Book.available_copies + new.total_copies - Book.total_copies,
+                        "updated_at": func.now()
+                    }
+                )
+            else:
+                statement = statement.on_conflict_do_nothing(index_elements=[Book.isbn])
+
+            # xmax is 0 for a freshly inserted row version
+            saved = session.execute(statement.returning(
+                Book.isbn,
+                Book.total_copies,
+                Book.available_copies,
+                literal_column("xmax = 0")
+            )).all()
+
+            inserted, updated = [], []
+            totals = dict.fromkeys(("books", "copies", "available_copies", "out_of_stock_books"), 0)
+            for isbn, total, available, is_new in saved:
+                old = existing.get(isbn)
+                if is_new:
+                    inserted.append(isbn)
+                    totals["books"] += 1
+                    totals["copies"] += total
+                    totals["available_copies"] += available
+                    totals["out_of_stock_books"] += int(available <= 0)
+                else:
+                    updated.append(isbn)
+                    if old:
+                        totals["copies"] += total - old.total_copies
+                        totals["available_copies"] += available - old.available_copies
+                        totals["out_of_stock_books"] += int(available <= 0) - int(old.available_copies <= 0)
+
+            # inserted by someone else since the lock, without DO UPDATE
+            if len(saved) + len(skipped) < len(rows):
+                done = set(inserted) | set(updated)
+                for row in rows:
+                    if row["isbn"] not in done and row["isbn"] not in skipped:
+                        skipped[row["isbn"]] = "Book already exists!"
+
+            self.stats.bump(catalog_version=int(bool(saved)), **totals)
+            # the staged rows go with the commit (ON COMMIT DELETE ROWS)
+            session.commit()
+            return inserted, updated, skipped
+
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    # rebuild available copies and borrow counts from the borrowings
+    def reconcile_counters(self):
+        active_loans = (
+            select(func.count(Borrowing.id))
+            .where(
+                Borrowing.book_id == Book.id,
+                Borrowing.returned_at == None
+            )
+            .scalar_subquery()
+        )
+        all_loans = (
+            select(func.count(Borrowing.id))
+            .where(Borrowing.book_id == Book.id)
+            .scalar_subquery()
+        )
+
+        try:
+            result = self.db.session.execute(
+                Book.__table__.update()
+                .values(
+                    available_copies=Book.total_copies - active_loans,
+                    borrow_count=all_loans
+                )
+                .where(or_(
+                    Book.available_copies != Book.total_copies - active_loans,
+                    Book.borrow_count != all_loans
+                ))
+            )
+            self.db.session.commit()
+
+            # the dashboard totals were summed from the old values
+            if result.rowcount:
+                self.stats.rebuild()
+            return result.rowcount
+        
+        except SQLAlchemyError as e:
+            self.db.session.rollback()
+            raise e
@@ -1,40 +1,195 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timezone
+from sqlalchemy import Integer, and_, case, column, delete, exists, func, insert, or_, select, update, values
+from sqlalchemy.exc import SQLAlchemyError
+from datetime import datetime, timedelta, timezone
 
-from ..models import Borrowing, Book
+from ..models import Activity, Borrowing, Book, User
+from .stats_repository import StatsRepository
+
+BORROWING_STATUSES = ("active", "overdue", "returned")
+
+# loans a user may have out at once
+BORROWINGS_LIMIT = 5
 
 class BorrowingsRepository:
     def __init__(self, db: SQLAlchemy):
         self.db = db
+        self.stats = StatsRepository(db)
 
     def create(self, user_id, book_id, due_at):
+        '''
+        Borrow in one transaction: lock the borrower, check every rule in a
+        single query, then take a copy with a conditional UPDATE so two
+        borrowers can never get the last copy.
+        '''
+        session = self.db.session
+
+        # serializes one user's borrows (limit, duplicates), other users
+        # and other books are not blocked; the overdue sweeper waits too
+        user = session.execute(
+            select(User.id, User.overdue_loans, User.purge_requested_at)
+            .where(User.id == user_id)
+            .with_for_update(key_share=True)
+        ).first()
+
+        # after the lock, so this sees loans committed while waiting for it
+        available, loans, has_copy = self.eligibility(user_id, book_id)
+
+        error = None
+        if user is None or available is None:
+            session.rollback()
+            raise RuntimeError("Missing user or book")
+        elif user.purge_requested_at:
+            error = "Account is being deleted"
+        elif available <= 0:
+            error = "No copies left"
+        elif loans >= BORROWINGS_LIMIT:
+            error = "Borrowings limit reached"
+        elif user.overdue_loans > 0:
+            error = "Can't borrow a new book, overdue dates detected"
+        elif has_copy:
+            error = "Book already borrowed!"
+
+        if error:
+            session.rollback()
+            raise ValueError(error)
+
+        # reserve a copy only if one is still on the shelf, and never of a
+        # book waiting to be purged
+        left = session.execute(
+            update(Book)
+            .where(
+                Book.id == book_id,
+                Book.available_copies > 0,
+                Book.purge_requested_at == None
+            )
+            .values(
+                available_copies=Book.available_copies - 1,
+                borrow_count=Book.borrow_count + 1
+            )
+            .returning(Book.available_copies)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if left is None:
+            session.rollback()
+            raise ValueError("No copies left")
+
         new_borrowing = Borrowing(
             user_id=user_id,
             book_id=book_id,
             due_at=due_at
         )
+        session.add(new_borrowing)
+        session.flush()
+        self.stats.bump(
+            borrowings=1,
+            active_loans=1,
+            available_copies=-1,
+            out_of_stock_books=int(left == 0),
+            catalog_version=1,
+            daily={"borrowings": 1}
+        )
 
-        borrowed_book = Book.query.filter_by(id=book_id).first()
-        borrowed_book.total_copies -= 1
-
-        self.db.session.add(new_borrowing)
-        self.db.session.commit()
+        session.commit()
         return new_borrowing
 
-    def all(self):
-        return Borrowing.query.all()
-    
-    def active(self):
-        return Borrowing.query.filter(Borrowing.returned_at == None).all()
-    
-    def returned(self):
-        return Borrowing.query.filter(Borrowing.returned_at != None).all()
-    
-    def overdue(self):
-        return Borrowing.query.filter(
-            Borrowing.returned_at == None,
-            Borrowing.due_at > datetime.now(timezone.utc)
-        ).all()
+    # (copies available, loans out, has this book) in one query, the
+    # loans answered from ix_borrowings_user_id_active
+    def eligibility(self, user_id, book_id):
+        active = and_(Borrowing.user_id == user_id, Borrowing.returned_at == None)
+        return self.db.session.execute(select(
+            select(Book.available_copies).where(Book.id == book_id).scalar_subquery(),
+            select(func.count(Borrowing.id)).where(active).scalar_subquery(),
+            exists().where(active, Borrowing.book_id == book_id)
+        )).one()
+
+    # active / overdue / returned, as marked by the overdue sweeper
+    def status_expression(self):
+        return case(
+            (Borrowing.returned_at != None, "returned"),
+            (Borrowing.overdue_at != None, "overdue"),
+            else_="active"
+        )
+
+    # the same statuses as plain conditions, which the indexes can serve;
+    # "unreturned" is every loan still out, overdue or not
+    def status_filter(self, status):
+        return {
+            "unreturned": Borrowing.returned_at == None,
+            "active": and_(Borrowing.returned_at == None, Borrowing.overdue_at == None),
+            "overdue": and_(Borrowing.returned_at == None, Borrowing.overdue_at != None),
+            "returned": Borrowing.returned_at != None,
+        }[status]
+
+    # one joined query per page, rows carry the user, book and status
+    def listing(self, status=None, q=None, page=1, per_page=25):
+        status_col = self.status_expression()
+
+        query = (
+            self.db.session.query(
+                Borrowing.id,
+                User.username.label("user"),
+                Book.title.label("book"),
+                Borrowing.borrowed_at,
+                Borrowing.due_at,
+                Borrowing.returned_at,
+                status_col.label("status")
+            )
+            .join(User, Borrowing.user_id == User.id)
+            .join(Book, Borrowing.book_id == Book.id)
+        )
+
+        if status:
+            query = query.filter(self.status_filter(status))
+
+        if q:
+            pattern = f"%{q}%"
+            query = query.filter(or_(
+                User.username.ilike(pattern),
+                Book.title.ilike(pattern)
+            ))
+
+        query = query.order_by(Borrowing.borrowed_at.desc(), Borrowing.id.desc())
+
+        return query.paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False
+        )
+        
+    # a user's loans with the book columns the profile shows
+    def _user_listing(self, user_id):
+        return (
+            self.db.session.query(
+                Borrowing.id,
+                Borrowing.book_id,
+                Book.title,
+                Book.author,
+                Borrowing.borrowed_at,
+                Borrowing.due_at,
+                Borrowing.returned_at,
+                self.status_expression().label("status")
+            )
+            .join(Book, Borrowing.book_id == Book.id)
+            .filter(Borrowing.user_id == user_id)
+        )
+
+    # not returned yet, bounded by the borrowings limit
+    def current_by_user(self, user_id):
+        return (
+            self._user_listing(user_id)
+            .filter(Borrowing.returned_at == None)
+            .order_by(Borrowing.due_at.asc(), Borrowing.id.asc())
+            .all()
+        )
+
+    def history_by_user(self, user_id, page=1, per_page=20):
+        return (
+            self._user_listing(user_id)
+            .filter(Borrowing.returned_at != None)
+            .order_by(Borrowing.returned_at.desc(), Borrowing.id.desc())
+            .paginate(page=page, per_page=per_page, error_out=False)
+        )
         
     def by_id(self, id):
         query = Borrowing.query.get(id)
@@ -63,8 +218,7 @@ class BorrowingsRepository:
     def overdue_by_user(self, user_id):
         return Borrowing.query.filter(
             Borrowing.user_id == user_id,
-            Borrowing.returned_at == None,
-            Borrowing.due_at > datetime.now(timezone.utc)
+            self.status_filter("overdue")
         ).all()
                 
     def has_copy(self, user_id, book_id):
@@ -77,24 +231,14 @@ class BorrowingsRepository:
             return True
         return False
 
+    # kept up to date by the overdue sweeper, one primary key lookup
     def has_overdue(self, user_id):
-        now = datetime.now(timezone.utc)
-        return Borrowing.query.filter(
-            Borrowing.user_id == user_id,\
-            Borrowing.returned_at == None,\
-            Borrowing.due_at < now
-        ).count() > 0
+        return (self.db.session.execute(
+            select(User.overdue_loans).where(User.id == user_id)
+        ).scalar() or 0) > 0
 
     def is_overdue(self, borrowing):
-        now = datetime.now(timezone.utc)
-        if borrowing.due_at.tzinfo is None:
-            due = borrowing.due_at.replace(tzinfo=timezone.utc)
-        due = borrowing.due_at.astimezone(timezone.utc)
-            
-        return (
-            borrowing.returned_at is None\
-            and now > due
-        )
+        return borrowing.returned_at is None and borrowing.overdue_at is not None
 
     def is_active(self, borrowing):
         return borrowing.returned_at is None
@@ -103,54 +247,409 @@ class BorrowingsRepository:
         return Borrowing.query.filter(
             Borrowing.user_id == user_id, 
             Borrowing.returned_at == None
-        ).count() >= 5
+        ).count() >= BORROWINGS_LIMIT
 
     def return_book(self, borrowing_id):
+        # locked and re-read: the service may have loaded it already, and the
+        # sweeper may have marked it since; no mark can land after the lock
         borrowing = Borrowing.query.filter(
             Borrowing.id == borrowing_id, 
             Borrowing.returned_at == None
-        ).first()
+        ).with_for_update().populate_existing().first()
         if not borrowing:
             raise ValueError("Book is returned or not found")
 
         borrowing.returned_at = datetime.now(timezone.utc)
-
-        book_copies = Book.query.filter_by(id=borrowing.book_id).first()
-        book_copies.total_copies += 1
+        overdue = self._adjust_overdue({borrowing.user_id: -1} if borrowing.overdue_at else {})
+        released = self._release_copies({borrowing.book_id: 1})
+        self.stats.bump(active_loans=-1, daily={"returns": 1}, **overdue, **released)
 
         self.db.session.commit()
         return borrowing
 
+    def _lock_many(self, ids):
+        '''
+        Lock the given borrowings in id order and sort them out:
+        returns ({id: book_id} still active, returned ids, missing ids).
+        '''
+        rows = self.db.session.execute(
+            select(Borrowing.id, Borrowing.book_id, Borrowing.returned_at)
+            .where(Borrowing.id.in_(ids))
+            .order_by(Borrowing.id)
+            .with_for_update()
+        ).all()
+
+        active = {r.id: r.book_id for r in rows if r.returned_at is None}
+        returned = {r.id for r in rows if r.returned_at is not None}
+        missing = set(ids) - active.keys() - returned
+        return active, returned, missing
+
+    def return_many(self, ids):
+        '''
+        Return a batch of borrowings in one transaction: one UPDATE for the
+        loans, one for the stock, one activity insert (each return logged
+        under its borrower, as a single return is), one commit.
+        Returns (returned {id: book_id}, already returned ids, missing ids,
+        borrower ids).
+        '''
+        session = self.db.session
+        try:
+            active, returned, missing = self._lock_many(ids)
+            if not active:
+                session.rollback()
+                return active, returned, missing, set()
+
+            now = datetime.now(timezone.utc)
+            loans = session.execute(
+                update(Borrowing)
+                .where(Borrowing.id.in_(active))
+                .values(returned_at=now)
+                .returning(Borrowing.user_id, Borrowing.book_id, Borrowing.overdue_at)
+                .execution_options(synchronize_session=False)
+            ).all()
+
+            overdue = {}
+            for borrower, _, overdue_at in loans:
+                if overdue_at:
+                    overdue[borrower] = overdue.get(borrower, 0) - 1
+            overdue = self._adjust_overdue(overdue)
+
+            per_book = {}
+            for book_id in active.values():
+                per_book[book_id] = per_book.get(book_id, 0) + 1
+            released = self._release_copies(per_book)
+
+            session.execute(insert(Activity), [
+                {
+                    "activity_type": "RETURN_BOOK",
+                    "user_id": borrower,
+                    "target_id": book_id,
+                    "created_at": now
+                }
+                for borrower, book_id, _ in loans
+            ])
+
+            self.stats.bump(
+                active_loans=-len(active),
+                daily={"returns": len(active)},
+                **overdue,
+                **released
+            )
+            session.commit()
+            return active, returned, missing, {borrower for borrower, _, _ in loans}
+
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    def extend_many(self, ids, new_due_date=None, days=None):
+        '''
+        Move the due date of a batch of active borrowings, either to
+        `new_due_date` or `days` later than it is now, in one UPDATE.
+        Returns (extended {id: due_at}, already returned ids, missing ids,
+        borrower ids).
+        '''
+        session = self.db.session
+        try:
+            active, returned, missing = self._lock_many(ids)
+            if not active:
+                session.rollback()
+                return {}, returned, missing, set()
+
+            due_at = new_due_date
+            if days is not None:
+                due_at = Borrowing.due_at + timedelta(days=days)
+
+            extended = session.execute(
+                update(Borrowing)
+                .where(Borrowing.id.in_(active))
+                .values(due_at=due_at)
+                .returning(Borrowing.id, Borrowing.due_at, Borrowing.user_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+
+            # overdue loans now due in the future are no longer overdue
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            no_longer = [id for id, due, _ in extended if due > now]
+            if no_longer:
+                borrowers = session.execute(
+                    update(Borrowing)
+                    .where(Borrowing.id.in_(no_longer), Borrowing.overdue_at != None)
+                    .values(overdue_at=None)
+                    .returning(Borrowing.user_id)
+                    .execution_options(synchronize_session=False)
+                ).scalars().all()
+
+                overdue = {}
+                for borrower in borrowers:
+                    overdue[borrower] = overdue.get(borrower, 0) - 1
+                self.stats.bump(**self._adjust_overdue(overdue))
+
+            session.commit()
+            return (
+                {id: due for id, due, _ in extended},
+                returned,
+                missing,
+                {borrower for _, _, borrower in extended}
+            )
+
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    def mark_overdue(self, batch_size=1000):
+        '''
+        Mark one batch of loans that went past their due date, oldest due
+        first: flag them, add them to their borrowers' overdue counts and
+        log an OVERDUE_BOOK activity for each, in one transaction. Loans
+        locked by a return, an extension or another sweeper are skipped
+        and picked up by a later batch. Returns how many were marked.
+        '''
+        session = self.db.session
+        now = datetime.now(timezone.utc)
+        try:
+            # served by ix_borrowings_due_at_pending
+            due = (
+                select(Borrowing.id)
+                .where(
+                    Borrowing.returned_at == None,
+                    Borrowing.overdue_at == None,
+                    Borrowing.due_at < now
+                )
+                .order_by(Borrowing.due_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            marked = session.execute(
+                update(Borrowing)
+                .where(Borrowing.id.in_(due))
+                .values(overdue_at=now)
+                .returning(Borrowing.user_id, Borrowing.book_id)
+                .execution_options(synchronize_session=False)
+            ).all()
+            if not marked:
+                session.rollback()
+                return 0
+
+            overdue = {}
+            for user_id, _ in marked:
+                overdue[user_id] = overdue.get(user_id, 0) + 1
+            overdue = self._adjust_overdue(overdue)
+
+            session.execute(insert(Activity), [
+                {
+                    "activity_type": "OVERDUE_BOOK",
+                    "user_id": user_id,
+                    "target_id": book_id,
+                    "created_at": now
+                }
+                for user_id, book_id in marked
+            ])
+
+            self.stats.bump(**overdue)
+            session.commit()
+            return len(marked)
+
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    def resync_overdue(self):
+        '''
+        Recount every user's overdue loans from the borrowings and fix the
+        ones that drifted. Writes to borrowings wait meanwhile, since every
+        change to the counts comes with one. Returns the users fixed.
+        '''
+        session = self.db.session
+        try:
+            session.connection().exec_driver_sql("LOCK TABLE borrowings IN SHARE MODE")
+
+            actual = (
+                select(func.count(Borrowing.id))
+                .where(Borrowing.user_id == User.id, self.status_filter("overdue"))
+                .scalar_subquery()
+            )
+            fixed = session.execute(
+                update(User)
+                .where(User.overdue_loans != actual)
+                .values(overdue_loans=actual)
+                .returning(User.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+
+            session.commit()
+            return len(fixed)
+
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
     def update_due_date(self, id, new_due_date):
-        borrowing = Borrowing.query.get(id)
+        # re-read under the lock, overdue_at may be newer than the loaded copy
+        borrowing = (
+            Borrowing.query.filter(Borrowing.id == id)
+            .with_for_update()
+            .populate_existing()
+            .first()
+        )
         if not borrowing:
             raise ValueError("Borrowing not found")
 
         borrowing.due_at = new_due_date
+        if self.is_overdue(borrowing) and new_due_date > datetime.now(timezone.utc):
+            borrowing.overdue_at = None
+            self.stats.bump(**self._adjust_overdue({borrowing.user_id: -1}))
         self.db.session.commit()
         return borrowing
 
     def delete_by_id(self, id):
-        query = Borrowing.query.get(id)
+        # re-read under the lock, overdue_at may be newer than the loaded copy
+        query = (
+            Borrowing.query.filter(Borrowing.id == id)
+            .with_for_update()
+            .populate_existing()
+            .first()
+        )
         if not query:
             raise ValueError("Borrowing not found")
 
+        active = self.is_active(query)
+        overdue = self._adjust_overdue({query.user_id: -1} if self.is_overdue(query) else {})
+        released = self._release_copies({query.book_id: int(active)})
+
         self.db.session.delete(query)
-        self.db.session.commit()
-        return True
+        self.db.session.flush()
+        self.stats.bump(borrowings=-1, active_loans=-int(active), **overdue, **released)
 
-    def delete_by_user_id(self, user_id):
-        borrowings = Borrowing.query.filter_by(user_id=user_id).all()
-        
-        for b in borrowings:
-            self.db.session.delete(b)
         self.db.session.commit()
-        
         return True
 
-    def delete_by_book_id(self, book_id):
-        borrowings = Borrowing.query.filter_by(book_id=book_id).all()
-        for b in borrowings:
-            self.db.session.delete(b)
-        self.db.session.commit()
-        return {"message": f"deleted {len(borrowings)} borrowing records"}
+    def lock_where(self, condition):
+        '''lock the matching borrowings in id order, as returns and the sweeper do'''
+        self.db.session.execute(
+            select(Borrowing.id)
+            .where(condition)
+            .order_by(Borrowing.id)
+            .with_for_update()
+        )
+
+    def _delete_where(self, condition, limit=None, commit=True):
+        '''
+        Delete the matching borrowings (at most `limit`) in one statement,
+        put the copies still out back on the shelf and move the counters.
+        Returns how many went.
+        '''
+        session = self.db.session
+        if limit:
+            condition = Borrowing.id.in_(
+                select(Borrowing.id).where(condition).order_by(Borrowing.id).limit(limit)
+            )
+
+        try:
+            rows = session.execute(
+                delete(Borrowing)
+                .where(condition)
+                .returning(Borrowing.user_id, Borrowing.book_id, Borrowing.returned_at, Borrowing.overdue_at)
+                .execution_options(synchronize_session=False)
+            ).all()
+
+            released, overdue = {}, {}
+            for user_id, book_id, returned_at, overdue_at in rows:
+                if returned_at is None:
+                    released[book_id] = released.get(book_id, 0) + 1
+                    if overdue_at:
+                        overdue[user_id] = overdue.get(user_id, 0) - 1
+
+            overdue = self._adjust_overdue(overdue)
+            copies = self._release_copies(released)
+            self.stats.bump(
+                borrowings=-len(rows),
+                active_loans=-sum(released.values()),
+                **overdue,
+                **copies
+            )
+
+            if commit:
+                session.commit()
+            return len(rows)
+
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    def delete_by_user_id(self, user_id, limit=None, commit=True):
+        return self._delete_where(Borrowing.user_id == user_id, limit, commit)
+
+    def delete_by_book_id(self, book_id, limit=None, commit=True):
+        return self._delete_where(Borrowing.book_id == book_id, limit, commit)
+
+    # move the borrowers' overdue counts, {user_id: change}, in one statement,
+    # and return the matching change to the dashboard counters
+    def _adjust_overdue(self, changes):
+        changes = {user_id: change for user_id, change in changes.items() if change}
+        if not changes:
+            return {"overdue_loans": 0}
+
+        # users in id order, like the books below; the counts read under
+        # the lock are what the update starts from
+        before = dict(self.db.session.execute(
+            select(User.id, User.overdue_loans)
+            .where(User.id.in_(changes))
+            .order_by(User.id)
+            .with_for_update(key_share=True)
+        ).all())
+
+        rows = values(
+            column("user_id", Integer),
+            column("change", Integer),
+            name="changes"
+        ).data(sorted(changes.items()))
+
+        after = self.db.session.execute(
+            update(User)
+            .where(User.id == rows.c.user_id)
+            .values(overdue_loans=func.greatest(User.overdue_loans + rows.c.change, 0))
+            .returning(User.id, User.overdue_loans)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+        # a drifted count is clamped at 0, the dashboard gets what was applied
+        return {"overdue_loans": sum(count - before[user_id] for user_id, count in after)}
+
+    # put copies back on the shelf, {book_id: count}, in one statement,
+    # and return the matching change to the dashboard counters
+    def _release_copies(self, released):
+        released = {book_id: count for book_id, count in released.items() if count}
+        if not released:
+            return {"available_copies": 0, "out_of_stock_books": 0}
+
+        # lock the books in id order first, so two batches touching the
+        # same titles can't deadlock
+        if len(released) > 1:
+            self.db.session.execute(
+                select(Book.id)
+                .where(Book.id.in_(released))
+                .order_by(Book.id)
+                .with_for_update(key_share=True)
+            )
+
+        rows = values(
+            column("book_id", Integer),
+            column("count", Integer),
+            name="released"
+        ).data(sorted(released.items()))
+
+        results = self.db.session.execute(
+            update(Book)
+            .where(Book.id == rows.c.book_id)
+            .values(available_copies=Book.available_copies + rows.c.count)
+            .returning(Book.available_copies, rows.c.count)
+            .execution_options(synchronize_session=False)
+        ).all()
+        restocked = sum(1 for left, count in results if left > 0 and left - count <= 0)
+
+        return {
+            "available_copies": sum(released.values()),
+            "out_of_stock_books": -restocked,
+            "catalog_version": 1
+        }
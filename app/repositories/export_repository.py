@@ -0,0 +1,79 @@
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects.postgresql import insert
+
+from ..models import Book, Borrowing, Activity, Favorite, ExportMark
+
+# table -> (model, column that moves whenever a row is added or changed)
+EXPORT_TABLES = {
+    "books": (Book, Book.updated_at),
+    "borrowings": (Borrowing, Borrowing.updated_at),
+    "activities": (Activity, Activity.created_at),
+    "favorites": (Favorite, Favorite.created_at),
+}
+
+class ExportRepository:
+    def __init__(self, db: SQLAlchemy):
+        self.db = db
+
+    def columns(self, table):
+        model, _ = EXPORT_TABLES[table]
+        return [c for c in model.__table__.columns if not c.info.get("hidden")]
+
+    def rows(self, table, since=None, until=None, chunk_size=1000):
+        '''
+        Every row changed in [since, until), oldest first, as plain tuples.
+        Read through a server-side cursor `chunk_size` rows at a time, so
+        memory stays flat whatever the table size.
+        '''
+        _, changed_at = EXPORT_TABLES[table]
+        columns = self.columns(table)
+
+        query = select(*columns).order_by(changed_at, columns[0].table.c.id)
+        if since:
+            query = query.where(changed_at >= since)
+        if until:
+            query = query.where(changed_at < until)
+
+        result = self.db.session.execute(
+            query.execution_options(yield_per=chunk_size)
+        )
+        try:
+            for partition in result.partitions():
+                yield from partition
+        finally:
+            result.close()
+
+    def horizon(self, lag):
+        '''
+        Where an incremental export may end: `lag` seconds ago by the
+        database clock, and never past the start of a transaction still
+        open, whose rows carry its start time but aren't visible yet.
+        Naive UTC, like the tables.
+        '''
+        return self.db.session.execute(text("""
+            SELECT least(clock_timestamp() - make_interval(secs => :lag), min(xact_start))
+                AT TIME ZONE 'UTC'
+            FROM pg_stat_activity
+            WHERE datname = current_database()
+              AND backend_type = 'client backend'
+              AND pid != pg_backend_pid()
+              AND xact_start IS NOT NULL
+        """), {"lag": lag}).scalar()
+
+    def mark(self, feed):
+        return self.db.session.execute(
+            select(ExportMark.exported_until).where(ExportMark.feed == feed)
+        ).scalar()
+
+    def save_mark(self, feed, exported_until):
+        statement = insert(ExportMark).values(feed=feed, exported_until=exported_until)
+        statement = statement.on_conflict_do_update(
+            index_elements=[ExportMark.feed],
+            set_={
+                "exported_until": statement.excluded.exported_until,
+                "updated_at": func.now()
+            }
+        )
+        self.db.session.execute(statement)
+        self.db.session.commit()
@@ -1,6 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
 
-from ..models import Favorite
+from ..models import Favorite, Book
 
 class FavoritesRepository():
     def __init__(self, db: SQLAlchemy):
@@ -13,7 +15,14 @@ class FavoritesRepository():
         )
 
         self.db.session.add(new)
-        self.db.session.commit()
+        # the unique index settles two concurrent requests
+        try:
+            self.db.session.commit()
+        except IntegrityError as e:
+            self.db.session.rollback()
+            if getattr(e.orig.diag, "constraint_name", None) == "ix_favorites_user_id_book_id":
+                raise ValueError("Already favorited")
+            raise
         return new
 
     def all(self):
@@ -26,6 +35,16 @@ class FavoritesRepository():
             .all()
         )
 
+    # favorites with their book title, in one query
+    def titles_by_user(self, user_id):
+        return (
+            self.db.session.query(Favorite.id, Favorite.book_id, Book.title)
+            .join(Book, Favorite.book_id == Book.id)
+            .filter(Favorite.user_id == user_id)
+            .order_by(Favorite.created_at.desc(), Favorite.id.desc())
+            .all()
+        )
+
     def by_book(self, book_id):
         return (
             Favorite.query
@@ -52,9 +71,21 @@ class FavoritesRepository():
         except:
             return False
     
-    def delete_by_user(self, user_id):
-        favs = Favorite.query.filter_by(user_id=user_id).all()
+    def _delete_where(self, condition, limit=None, commit=True):
+        if limit:
+            condition = Favorite.id.in_(select(Favorite.id).where(condition).limit(limit))
+        deleted = self.db.session.execute(
+            delete(Favorite)
+            .where(condition)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if commit:
+            self.db.session.commit()
+        return deleted
+
+    # at most `limit` of them when given, returns how many went
+    def delete_by_user(self, user_id, limit=None, commit=True):
+        return self._delete_where(Favorite.user_id == user_id, limit, commit)
 
-        for fav in favs:
-            self.db.session.delete(fav)
-        self.db.session.commit()
\ No newline at end of file
+    def delete_by_book(self, book_id, limit=None, commit=True):
+        return self._delete_where(Favorite.book_id == book_id, limit, commit)
\ No newline at end of file
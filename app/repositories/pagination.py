@@ -0,0 +1,92 @@
+from sqlalchemy import tuple_
+from datetime import datetime
+import base64
+import json
+
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    def __iter__(self):
+        return iter(self.items)
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+def _load(value):
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+def encode_cursor(scope, values, backward=False):
+    payload = {"s": scope, "k": [_dump(v) for v in values], "b": backward}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(scope, cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = [_load(v) for v in payload["k"]]
+        backward = bool(payload["b"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    # a cursor only makes sense for the ordering it was created with
+    if payload.get("s") != scope:
+        raise ValueError("Cursor does not match the requested sort")
+
+    return values, backward
+
+def keyset_paginate(query, keys, descending, per_page, cursor=None, scope=""):
+    '''
+    Seek pagination over `keys` (the last key must be unique, e.g. id).
+    Each page is one indexed range scan, however deep it is.
+    '''
+    values, backward = decode_cursor(scope, cursor) if cursor else (None, False)
+
+    # walking back over a descending order is an ascending scan
+    reverse = descending != backward
+    if values is not None:
+        row, bound = tuple_(*keys), tuple_(*values)
+        query = query.filter(row < bound if reverse else row > bound)
+
+    query = query.order_by(*(k.desc() if reverse else k.asc() for k in keys))
+    rows = query.limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backward:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage(rows)
+
+    def key_of(row):
+        return [getattr(row, k.key) for k in keys]
+
+    has_next = has_more if not backward else True
+    has_prev = has_more if backward else values is not None
+
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(scope, key_of(rows[-1])) if has_next else None,
+        prev_cursor=encode_cursor(scope, key_of(rows[0]), backward=True) if has_prev else None
+    )
+
+# planner's row estimate, no scan of the table
+def estimate_count(session, query):
+    statement = query.order_by(None).statement
+    compiled = statement.compile(dialect=session.get_bind().dialect)
+
+    plan = session.connection().exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + str(compiled),
+        compiled.params
+    ).scalar()
+
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -0,0 +1,149 @@
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime, timezone
+import random
+
+from ..models import StatCounter, User, Book, Borrowing
+
+TOTAL = "total"
+SHARDS = 8
+
+# counters kept per UTC day, everything else is a running total
+DAILY_COUNTERS = ("new_users", "borrowings", "returns")
+TOTAL_COUNTERS = (
+    "users",
+    "books",
+    "copies",
+    "available_copies",
+    "out_of_stock_books",
+    "borrowings",
+    "active_loans",
+    "overdue_loans"
+)
+
+# bumped by every transaction that writes books, so its total moves when
+# the change commits; catalog ETags are built from it. Not a dashboard
+# figure, and a rebuild carries it forward instead of resetting it
+CATALOG_VERSION = "catalog_version"
+
+def today():
+    return datetime.now(timezone.utc).date().isoformat()
+
+class StatsRepository:
+    def __init__(self, db: SQLAlchemy):
+        self.db = db
+
+    def bump(self, daily=None, **totals):
+        '''
+        Add to the counters inside the caller's transaction, so they are
+        committed (or rolled back) together with the change they count.
+        Call it right before the commit: counter rows are locked last and
+        always in the same order, which keeps writers from deadlocking.
+        '''
+        shard = random.randrange(SHARDS)
+        day = today()
+
+        rows = [(TOTAL, name, delta) for name, delta in totals.items() if delta]
+        rows += [(day, name, delta) for name, delta in (daily or {}).items() if delta]
+        if not rows:
+            return
+
+        statement = insert(StatCounter).values([
+            {"period": period, "name": name, "shard": shard, "value": delta}
+            for period, name, delta in sorted(rows)
+        ])
+        statement = statement.on_conflict_do_update(
+            index_elements=[StatCounter.period, StatCounter.name, StatCounter.shard],
+            set_={"value": StatCounter.value + statement.excluded.value}
+        )
+        self.db.session.execute(statement)
+
+    # totals plus today's counts, a handful of rows whatever the data size
+    def snapshot(self):
+        rows = (
+            self.db.session.query(
+                StatCounter.period,
+                StatCounter.name,
+                func.sum(StatCounter.value)
+            )
+            .filter(StatCounter.period.in_([TOTAL, today()]))
+            .group_by(StatCounter.period, StatCounter.name)
+            .all()
+        )
+
+        totals = dict.fromkeys(TOTAL_COUNTERS, 0)
+        daily = dict.fromkeys(DAILY_COUNTERS, 0)
+        for period, name, value in rows:
+            counters = totals if period == TOTAL else daily
+            if name in counters:
+                counters[name] = int(value)
+
+        return totals, daily
+
+    # daily counts can only be recovered for rows that still exist
+    def rebuild(self):
+        session = self.db.session
+
+        # writers wait on the lock, so no change is counted twice or missed
+        session.connection().exec_driver_sql(
+            "LOCK TABLE stats_counters IN SHARE ROW EXCLUSIVE MODE"
+        )
+        version = session.query(func.coalesce(func.sum(StatCounter.value), 0)).filter(
+            StatCounter.period == TOTAL,
+            StatCounter.name == CATALOG_VERSION
+        ).scalar()
+        session.execute(StatCounter.__table__.delete())
+
+        books = session.query(
+            func.count(Book.id),
+            func.coalesce(func.sum(Book.total_copies), 0),
+            func.coalesce(func.sum(Book.available_copies), 0),
+            func.count(Book.id).filter(Book.available_copies <= 0)
+        ).one()
+        borrowings = session.query(
+            func.count(Borrowing.id),
+            func.count(Borrowing.id).filter(Borrowing.returned_at == None),
+            func.count(Borrowing.id).filter(
+                Borrowing.returned_at == None,
+                Borrowing.overdue_at != None
+            )
+        ).one()
+
+        totals = {
+            "users": session.query(func.count(User.id)).scalar(),
+            "books": books[0],
+            "copies": books[1],
+            "available_copies": books[2],
+            "out_of_stock_books": books[3],
+            "borrowings": borrowings[0],
+            "active_loans": borrowings[1],
+            "overdue_loans": borrowings[2]
+        }
+        # moved on, the tags handed out before must not come back
+        totals[CATALOG_VERSION] = version + 1
+        rows = [(TOTAL, name, value) for name, value in totals.items()]
+
+        daily = {
+            "new_users": User.created_at,
+            "borrowings": Borrowing.borrowed_at,
+            "returns": Borrowing.returned_at
+        }
+        for name, column in daily.items():
+            day = func.to_char(column, "YYYY-MM-DD")
+            counts = (
+                session.query(day, func.count())
+                .filter(column != None)
+                .group_by(day)
+                .all()
+            )
+            rows += [(period, name, value) for period, value in counts]
+
+        if rows:
+            session.execute(insert(StatCounter).values([
+                {"period": period, "name": name, "shard": 0, "value": int(value)}
+                for period, name, value in rows
+            ]))
+
+        session.commit()
+        return len(rows)
@@ -1,11 +1,20 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.exc import SQLAlchemyError
 
-from ..models import User
+from ..models import Activity, Borrowing, Favorite, User
+from .activities_repository import ActivitiesRepository
+from .borrowings_repository import BorrowingsRepository
+from .favorites_repository import FavoritesRepository
+from .stats_repository import StatsRepository
 
 class UsersRepository:
     def __init__(self, db: SQLAlchemy):
         self.db = db
+        self.stats = StatsRepository(db)
+        self.borrowings = BorrowingsRepository(db)
+        self.favorites = FavoritesRepository(db)
+        self.activities = ActivitiesRepository(db)
 
     def create(self, username, email, password):
         new_user: User = User(
@@ -14,6 +23,9 @@ class UsersRepository:
             password=password
         )
         self.db.session.add(new_user)
+        self.db.session.flush()
+        self.stats.bump(users=1, daily={"new_users": 1})
+
         self.db.session.commit()
         return new_user
         
@@ -59,11 +71,84 @@ class UsersRepository:
             raise e
     
     def delete(self, id):
-        user = User.query.get(id)
+        '''
+        Delete the user with their borrowings, favorites and activities in
+        one transaction of set-based DELETEs. Loans still out go back on
+        the shelf. Locks borrowings, then the user, then the books, the
+        order returns and the overdue sweeper take them in.
+        '''
+        session = self.db.session
+        try:
+            self.borrowings.lock_where(Borrowing.user_id == id)
+            user = session.execute(
+                select(User.id).where(User.id == id).with_for_update()
+            ).first()
+            if user is None:
+                session.rollback()
+                return False
 
-        print(user)
-        
-        self.db.session.delete(user)
+            self.borrowings.delete_by_user_id(id, commit=False)
+            self.favorites.delete_by_user(id, commit=False)
+            self.activities.delete_by_user(id, commit=False)
+
+            session.execute(
+                delete(User)
+                .where(User.id == id)
+                .execution_options(synchronize_session=False)
+            )
+            self.stats.bump(users=-1)
+
+            session.commit()
+            return True
+
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    # rows hanging off the user, counted up to `cap` per table
+    def history_size(self, id, cap):
+        return sum(
+            self.db.session.execute(
+                select(func.count()).select_from(
+                    select(1).where(column == id).limit(cap).subquery()
+                )
+            ).scalar()
+            for column in (Borrowing.user_id, Favorite.user_id, Activity.user_id)
+        )
+
+    # stop new loans now, the purger deletes the rest in batches
+    def request_purge(self, id):
+        self.db.session.execute(
+            update(User)
+            .where(User.id == id, User.purge_requested_at == None)
+            .values(purge_requested_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
         self.db.session.commit()
-        return True
 
+    def pending_purges(self):
+        return self.db.session.execute(
+            select(User.id)
+            .where(User.purge_requested_at != None)
+            .order_by(User.purge_requested_at, User.id)
+        ).scalars().all()
+
+    def purge_batch(self, id, batch_size):
+        '''
+        Delete up to `batch_size` of the user's borrowings, favorites and
+        activities in one short transaction. Returns how many rows went,
+        0 once only the user row is left.
+        '''
+        session = self.db.session
+        try:
+            deleted = (
+                self.borrowings.delete_by_user_id(id, limit=batch_size, commit=False)
+                + self.favorites.delete_by_user(id, limit=batch_size, commit=False)
+                + self.activities.delete_by_user(id, limit=batch_size, commit=False)
+            )
+            session.commit()
+            return deleted
+
+        except SQLAlchemyError:
+            session.rollback()
+            raise
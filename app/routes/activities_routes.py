@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 import traceback
 
 from .dependencies.deps import activity_service, db
@@ -10,12 +10,23 @@ def get_all_activities():
     service = activity_service(db)
     
     try:
-        acts = service.get_all()
-        return jsonify([a.to_json() for a in acts]), 200
+        acts = service.get_feed(
+            cursor=request.args.get("cursor", type=str) or None,
+            per_page=request.args.get("per_page", default=50, type=int),
+            activity_type=request.args.get("type", type=str),
+            user_id=request.args.get("user_id", type=int),
+            since=request.args.get("since", type=str),
+            until=request.args.get("until", type=str)
+        )
+
+        return jsonify({
+            "activities": service.serialize_feed(acts.items),
+            "next_cursor": acts.next_cursor,
+            "prev_cursor": acts.prev_cursor
+        }), 200
     
-    except ValueError:
-        traceback.print_exc()
-        return jsonify({"type": "error", "msg": "Value error"}), 400
+    except ValueError as e:
+        return jsonify({"type": "error", "msg": str(e)}), 400
     except Exception:
         traceback.print_exc()
         return jsonify({"type": "error", "msg": "Internal server error"}), 500
@@ -6,6 +6,7 @@ from google_auth_oauthlib.flow import Flow
 from google.oauth2 import id_token
 
 from .dependencies.deps import user_service, token_required, optional_auth, db, activity_service
+from ..passwords import HasherBusy
 
 auth_routes = Blueprint("auth_routes", __name__)
 
@@ -71,6 +72,9 @@ def signup():
     except ValueError as e:
         return jsonify({"type": "error", "msg": str(e)}), 400
     
+    except HasherBusy as e:
+        return jsonify({"type": "error", "msg": str(e)}), 503, {"Retry-After": "1"}
+    
     except Exception:
         import traceback
         traceback.print_exc()
@@ -137,6 +141,9 @@ def signin():
         traceback.print_exc()
         return jsonify({"type": "error", "msg": str(e)}), 400
     
+    except HasherBusy as e:
+        return jsonify({"type": "error", "msg": str(e)}), 503, {"Retry-After": "1"}
+    
     except Exception:
         import traceback
         traceback.print_exc()
@@ -253,7 +260,7 @@ def signout():
 def me():
     return jsonify({
         "authenticated": True,
-        "user": request.user,
+        "user": g.claims,
     })
 
 # returns whether the user is authenticated or not
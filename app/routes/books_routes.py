@@ -1,9 +1,13 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 from werkzeug.utils import secure_filename
+import io
 import os
 
 from .dependencies.deps import admin_required
-from .dependencies.deps import book_service
+from .dependencies.deps import book_service, book_import_service
+from ..services.book_import_service import import_format
+from ..services.book_service import DELETE_MODES
+from ..conditional import cacheable, make_etag, not_modified
 from ..extentions import db
 
 books_routes = Blueprint("books_routes", __name__)
@@ -58,14 +62,75 @@ def Add_book():
         traceback.print_exc()
         return jsonify({"type": "error", "msg": str(e)}), 500
 
-# get all books for admin
+# load a CSV / JSONL catalog file, streamed in batches
+@books_routes.route("/import", methods=["POST"])
+@admin_required
+def import_books():
+    try:
+        upload = request.files.get("file")
+        if not upload:
+            raise ValueError("Missing file")
+
+        fmt = request.form.get("format") or import_format(upload.filename)
+        if not fmt:
+            raise ValueError("Format must be 'csv' or 'jsonl'")
+
+        on_conflict = request.form.get("on_conflict", "update")
+        if on_conflict not in ("update", "skip"):
+            raise ValueError("On conflict must be 'update' or 'skip'")
+
+        service = book_import_service(db, batch_size=current_app.config["BOOK_IMPORT_BATCH_SIZE"])
+        report = service.run(
+            io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline=""),
+            fmt,
+            update_existing=on_conflict == "update"
+        )
+
+        return jsonify({
+            "type": "success",
+            "msg": f"{report['inserted']} book(s) added, {report['updated']} updated, {report['rejected']} rejected",
+            **report
+        }), 200
+
+    except UnicodeDecodeError:
+        return jsonify({"type": "error", "msg": "File must be UTF-8 encoded"}), 400
+    except ValueError as e:
+        return jsonify({"type": "error", "msg": str(e)}), 400
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({"type": "error", "msg": str(e)}), 500
+
+# get books for admin (paginated, sortable, filterable)
 @books_routes.route("/admin")
 def books_for_admin():
-    service = book_service(db)
+    try:
+        service = book_service(db)
 
-    books = service.get_all_for_admin()
+        books = service.get_admin_page(
+            page=request.args.get("page", default=1, type=int),
+            per_page=request.args.get("per_page", default=25, type=int),
+            sort=request.args.get("sort", default="id", type=str),
+            order=request.args.get("order", default="asc", type=str),
+            q=request.args.get("q", type=str),
+            language=request.args.get("language", type=str),
+            publisher=request.args.get("publisher", type=str),
+            author=request.args.get("author", type=str),
+            availability=request.args.get("availability", type=str) or None
+        )
 
-    return jsonify([b.to_json() for b in books])
+        return jsonify({
+            "current_page": books.page,
+            "items_per_page": books.per_page,
+            "total_items": books.total,
+            "total_pages": books.pages,
+            "books": service.serialize_books(books.items)
+        }), 200
+
+    except ValueError as e:
+        return jsonify({"type": "error", "msg": str(e)}), 400
+    except Exception as e:
+        return jsonify({"type": "error", "msg": str(e)}), 500
 
 # get all books (paginated)
 @books_routes.route("/all", methods=["GET"])
@@ -80,54 +145,146 @@ def get_books():
             # search query
             q = request.args.get("q", type=str)
 
-            books = service.get_all_books(
-                page=page,
-                per_page=per_page,
-                q=q
-            )
-            
-            # with pagination
-            if page:
-                 return jsonify({
-                     "current_page": books.page,
-                     "items_per_page": books.per_page,
-                     "total_items": books.total,
-                     "total_pages": books.pages,
-                     "books": [b.to_json() for b in books.items]
-                 }), 200
-            
-            # without pagintation
-            return jsonify([
-                {
-                "id": book.id,
-                "isbn": book.isbn,
-                "title": book.title,
-                "subtitle": book.subtitle,
-                "author": book.author,
-                "page_count": book.page_count,
-                "language": book.language,
-                "book_img": book.book_img,
-                "description": book.description,
-                "publisher": book.publisher,
-                "published_at": book.published_at,
-                "total_copies": book.total_copies,
-                "status": "available" if book.total_copies else "unavailable"
-                }
-                for book in books
-            ]), 200
+            # repeat visits are answered before any query, count or
+            # serialization; the tag is per URL, so per page and search
+            version = service.catalog_version(q)
+            etag = make_etag("books", *version)
+            cached = not_modified(etag, version[0], weak=True)
+            if cached:
+                return cached
+
+            # cursor pagination (infinite scroll)
+            cursor = request.args.get("cursor", type=str)
+            sort = request.args.get("sort", type=str)
+
+            def listing():
+                if cursor is not None or sort:
+                    books = service.get_books_page(
+                        sort=sort or "newest",
+                        cursor=cursor or None,
+                        per_page=per_page,
+                        q=q,
+                        count=request.args.get("count", default="estimate", type=str)
+                    )
+
+                    return {
+                        "items_per_page": per_page,
+                        "total_items": books.total,
+                        "next_cursor": books.next_cursor,
+                        "prev_cursor": books.prev_cursor,
+                        "books": service.serialize_books(books.items)
+                    }
+
+                books = service.get_all_books(
+                    page=page,
+                    per_page=per_page,
+                    q=q
+                )
+                
+                # with pagination
+                if page:
+                     data = {
+                         "current_page": books.page,
+                         "items_per_page": books.per_page,
+                         "total_items": books.total,
+                         "total_pages": books.pages,
+                         "books": service.serialize_books(books.items)
+                     }
+
+                     # nothing found, offer the closest titles
+                     if q and not books.total:
+                         similar = service.did_you_mean(
+                             q=q,
+                             limit=3,
+                             timeout_ms=current_app.config["SUGGEST_TIMEOUT_MS"]
+                         )
+                         data["did_you_mean"] = [b.title for b in similar]
+
+                     return data
+                
+                # without pagintation
+                return [
+                    {
+                    "id": book.id,
+                    "isbn": book.isbn,
+                    "title": book.title,
+                    "subtitle": book.subtitle,
+                    "author": book.author,
+                    "page_count": book.page_count,
+                    "language": book.language,
+                    "book_img": book.book_img,
+                    "description": book.description,
+                    "publisher": book.publisher,
+                    "published_at": book.published_at,
+                    "total_copies": book.total_copies,
+                    "available_copies": book.available_copies,
+                    "status": "available" if book.is_available else "unavailable"
+                    }
+                    for book in books
+                ]
+
+            # the same query string is the same response
+            data = service.cached_listing(sorted(request.args.items(multi=True)), listing)
+            return cacheable(jsonify(data), etag, version[0], weak=True), 200
         
         except ValueError as e:
             return jsonify({"type": "error", "msg": str(e)}), 400
         except Exception as e:
             return jsonify({"type": "error", "msg": str(e)}), 500
 
+# search box suggestions (lightweight)
+@books_routes.route("/suggest", methods=["GET"])
+def suggest_books():
+    try:
+        service = book_service(db)
+
+        q = request.args.get("q", type=str)
+        max_limit = current_app.config["SUGGEST_LIMIT"]
+        limit = min(request.args.get("limit", default=max_limit, type=int), max_limit)
+        timeout_ms = current_app.config["SUGGEST_TIMEOUT_MS"]
+
+        books = service.suggest(q=q, limit=limit, timeout_ms=timeout_ms)
+        corrected = False
+
+        if not books:
+            books = service.did_you_mean(q=q, limit=limit, timeout_ms=timeout_ms)
+            corrected = bool(books)
+
+        return jsonify({
+            "did_you_mean": corrected,
+            "suggestions": [
+                {
+                    "id": b.id,
+                    "title": b.title,
+                    "author": b.author,
+                    "book_img": b.book_img
+                }
+                for b in books
+            ]
+        }), 200
+
+    except ValueError as e:
+        return jsonify({"type": "error", "msg": str(e)}), 400
+    except Exception as e:
+        return jsonify({"type": "error", "msg": str(e)}), 500
+
 # get by id
 @books_routes.route("/<int:id>", methods=["GET"])
 def get_book_by_id(id):
     try:
         service = book_service(db)
-        book = service.get_by_id(id)
-        return jsonify(book.to_json()), 200
+
+        # updated_at moves with every edit, borrow and return; a repeat
+        # visit is answered from these three columns alone
+        version = service.get_book_version(id)
+        cached = not_modified(make_etag("book", *version), version.updated_at)
+        if cached:
+            return cached
+
+        # tagged from the body itself, which may come from the cache
+        book = service.get_book_data(id)
+        etag = make_etag("book", book["id"], book["updated_at"], book["available_copies"])
+        return cacheable(jsonify(book), etag, book["updated_at"]), 200
 
     except ValueError as e:
             return jsonify({"type": "error", "msg": str(e)}), 400
@@ -140,7 +297,13 @@ def get_book_by_title(title):
     try:
         service = book_service(db)
         book = service.get_by_title(title)
-        return jsonify(book.to_json()), 200 
+
+        etag = make_etag("book", book.id, book.updated_at, book.available_copies)
+        cached = not_modified(etag, book.updated_at)
+        if cached:
+            return cached
+
+        return cacheable(jsonify(book.to_json()), etag, book.updated_at), 200
 
     except ValueError as e:
         return jsonify({"type": "error", "msg": str(e)}), 400
@@ -198,8 +361,17 @@ def update_book(id):
 @admin_required
 def delete_book(id):
     service = book_service(db)
+
+    mode = request.args.get("mode", "auto")
+    if mode not in DELETE_MODES:
+        return jsonify({"type": "error", "msg": "Mode must be 'auto', 'now' or 'background'"}), 400
+
     try:
-        service.delete_book(id)
+        deleted = service.delete_book(id, mode=mode)
+        if deleted == "queued":
+            return jsonify({"type": "success", "msg": "book deletion queued"}), 202
+        if not deleted:
+            return jsonify({"type": "error", "msg": "Failed to delete book"}), 409
         return jsonify({"type": "success", "msg": "book deleted"}), 200
     
     except ValueError:
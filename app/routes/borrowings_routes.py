@@ -2,7 +2,7 @@ from flask import Blueprint, jsonify, request, g
 from datetime import datetime, timezone, timedelta
 import traceback
 
-from .dependencies.deps import borrowing_service, signin_required, activity_service
+from .dependencies.deps import borrowing_service, signin_required, admin_required, activity_service
 from ..extentions import db
 
 borrowings_routes = Blueprint("borrowings_routes", __name__)
@@ -93,24 +93,75 @@ def return_book(borrowing_id):
         traceback.print_exc()
         return jsonify({"type": "error", "msg": str(e)}), 500
 
+# a returns bin in one request: {"borrowing_ids": [...]}
+@borrowings_routes.route("/bulk-return", methods=["PUT"])
+@admin_required
+def bulk_return():
+    try:
+        data = request.get_json(silent=True) or {}
+        service = borrowing_service(db)
+
+        result = service.return_many(data.get("borrowing_ids"))
+        return jsonify({
+            "type": "success",
+            "msg": f"{result['returned']} book(s) returned, {result['failed']} failed",
+            **result
+        }), 200
+
+    except ValueError as e:
+        return jsonify({"type": "error", "msg": str(e)}), 400
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"type": "error", "msg": str(e)}), 500
+
+# {"borrowing_ids": [...], "days": 7} or {"borrowing_ids": [...], "new_due_at": ...}
+@borrowings_routes.route("/bulk-extend", methods=["PUT"])
+@admin_required
+def bulk_extend():
+    try:
+        data = request.get_json(silent=True) or {}
+        service = borrowing_service(db)
+
+        result = service.extend_many(
+            data.get("borrowing_ids"),
+            new_due_date=data.get("new_due_at"),
+            days=data.get("days")
+        )
+        return jsonify({
+            "type": "success",
+            "msg": f"{result['extended']} due date(s) extended, {result['failed']} failed",
+            **result
+        }), 200
+
+    except ValueError as e:
+        return jsonify({"type": "error", "msg": str(e)}), 400
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"type": "error", "msg": str(e)}), 500
+
+# one page of borrowings, the status filter comes from the route
+def borrowings_page(status=None):
+    service = borrowing_service(db)
+
+    borrowings = service.get_borrowings_page(
+        status=status or request.args.get("status", type=str) or None,
+        q=request.args.get("q", type=str),
+        page=request.args.get("page", default=1, type=int),
+        per_page=request.args.get("per_page", default=25, type=int)
+    )
+
+    return jsonify({
+        "current_page": borrowings.page,
+        "items_per_page": borrowings.per_page,
+        "total_items": borrowings.total,
+        "total_pages": borrowings.pages,
+        "borrowings": service.serialize_borrowings(borrowings.items)
+    }), 200
+
 @borrowings_routes.route("/all", methods=["GET"])
 def get_all_borrowings():
     try:
-        service = borrowing_service(db)
-        borrowings = service.get_all()
-
-        return jsonify([
-            {
-                "id": b.id,
-                "user": b.user.username,
-                "book": b.book.title,
-                "borrowed_at": b.borrowed_at,
-                "due_at": b.due_at,
-                "status": service.get_borrowing_status(b.id),
-                "returned_at": b.returned_at if b.returned_at else None
-            }
-            for b in borrowings
-        ]), 200
+        return borrowings_page()
     
     except ValueError as e:
         return jsonify({"type": "error", "msg": str(e)}), 400
@@ -119,23 +170,12 @@ def get_all_borrowings():
         return jsonify({"type": "error", "msg": str(e)}), 500
 
 
+# every loan not returned yet, overdue ones included; each row's status
+# tells them apart (?status=active on /all leaves the overdue ones out)
 @borrowings_routes.route("/active", methods=["GET"])
 def get_active_borrowings():
     try:
-        service = borrowing_service(db)
-        borrowings = service.get_active()
-        
-        return jsonify([
-            {
-                "id": borrowing.id,
-                "user": borrowing.user.username,
-                "book": borrowing.book.title,
-                "borrowed_at": borrowing.borrowed_at,
-                "due_at": borrowing.due_at,
-                "status": "Active"
-            }
-            for borrowing in borrowings
-        ]), 200
+        return borrowings_page("unreturned")
     
     except ValueError as e:
         return jsonify({"type": "error", "msg": str(e)}), 400
@@ -146,21 +186,7 @@ def get_active_borrowings():
 @borrowings_routes.route("/returned", methods=["GET"])
 def get_returned_borrowings():
     try:
-        service = borrowing_service(db)
-        borrowings = service.get_returned()
-        
-        return jsonify([
-            {
-                "id": borrowing.id,
-                "user": borrowing.user.username,
-                "book": borrowing.book.title,
-                "borrowed_at": borrowing.borrowed_at,
-                "due_at": borrowing.due_at,
-                "status": "Returned",
-                "returned_at": borrowing.returned_at
-            }
-            for borrowing in borrowings
-        ]), 200
+        return borrowings_page("returned")
     
     except ValueError as e:
         return jsonify({"type": "error", "msg": str(e)}), 400
@@ -170,9 +196,7 @@ def get_returned_borrowings():
 @borrowings_routes.route("/overdue-borrowings")
 def get_overdue_borrowings():
     try:
-        service = borrowing_service(db)
-        overdues = service.get_overdue()
-        return jsonify([b.to_json() for b in overdues]), 200
+        return borrowings_page("overdue")
     
     except ValueError as e:
         return jsonify({"type": "error", "msg": str(e)}), 400
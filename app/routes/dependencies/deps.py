@@ -1,41 +1,55 @@
-from flask import jsonify, request, current_app, g
+from flask import jsonify, g
 from functools import wraps
-from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
-import jwt
 
 from ...extentions import db
+from ...search_index import catalog_index
+from ...auth import principal_cache
+from ...passwords import password_hasher
+from ...activity_sink import activity_sink
+from ...purger import purger
+from ...cache import cache
 
 from app.repositories.borrowings_repository import BorrowingsRepository
 from app.repositories.activities_repository import ActivitiesRepository
 from app.repositories.favorites_repository import FavoritesRepository
 from app.repositories.books_repository import BooksRepository
 from app.repositories.users_repository import UsersRepository
+from app.repositories.stats_repository import StatsRepository
+from app.repositories.export_repository import ExportRepository
 from app.services.borrowing_service import BorrowingService
 from app.services.activity_service import ActivityService
 from app.services.favorite_service import FavoriteService
 from app.services.book_service import BookService
+from app.services.book_import_service import BookImportService
 from app.services.user_service import UserService
+from app.services.profile_service import ProfileService
+from app.services.stats_service import StatsService
+from app.services.export_service import ExportService
 
 def book_service(db):
     repo = BooksRepository(db)
-    service = BookService(repo)
+    service = BookService(repo, catalog_index, purger, cache)
+    return service
+
+def book_import_service(db, batch_size=1000):
+    service = BookImportService(book_service(db), batch_size=batch_size)
     return service
 
 def user_service(db):
     repo = UsersRepository(db)
-    service = UserService(repo)
+    service = UserService(repo, principal_cache, password_hasher, purger, cache)
     return service
 
 def borrowing_service(db):
     borrowing_repo = BorrowingsRepository(db)
     user_repo = UsersRepository(db)
     book_repo = BooksRepository(db)
-    service = BorrowingService(borrowing_repo, user_repo, book_repo)
+    service = BorrowingService(borrowing_repo, user_repo, book_repo, catalog_index, cache)
     return service
 
 def activity_service(db):
     repo = ActivitiesRepository(db)
-    service = ActivityService(repo)
+    service = ActivityService(repo, activity_sink)
     return service
 
 def favorite_service(db):
@@ -45,31 +59,36 @@ def favorite_service(db):
     service = FavoriteService(
         favorites_repo=favorites_repo,
         users_repo=users_repo,
-        books_repo=books_repo
+        books_repo=books_repo,
+        cache=cache
+    )
+    return service
+
+def profile_service(db):
+    service = ProfileService(
+        users_repo=UsersRepository(db),
+        borrowings_repo=BorrowingsRepository(db),
+        favorites_repo=FavoritesRepository(db),
+        cache=cache
     )
     return service
 
+def stats_service(db):
+    repo = StatsRepository(db)
+    service = StatsService(repo)
+    return service
+
+def export_service(db, chunk_size=1000, lag=300):
+    repo = ExportRepository(db)
+    service = ExportService(repo, chunk_size=chunk_size, lag=lag)
+    return service
+
+# the token is decoded once per request by auth.load_claims
 def token_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        token = request.cookies.get("access_token")
-
-        if not token:
-            return jsonify({"error": "Unauthorized"}), 401
-                
-        try:
-            payload = jwt.decode(
-                token, 
-                current_app.config['SECRET_KEY'], 
-                algorithms=["HS256"]
-            )
-
-            request.user = payload
-        
-        except ExpiredSignatureError:
-            return jsonify({"error": "Token expired"}), 401
-        except InvalidTokenError:
-            return jsonify({"error": "Invalid token"}), 401
+        if not g.claims:
+            return jsonify({"error": g.auth_error}), 401
         
         return fn(*args, **kwargs)
     
@@ -78,20 +97,7 @@ def token_required(fn):
 def optional_auth(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        g.user = None
-        token = request.cookies.get("access_token")
-
-        if token:
-            try:
-                g.user = jwt.decode(
-                    token, 
-                    current_app.config['SECRET_KEY'], 
-                    algorithms=["HS256"]
-                )
-
-            except (InvalidTokenError, ExpiredSignatureError):
-                pass
-        
+        g.user = g.claims
         return fn(*args, **kwargs)
     
     return wrapper
@@ -99,23 +105,7 @@ def optional_auth(fn):
 def signin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        token = request.cookies.get("access_token")
-        if not token:
-            return jsonify({"error": "Unauthorized"}), 401
-        
-        try:
-            payload = jwt.decode(
-                jwt=token,
-                key=current_app.config["SECRET_KEY"],
-                algorithms=["HS256"],
-                issuer="lms-api"
-            )
-            g.current_user_id = payload["user_id"]
-        
-        except ExpiredSignatureError:
-            return jsonify({"error": "Unauthorized"}), 401
-        
-        except InvalidTokenError:
+        if not g.claims:
             return jsonify({"error": "Unauthorized"}), 401
         
         return fn(*args, **kwargs)
@@ -126,13 +116,9 @@ def admin_required(fn):
     @wraps(fn)
     @signin_required
     def wrapper(*args, **kwargs):
-        service = user_service(db)
-        user = service.get_user_by_id(g.current_user_id)
-
-        if not user or not user.is_admin:
+        if not principal_cache.is_admin(g.current_user_id):
             return jsonify({"error": "Forbidden"}), 403
         
         return fn(*args, **kwargs)
     
     return wrapper
-
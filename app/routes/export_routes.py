@@ -0,0 +1,42 @@
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+
+from .dependencies.deps import export_service, admin_required, db
+
+export_routes = Blueprint("export_routes", __name__)
+
+# /api/admin/export/borrowings?format=jsonl&since=2026-01-01
+# /api/admin/export/borrowings?incremental=true&feed=warehouse
+@export_routes.route("/export/<table>", methods=["GET"])
+@admin_required
+def export_table(table):
+    try:
+        service = export_service(
+            db,
+            chunk_size=current_app.config["EXPORT_CHUNK_SIZE"],
+            lag=current_app.config["EXPORT_LAG"]
+        )
+        plan = service.plan(
+            table,
+            fmt=request.args.get("format", "csv"),
+            since=request.args.get("since"),
+            until=request.args.get("until"),
+            feed=request.args.get("feed"),
+            incremental=request.args.get("incremental", "false").lower() == "true"
+        )
+
+        # the mark moves once the last chunk went out, not if the client drops
+        def body():
+            yield from service.stream(plan)
+            service.save_mark(plan)
+
+        # the session, and with it the server-side cursor, lives as long as the response
+        return Response(
+            stream_with_context(body()),
+            mimetype=plan.mimetype,
+            headers={"Content-Disposition": f"attachment; filename={plan.filename}"}
+        )
+
+    except ValueError as e:
+        return jsonify({"type": "error", "msg": str(e)}), 400
+    except Exception as e:
+        return jsonify({"type": "error", "msg": str(e)}), 500
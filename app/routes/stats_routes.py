@@ -0,0 +1,26 @@
+from flask import Blueprint, jsonify
+
+from .dependencies.deps import stats_service, admin_required, db
+from ..cache import cache
+
+stats_routes = Blueprint("stats_routes", __name__)
+
+@stats_routes.route("/stats", methods=["GET"])
+@admin_required
+def get_stats():
+    try:
+        service = stats_service(db)
+        return jsonify(service.get_stats()), 200
+    
+    except Exception as e:
+        return jsonify({"type": "error", "msg": str(e)}), 500
+
+# hits and misses per cached endpoint
+@stats_routes.route("/cache-stats", methods=["GET"])
+@admin_required
+def get_cache_stats():
+    return jsonify({
+        "enabled": cache.enabled,
+        "ttl": cache.ttl,
+        "endpoints": cache.metrics()
+    }), 200
@@ -1,15 +1,16 @@
 from flask import Blueprint, jsonify, request, g
 from traceback import print_exc
 
-from .dependencies.deps import user_service, token_required, borrowing_service, favorite_service, activity_service, db
-from .dependencies.deps import admin_required, signin_required
+from .dependencies.deps import user_service, token_required, db
+from .dependencies.deps import admin_required, signin_required, profile_service
+from ..passwords import HasherBusy
 
 user_routes = Blueprint("user_routes", __name__)
 
 @user_routes.route("/current")
 @token_required
 def get_current_user():
-    user_id = request.user["user_id"]
+    user_id = g.current_user_id
     users = user_service(db)
     user = users.get_user_by_id(user_id)
     return jsonify(user.to_json())
@@ -23,44 +24,20 @@ def get_user_by_id(id):
 @user_routes.route("/profile", methods=["GET"])
 @signin_required
 def profile():
-    user_id = g.current_user_id
+    try:
+        profiles = profile_service(db)
 
-    users = user_service(db)
-    user = users.get_user_by_id(user_id)
+        return jsonify(profiles.get_profile(
+            user_id=g.current_user_id,
+            history_page=request.args.get("history_page", default=1, type=int),
+            history_per_page=request.args.get("history_per_page", default=20, type=int)
+        )), 200
     
-    borrowings = borrowing_service(db)
-    all_borrowings = borrowings.get_borrowings_by_user(user_id)
-
-    fav = favorite_service(db)
-    favorites = fav.get_favorites_by_user(user_id)
-
-
-    return jsonify({
-        "id": user.id,
-        "username": user.username,
-        "email": user.email,
-        "joined_date": user.created_at.isoformat(),
-        "all_borrowings": [
-            {
-                "id": b.id,
-                "book_id": b.book.id,
-                "title": b.book.title,
-                "author": b.book.author,
-                "borrowed_at": b.borrowed_at,
-                "due_at": b.due_at,
-                "returned_at": b.returned_at if b.returned_at else None,
-                "status": borrowings.get_borrowing_status(b.id)
-            }
-            for b in all_borrowings
-        ],
-        "favorites": [
-            {
-                "id": f.id,
-                "title": f.book.title,
-            }
-            for f in favorites
-        ]
-    }), 200
+    except ValueError as e:
+        return jsonify({"type": "error", "msg": str(e)}), 400
+    except Exception as e:
+        print_exc()
+        return jsonify({"type": "error", "msg": str(e)}), 500
 
 @user_routes.route("/create-with-admin", methods=["POST"])
 @admin_required
@@ -88,6 +65,8 @@ def create_with_admin():
             "type": "error",
             "msg": str(e)
         })
+    except HasherBusy as e:
+        return jsonify({"type": "error", "msg": str(e)}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({
             "type": "error",
@@ -209,6 +188,9 @@ def update_user_password():
             "msg": str(e)
         }), 400
     
+    except HasherBusy as e:
+        return jsonify({"type": "error", "msg": str(e)}), 503, {"Retry-After": "1"}
+    
     except Exception as e:
         from traceback import print_exc
         print_exc()
@@ -220,15 +202,10 @@ def update_user_password():
 @user_routes.route("/delete/<int:id>", methods=["DELETE"])
 def delete_user(id):
     users = user_service(db)
-    activities = activity_service(db)
-    borrowings = borrowing_service(db)
-    favorites = favorite_service(db)
     
     try:
-        activities.delete_all_by_user(id)
-        borrowings.delete_borrowing_by_user(id)
-        favorites.delete_all_by_user(id)
-        deleted_user = users.delete_user_by_id(id)
+        # borrowings, favorites and activities go in the same transaction
+        deleted_user = users.delete_user_by_id(id, mode=request.args.get("mode", "auto"))
 
         if not deleted_user:
             return jsonify({
@@ -236,6 +213,12 @@ def delete_user(id):
                 "msg": "Failed to delete user"
             }), 409
 
+        if deleted_user == "queued":
+            return jsonify({
+                "type": "success",
+                "msg": "User deletion queued"
+            }), 202
+
         return jsonify({
             "type": "success",
             "msg": "User deleted!"
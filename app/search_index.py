@@ -0,0 +1,266 @@
+from bisect import bisect_left, insort
+from heapq import nsmallest
+from math import ceil
+from threading import RLock, Thread
+from types import SimpleNamespace
+import time
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from .extentions import db
+from .models import Book
+from .repositories.books_repository import SEARCH_TERM
+from .services.book_service import BOOK_FIELDS
+
+# how much a query word counts depending on where it matched
+FIELD_WEIGHTS = {"title": 3, "author": 2, "isbn": 1, "publisher": 1}
+
+
+class IndexedBook(SimpleNamespace):
+    @property
+    def is_available(self):
+        return self.available_copies > 0
+
+
+class IndexPage:
+    '''same shape as a Flask-SQLAlchemy Pagination'''
+
+    def __init__(self, items, page, per_page, total):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.pages = ceil(total / per_page) if total else 0
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+class CatalogIndex:
+    '''
+    In-memory inverted index over the books catalog.
+
+    Every worker process keeps its own copy, so writes made by another
+    worker only show up after the next rebuild (CATALOG_INDEX_MAX_AGE).
+    A rebuild loads the catalog into a fresh copy and swaps it in, so
+    searches keep being served from the old one meanwhile; once stale,
+    the index is refreshed by one background thread.
+    '''
+
+    def __init__(self):
+        self.lock = RLock()
+        self.enabled = False
+        self.max_age = None
+        self.app = None
+        self._refresher = None
+        self._writes = None  # writes made while a rebuild loads, replayed after the swap
+        self._clear()
+
+    def _clear(self):
+        self.books = {}     # id -> IndexedBook
+        self.fields = {}    # id -> {field: set of tokens}
+        self.postings = {}  # token -> set of ids
+        self.terms = []     # sorted tokens, for prefix lookups
+        self.order = []     # sorted ids, for the unfiltered listing
+        self.built_at = None
+
+    def init_app(self, app):
+        self.enabled = app.config.get("CATALOG_INDEX_ENABLED", False)
+        self.max_age = app.config.get("CATALOG_INDEX_MAX_AGE")
+        self.app = app
+
+        if not self.enabled:
+            return
+
+        with app.app_context():
+            try:
+                self.rebuild()
+            except SQLAlchemyError:
+                # e.g. running migrations on an empty database
+                app.logger.warning("Catalog index not built, using SQL search")
+                db.session.rollback()
+
+    # phrase queries are left to the SQL full-text search
+    def can_serve(self, q=None):
+        if not self.enabled or self.built_at is None or '"' in (q or ""):
+            return False
+
+        if self.max_age and time.monotonic() - self.built_at > self.max_age:
+            self._refresh()
+
+        return True
+
+    # start a background rebuild unless one is already running
+    def _refresh(self):
+        with self.lock:
+            # threads don't survive a fork, a child starts its own
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = Thread(target=self._run_refresh, name="catalog-index", daemon=True)
+            self._refresher.start()
+
+    def _run_refresh(self):
+        with self.app.app_context():
+            try:
+                self.rebuild()
+            except SQLAlchemyError:
+                # the stale copy is served until the next attempt
+                self.app.logger.exception("Catalog index rebuild failed")
+            finally:
+                db.session.remove()
+
+    def rebuild(self):
+        with self.lock:
+            self._writes = []
+
+        try:
+            books = (
+                db.session.query(Book)
+                .filter(Book.purge_requested_at == None)
+                .order_by(Book.id)
+                .yield_per(1000)
+            )
+            fresh = CatalogIndex()
+            for book in books:
+                fresh._add(book)
+
+            with self.lock:
+                self.books, self.fields = fresh.books, fresh.fields
+                self.postings, self.terms, self.order = fresh.postings, fresh.terms, fresh.order
+                for write, *args in self._writes:
+                    write(*args)
+                self.built_at = time.monotonic()
+        finally:
+            with self.lock:
+                self._writes = None
+
+    # ---------- writes ----------
+
+    def add(self, book):
+        if self.built_at is None:
+            return
+
+        with self.lock:
+            self._remove(book.id)
+            if book.purge_requested_at is None:
+                # a copy, the ORM object may change after the request
+                doc = IndexedBook(**{f: getattr(book, f) for f in BOOK_FIELDS})
+                self._add(doc)
+                self._log(self._put, doc)
+
+    def _put(self, doc):
+        self._remove(doc.id)
+        self._add(doc)
+
+    def remove(self, book_id):
+        if self.built_at is None:
+            return
+
+        with self.lock:
+            self._remove(book_id)
+            self._log(self._remove, book_id)
+
+    def adjust_available(self, book_id, delta):
+        with self.lock:
+            self._adjust_available(book_id, delta)
+            self._log(self._adjust_available, book_id, delta)
+
+    def _adjust_available(self, book_id, delta):
+        book = self.books.get(book_id)
+        if book:
+            book.available_copies += delta
+
+    # called with the lock held
+    def _log(self, write, *args):
+        if self._writes is not None:
+            self._writes.append((write, *args))
+
+    def _tokens(self, book):
+        tokens = {
+            field: set(SEARCH_TERM.findall((getattr(book, field) or "").lower()))
+            for field in FIELD_WEIGHTS
+        }
+        # the whole isbn is searchable too, not only its parts
+        tokens["isbn"].add(book.isbn.lower())
+        return tokens
+
+    def _add(self, book):
+        doc = IndexedBook(**{f: getattr(book, f) for f in BOOK_FIELDS})
+        tokens = self._tokens(doc)
+
+        self.books[doc.id] = doc
+        self.fields[doc.id] = tokens
+        insort(self.order, doc.id)
+
+        for token in set().union(*tokens.values()):
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                insort(self.terms, token)
+            ids.add(doc.id)
+
+    def _remove(self, book_id):
+        if self.books.pop(book_id, None) is None:
+            return
+
+        tokens = self.fields.pop(book_id)
+        del self.order[bisect_left(self.order, book_id)]
+        for token in set().union(*tokens.values()):
+            ids = self.postings[token]
+            ids.discard(book_id)
+            if not ids:
+                del self.postings[token]
+                del self.terms[bisect_left(self.terms, token)]
+
+    # ---------- reads ----------
+
+    def _prefixed(self, prefix):
+        i = bisect_left(self.terms, prefix)
+        while i < len(self.terms) and self.terms[i].startswith(prefix):
+            yield self.terms[i]
+            i += 1
+
+    def _score(self, book_id, words, prefixed):
+        tokens = self.fields[book_id]
+        score = 0
+        for field, weight in FIELD_WEIGHTS.items():
+            score += weight * len(words & tokens[field])
+            if not prefixed.isdisjoint(tokens[field]):
+                score += weight
+        return score
+
+    # same matching as the SQL full-text search: every word has to
+    # match and the last one may be a prefix
+    def search(self, q=None, page=1, per_page=10):
+        page = page or 1
+        end = page * per_page
+
+        with self.lock:
+            terms = SEARCH_TERM.findall((q or "").lower())
+
+            if not terms:
+                total = len(self.order) if not q else 0
+                ranked = self.order[:end] if not q else []
+            else:
+                *words, prefix = terms
+                prefixed = set(self._prefixed(prefix))
+                matches = set().union(*(self.postings[t] for t in prefixed))
+
+                for word in words:
+                    matches &= self.postings.get(word, set())
+
+                # only rank as far as the requested page
+                words = set(words)
+                total = len(matches)
+                ranked = nsmallest(
+                    end,
+                    matches,
+                    key=lambda i: (-self._score(i, words, prefixed), i)
+                )
+
+            items = [self.books[i] for i in ranked[end - per_page:]]
+
+        return IndexPage(items, page, per_page, total)
+
+
+catalog_index = CatalogIndex()
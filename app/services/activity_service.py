@@ -1,10 +1,20 @@
-from ..repositories.activities_repository import ActivitiesRepository
+from ..repositories.activities_repository import ActivitiesRepository, month_start
+from datetime import datetime, timezone
 
 class ActivityService:
-    def __init__(self, repo: ActivitiesRepository):
+    def __init__(self, repo: ActivitiesRepository, sink=None):
         self.repo = repo
+        self.sink = sink
 
+    # through the sink when there is one, which may write it later
     def create_activity(self, activity_type, user_id, target_id=None):
+        if self.sink:
+            return self.sink.record(
+                activity_type=activity_type,
+                user_id=user_id,
+                target_id=target_id
+            )
+
         return self.repo.create(
             activity_type=activity_type,
             user_id=user_id,
@@ -14,6 +24,50 @@ class ActivityService:
     def get_all(self):
         return self.repo.all()
     
+    def _parse_date(self, value, name):
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"Invalid '{name}' date, use ISO 8601")
+
+    def get_feed(
+        self,
+        cursor=None,
+        per_page=50,
+        activity_type=None,
+        user_id=None,
+        since=None,
+        until=None
+    ):
+        if per_page < 1 or per_page > 200:
+            raise ValueError("Items per page must be between 1 and 200")
+        
+        return self.repo.feed(
+            cursor=cursor,
+            per_page=per_page,
+            activity_type=activity_type,
+            user_id=user_id,
+            since=self._parse_date(since, "since"),
+            until=self._parse_date(until, "until")
+        )
+    
+    # feed rows already carry username and book title
+    def serialize_feed(self, rows):
+        return [
+            {
+                "id": r.id,
+                "activity_type": r.activity_type,
+                "user_id": r.user_id,
+                "username": r.username,
+                "target_id": r.target_id,
+                "book_title": r.book_title,
+                "created_at": r.created_at.isoformat()
+            }
+            for r in rows
+        ]
+    
     def get_by_id(self, id):
         act = self.repo.by_id(id=id)
         if not act:
@@ -43,4 +97,18 @@ class ActivityService:
             
     def delete_all_by_user(self, user_id):
         self.repo.delete_by_user(user_id)
-        return True
\ No newline at end of file
+        return True
+    
+    def maintain_partitions(self, months_ahead=2):
+        if months_ahead < 0 or months_ahead > 24:
+            raise ValueError("Months ahead must be between 0 and 24")
+        
+        return self.repo.ensure_partitions(months_ahead=months_ahead)
+    
+    # keeps this month and the `keep_months` before it
+    def apply_retention(self, keep_months=12):
+        if keep_months < 1:
+            raise ValueError("Keep at least 1 month of activities")
+        
+        cutoff = month_start(datetime.now(timezone.utc), -keep_months)
+        return cutoff, self.repo.drop_before(cutoff)
@@ -0,0 +1,160 @@
+import csv
+import json
+
+from .book_service import BookService
+from ..repositories.books_repository import IMPORT_COLUMNS as IMPORT_FIELDS
+from ..models import Book
+
+IMPORT_FORMATS = ("csv", "jsonl")
+NUMBER_FIELDS = {"page_count": "Page count", "total_copies": "Copies count"}
+
+# longest value each text column takes
+FIELD_LENGTHS = {
+    name: Book.__table__.c[name].type.length
+    for name in IMPORT_FIELDS
+    if getattr(Book.__table__.c[name].type, "length", None)
+}
+
+def import_format(filename):
+    extension = (filename or "").rsplit(".", 1)[-1].lower()
+    return {"csv": "csv", "jsonl": "jsonl", "ndjson": "jsonl"}.get(extension)
+
+class BookImportService:
+    '''
+    Loads a CSV or JSONL catalog into books, streaming the file and saving
+    `batch_size` rows at a time (COPY, then INSERT ... ON CONFLICT). Rows
+    are checked with the same rules as BookService.create_book; bad rows
+    are counted and skipped. Memory stays bounded by the batch and the
+    first `max_rejects` rejects, whatever the file size.
+    '''
+
+    def __init__(self, books: BookService, batch_size=1000, max_rejects=100):
+        self.books = books
+        self.batch_size = batch_size
+        self.max_rejects = max_rejects
+
+    # (line number, record) for every row, records are dicts or the error
+    def read_rows(self, stream, fmt):
+        if fmt == "csv":
+            reader = csv.DictReader(stream)
+            if not reader.fieldnames:
+                return
+            try:
+                for record in reader:
+                    yield reader.line_num, record
+            except csv.Error as e:
+                raise ValueError(f"Line {reader.line_num}: {e}")
+
+        elif fmt == "jsonl":
+            for line_num, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_num, json.loads(line)
+                except ValueError:
+                    yield line_num, ValueError("Invalid JSON")
+
+        else:
+            raise ValueError("Format must be 'csv' or 'jsonl'")
+
+    def clean(self, record):
+        if isinstance(record, Exception):
+            raise record
+
+        if not isinstance(record, dict):
+            raise ValueError("Row must be an object")
+
+        row = {}
+        for name in IMPORT_FIELDS:
+            value = record.get(name)
+            if isinstance(value, str):
+                value = value.strip() or None
+
+            if value is not None and name in NUMBER_FIELDS:
+                try:
+                    value = int(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"{NUMBER_FIELDS[name]} must be a whole number")
+
+            elif value is not None:
+                value = str(value)
+                if "\x00" in value:
+                    raise ValueError(f"'{name}' contains a NUL character")
+                if name in FIELD_LENGTHS and len(value) > FIELD_LENGTHS[name]:
+                    raise ValueError(f"'{name}' is longer than {FIELD_LENGTHS[name]} characters")
+
+            row[name] = value
+
+        self.books._validate_book_data(
+            row["isbn"],
+            row["title"],
+            row["author"],
+            row["page_count"],
+            row["language"],
+            row["publisher"],
+            row["total_copies"]
+        )
+
+        if row["total_copies"] is None:
+            row["total_copies"] = 1
+        return row
+
+    def run(self, stream, fmt, update_existing=True, progress=None, on_reject=None):
+        '''
+        Import every row of `stream`. `progress(report)` is called after
+        each batch, `on_reject(line, isbn, msg)` for every rejected row.
+        '''
+        report = {"read": 0, "inserted": 0, "updated": 0, "rejected": 0, "rejects": []}
+
+        def reject(line, isbn, msg):
+            report["rejected"] += 1
+            if len(report["rejects"]) < self.max_rejects:
+                report["rejects"].append({"line": line, "isbn": isbn, "msg": msg})
+            if on_reject:
+                on_reject(line, isbn, msg)
+
+        batch = {}  # isbn -> (line, row)
+
+        def flush():
+            inserted, updated, skipped = self.books.import_rows(
+                [row for _, row in batch.values()],
+                update_existing=update_existing
+            )
+            report["inserted"] += len(inserted)
+            report["updated"] += len(updated)
+            for isbn, msg in skipped.items():
+                reject(batch[isbn][0], isbn, msg)
+
+            batch.clear()
+            if progress:
+                progress(report)
+
+        for line, record in self.read_rows(stream, fmt):
+            report["read"] += 1
+            try:
+                row = self.clean(record)
+            except ValueError as e:
+                isbn = record.get("isbn") if isinstance(record, dict) else None
+                reject(line, isbn, str(e))
+                continue
+
+            # the same book twice in a batch: the later row wins
+            earlier = batch.pop(row["isbn"], None)
+            if earlier:
+                reject(earlier[0], row["isbn"], f"Duplicate ISBN, replaced by line {line}")
+
+            batch[row["isbn"]] = (line, row)
+            if len(batch) >= self.batch_size:
+                flush()
+
+        if batch:
+            flush()
+
+        # this worker's search index, the others catch up on their next rebuild
+        index = self.books.index
+        if index and index.built_at is not None and (report["inserted"] or report["updated"]):
+            index.rebuild()
+        if report["inserted"] or report["updated"]:
+            self.books.catalog_reloaded()
+
+        return report
@@ -1,8 +1,34 @@
-from ..repositories.books_repository import BooksRepository
+from operator import attrgetter
+
+from ..repositories.books_repository import BooksRepository, SORTABLE_COLUMNS, BOOK_SORTS
+from ..models import Book
+
+# resolved once, reused for every serialized page
+BOOK_FIELDS = tuple(
+    c.name for c in Book.__table__.columns if not c.info.get("hidden")
+)
+_book_values = attrgetter(*BOOK_FIELDS)
+
+# "auto" leaves histories above PURGE_THRESHOLD rows to the purger
+DELETE_MODES = ("auto", "now", "background")
 
 class BookService:
-    def __init__(self, repo: BooksRepository):
+    def __init__(self, repo: BooksRepository, index=None, purger=None, cache=None):
         self.repo = repo
+        self.index = index
+        self.purger = purger
+        self.cache = cache
+
+    # listings are tagged "catalog", a book's own page "book:<id>" and
+    # "books", which every book page carries
+    def _changed(self, book_id=None):
+        if self.cache:
+            self.cache.invalidate("catalog", *((f"book:{book_id}",) if book_id else ()))
+
+    # after a bulk change, every listing and book page
+    def catalog_reloaded(self):
+        if self.cache:
+            self.cache.invalidate("catalog", "books")
 
     def _validate_book_data(
         self,
@@ -67,26 +93,150 @@ class BookService:
             published_at=published_at,
             description=description
         )
+
+        if self.index:
+            self.index.add(book)
+        self._changed()
         return book
     
     def get_all_books(self, page, per_page, q):
         if page is not None and page < 1:
             raise ValueError("Invalid page count")
 
+        if self.index and self.index.can_serve(q):
+            return self.index.search(q=q, page=page, per_page=per_page)
+
         return self.repo.all(
             page=page,
             per_page=per_page,
             q=q
         )
     
-    def get_all_for_admin(self, q=None):
-        return self.repo._base_query(q)
+    def get_books_page(
+        self,
+        sort="newest",
+        cursor=None,
+        per_page=8,
+        q=None,
+        count="estimate"
+    ):
+        if sort not in BOOK_SORTS:
+            raise ValueError(f"Cannot sort by '{sort}'")
+        
+        if per_page < 1 or per_page > 100:
+            raise ValueError("Items per page must be between 1 and 100")
+        
+        if count not in ("exact", "estimate", "none"):
+            raise ValueError("Count must be 'exact', 'estimate' or 'none'")
+        
+        return self.repo.keyset(
+            sort=sort,
+            cursor=cursor,
+            per_page=per_page,
+            q=q,
+            count=count
+        )
+    
+    def get_admin_page(
+        self,
+        page=1,
+        per_page=25,
+        sort="id",
+        order="asc",
+        q=None,
+        language=None,
+        publisher=None,
+        author=None,
+        availability=None
+    ):
+        if page < 1:
+            raise ValueError("Invalid page count")
+        
+        if per_page < 1 or per_page > 100:
+            raise ValueError("Items per page must be between 1 and 100")
+        
+        if sort not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort by '{sort}'")
+        
+        if order not in ("asc", "desc"):
+            raise ValueError("Order must be 'asc' or 'desc'")
+        
+        if availability not in (None, "available", "unavailable"):
+            raise ValueError("Availability must be 'available' or 'unavailable'")
+
+        return self.repo.admin_page(
+            page=page,
+            per_page=per_page,
+            sort=sort,
+            descending=order == "desc",
+            q=q,
+            language=language,
+            publisher=publisher,
+            author=author,
+            availability=availability
+        )
+    
+    # serialize a page of books without touching each model's to_json
+    def serialize_books(self, books):
+        return [dict(zip(BOOK_FIELDS, _book_values(b))) for b in books]
+    
+    def _validate_suggest(self, q, limit):
+        if limit < 1:
+            raise ValueError("Limit must be at least 1")
+        
+        q = (q or "").strip()
+        return q if len(q) >= 2 else None
+    
+    # top completions for the search box
+    def suggest(self, q, limit, timeout_ms):
+        q = self._validate_suggest(q, limit)
+        if not q:
+            return []
+        
+        return self.repo.suggest(q=q, limit=limit, timeout_ms=timeout_ms)
+    
+    # closest matches for a search that found nothing
+    def did_you_mean(self, q, limit, timeout_ms):
+        q = self._validate_suggest(q, limit)
+        if not q:
+            return []
+        
+        return self.repo.similar(q=q, limit=limit, timeout_ms=timeout_ms)
     
+    # changes whenever any catalog page could, (last change first)
+    def catalog_version(self, q=None):
+        version = self.repo.catalog_version()
+
+        # the in-memory index only sees other workers' writes once rebuilt
+        if self.index and self.index.can_serve(q):
+            version += (self.index.built_at,)
+        return version
+
     def get_by_id(self, id):
         book = self.repo.by_id(id)
         if not book:
             raise ValueError("Book not found")
         return book
+
+    # (id, updated_at, available_copies), what a book page's tag is made of
+    def get_book_version(self, id):
+        version = self.repo.version(id)
+        if not version:
+            raise ValueError("Book not found")
+        return version
+
+    # the serialized book, what /api/books/<id> sends
+    def get_book_data(self, id):
+        build = lambda: self.get_by_id(id).to_json()
+        if not self.cache:
+            return build()
+        return self.cache.get_or_set("books.detail", id, build, tags=(f"book:{id}", "books"))
+
+    # a whole listing response, `key` being everything it depends on
+    def cached_listing(self, key, build):
+        if not self.cache:
+            return build()
+        return self.cache.get_or_set("books.all", key, build, tags=("catalog",))
     
     def get_by_title(self, title: str):
         title = title.lower().strip()
@@ -110,10 +260,77 @@ class BookService:
         if not book:
             raise ValueError("Book not found")
         
-        return self.repo.update(id, updates)
+        total_copies = updates.get("total_copies")
+        if total_copies is not None and total_copies < book.borrowed_copies:
+            raise ValueError("Total copies cannot be less than borrowed copies")
+        
+        book = self.repo.update(id, updates)
+
+        if self.index:
+            self.index.add(book)
+        self._changed(id)
+        return book
     
-    def delete_book(self, id):
+    # one batch of validated rows from a bulk import, see BooksRepository.upsert_many
+    def import_rows(self, rows, update_existing=True):
+        return self.repo.upsert_many(rows, update_existing=update_existing)
+
+    def reconcile_counters(self):
+        fixed = self.repo.reconcile_counters()
+        if fixed:
+            self.catalog_reloaded()
+        return fixed
+    
+    # returns "deleted", "queued" for the purger, or None when it failed
+    def delete_book(self, id, mode="auto"):
+        if mode not in DELETE_MODES:
+            raise ValueError("Mode must be 'auto', 'now' or 'background'")
+
         book = self.repo.by_id(id)
         if not book:
             raise ValueError("Book not found")
-        return self.repo.delete(id)
\ No newline at end of file
+
+        if self.purger and mode != "now" and (
+            mode == "background"
+            or self.repo.history_size(id, self.purger.threshold) >= self.purger.threshold
+        ):
+            self.repo.request_purge(id)
+            # gone from listings, search and the index; it can't be borrowed either
+            if self.index:
+                self.index.remove(id)
+            self._changed(id)
+            self.purger.wake()
+            return "queued"
+        
+        deleted = self.repo.delete(id)
+
+        if deleted and self.index:
+            self.index.remove(id)
+        if deleted:
+            self._changed(id)
+        return "deleted" if deleted else None
+
+    # history in batches, then the book, stops early once `stopping` is set
+    def purge_book(self, id, batch_size=1000, stopping=None):
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+
+        while self.repo.purge_batch(id, batch_size):
+            if stopping and stopping.is_set():
+                return False
+
+        deleted = self.repo.delete(id)
+
+        if deleted and self.index:
+            self.index.remove(id)
+        if deleted:
+            self._changed(id)
+        return deleted
+
+    def purge_pending(self, batch_size=1000, stopping=None):
+        purged = 0
+        for id in self.repo.pending_purges():
+            if stopping and stopping.is_set():
+                break
+            purged += int(bool(self.purge_book(id, batch_size, stopping)))
+        return purged
\ No newline at end of file
@@ -1,60 +1,80 @@
-from ..repositories.borrowings_repository import BorrowingsRepository
+from ..repositories.borrowings_repository import BorrowingsRepository, BORROWING_STATUSES
 from ..repositories.users_repository import UsersRepository
 from ..repositories.books_repository import BooksRepository
 from datetime import datetime, timezone
 
+# borrowings per bulk return / extension request
+BULK_LIMIT = 500
+
 class BorrowingService:
     def __init__(
             self, 
             borrowing_repo: BorrowingsRepository, 
             user_repo: UsersRepository, 
-            book_repo: BooksRepository
+            book_repo: BooksRepository,
+            index=None,
+            cache=None
     ):
         self.borrowing_repo = borrowing_repo
         self.user_repo = user_repo
         self.book_repo = book_repo
+        self.index = index
+        self.cache = cache
 
-    def create_new_borrowing(self, user_id, book_id, due_at):
-        user = self.user_repo.by_id(id=user_id)
-        book = self.book_repo.by_id(id=book_id)
+    # copies of these books moved, these users' loans changed
+    def _changed(self, book_ids=(), user_ids=()):
+        if not self.cache:
+            return
+
+        tags = [f"book:{id}" for id in set(book_ids)] + [f"user:{id}" for id in set(user_ids)]
+        if book_ids:
+            tags.append("catalog")
+        self.cache.invalidate(*tags)
 
+    def create_new_borrowing(self, user_id, book_id, due_at):
         # Internal errors
-        if not user or not book:
-            raise RuntimeError("Missing user or book")
-        
         if not due_at:
             raise RuntimeError("Missing due date")
         
-        # Client/business errors
-        # No copies left to borrow
-        if not book.is_available:
-            raise ValueError("No copies left")
-        
-        # Reaching borrowings limit
-        if self.borrowing_repo.limit_reached(user_id=user_id):
-            raise ValueError("Borrowings limit reached")
-        
-        # Check if user has overdue
-        if self.borrowing_repo.has_overdue(user_id=user_id):
-            raise ValueError("Can't borrow a new book, overdue dates detected")
+        # availability, limit, overdues and duplicates are checked by the
+        # repository inside the borrow transaction
+        borrowing = self.borrowing_repo.create(user_id=user_id, book_id=book_id, due_at=due_at)
+
+        if self.index:
+            self.index.adjust_available(book_id, -1)
+        self._changed([book_id], [user_id])
+        return borrowing
         
-        # Check if book is borrowed by the same user
-        if self.borrowing_repo.has_copy(user_id=user_id, book_id=book_id):
-            raise ValueError("Book already borrowed!")
+    def get_borrowings_page(self, status=None, q=None, page=1, per_page=25):
+        if page < 1:
+            raise ValueError("Invalid page count")
         
-        return self.borrowing_repo.create(user_id=user_id, book_id=book_id, due_at=due_at)
+        if per_page < 1 or per_page > 100:
+            raise ValueError("Items per page must be between 1 and 100")
         
-    def get_all(self):
-        return self.borrowing_repo.all()
+        if status not in (None, "unreturned", *BORROWING_STATUSES):
+            raise ValueError("Status must be 'active', 'overdue' or 'returned'")
 
-    def get_active(self):
-        return self.borrowing_repo.active()
+        return self.borrowing_repo.listing(
+            status=status,
+            q=q,
+            page=page,
+            per_page=per_page
+        )
     
-    def get_returned(self):
-        return self.borrowing_repo.returned()
-    
-    def get_overdue(self):
-        return self.borrowing_repo.overdue()
+    def serialize_borrowings(self, rows):
+        return [
+            {
+                "id": b.id,
+                "user": b.user,
+                "book": b.book,
+                "borrowed_at": b.borrowed_at,
+                "due_at": b.due_at,
+                "status": b.status,
+                "returned_at": b.returned_at
+            }
+            for b in rows
+        ]
     
     def get_borrowing_by_id(self, id):
         b = self.borrowing_repo.by_id(id=id)
@@ -94,6 +114,23 @@ class BorrowingService:
     def check_overdue_borrowing(self, borrowing):
         return self.borrowing_repo.is_overdue(borrowing=borrowing)
         
+    def sweep_overdue(self, batch_size=1000, max_batches=None):
+        '''mark the loans gone overdue since the last sweep, one batch per transaction'''
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+
+        marked = batches = 0
+        while max_batches is None or batches < max_batches:
+            count = self.borrowing_repo.mark_overdue(batch_size=batch_size)
+            marked += count
+            batches += 1
+            if count < batch_size:
+                break
+        return marked
+
+    def resync_overdue(self):
+        return self.borrowing_repo.resync_overdue()
+
     def check_borrowings_limit(self, user_id):
         user = self.user_repo.by_id(id=user_id)
         if not user:
@@ -101,8 +138,92 @@ class BorrowingService:
         return self.borrowing_repo.is_limit_reached(user_id=user_id)
     
     def return_borrowed_book(self, borrowing_id):
-        return self.borrowing_repo.return_book(borrowing_id=borrowing_id)
+        borrowing = self.borrowing_repo.return_book(borrowing_id=borrowing_id)
+
+        if self.index:
+            self.index.adjust_available(borrowing.book_id, 1)
+        self._changed([borrowing.book_id], [borrowing.user_id])
+        return borrowing
     
+    def _bulk_ids(self, ids):
+        if not isinstance(ids, list) or not ids:
+            raise ValueError("Missing borrowing ids")
+
+        if len(ids) > BULK_LIMIT:
+            raise ValueError(f"At most {BULK_LIMIT} borrowings per request")
+
+        if not all(isinstance(id, int) and not isinstance(id, bool) for id in ids):
+            raise ValueError("Borrowing ids must be integers")
+
+        # keep the caller's order, once per id
+        return list(dict.fromkeys(ids))
+
+    # one result per requested id, in the order they were sent
+    def _bulk_results(self, ids, done, returned, missing, status):
+        results = []
+        for id in ids:
+            if id in done:
+                results.append({"id": id, "status": status, **done[id]})
+            elif id in returned:
+                results.append({"id": id, "status": "error", "msg": "Book is already returned"})
+            else:
+                results.append({"id": id, "status": "error", "msg": "Borrowing not found"})
+
+        return {
+            "results": results,
+            status: len(done),
+            "failed": len(returned) + len(missing)
+        }
+
+    def return_many(self, ids):
+        ids = self._bulk_ids(ids)
+        returned_now, returned, missing, borrowers = self.borrowing_repo.return_many(ids)
+
+        if self.index:
+            for book_id in returned_now.values():
+                self.index.adjust_available(book_id, 1)
+        if returned_now:
+            self._changed(returned_now.values(), borrowers)
+
+        done = {id: {"book_id": book_id} for id, book_id in returned_now.items()}
+        return self._bulk_results(ids, done, returned, missing, "returned")
+
+    def extend_many(self, ids, new_due_date=None, days=None):
+        ids = self._bulk_ids(ids)
+
+        if (new_due_date is None) == (days is None):
+            raise ValueError("Send either 'new_due_at' or 'days'")
+
+        if days is not None:
+            if not isinstance(days, int) or isinstance(days, bool) or not 1 <= days <= 90:
+                raise ValueError("Days must be between 1 and 90")
+        else:
+            new_due_date = self._parse_due_date(new_due_date)
+
+        extended, returned, missing, borrowers = self.borrowing_repo.extend_many(
+            ids,
+            new_due_date=new_due_date,
+            days=days
+        )
+        self._changed(user_ids=borrowers)
+
+        done = {id: {"due_at": due_at} for id, due_at in extended.items()}
+        return self._bulk_results(ids, done, returned, missing, "extended")
+
+    def _parse_due_date(self, new_due_date):
+        try:
+            # naive datetime (no timezone)
+            new_due_date = datetime.strptime(new_due_date, "%a, %d %b %Y %H:%M:%S %Z")
+        except (TypeError, ValueError):
+            raise ValueError("Invalid due date")
+        # aware datetime (timezone)
+        new_due_date = new_due_date.replace(tzinfo=timezone.utc)
+
+        # datetime objects comparing error (no timezone < timezone)
+        if new_due_date < datetime.now(timezone.utc):
+            raise ValueError("Invalid due date")
+        return new_due_date
+
     def update_borrowing_due_date(self, id, new_due_date):
         borrowing = self.borrowing_repo.by_id(id=id)
         if not borrowing:
@@ -120,17 +241,26 @@ class BorrowingService:
         if new_due_date < datetime.now(timezone.utc):
             raise ValueError("Invalid due date")
         
-        return self.borrowing_repo.update_due_date(id=id, new_due_date=new_due_date)
+        updated = self.borrowing_repo.update_due_date(id=id, new_due_date=new_due_date)
+        self._changed(user_ids=[borrowing.user_id])
+        return updated
     
     def delete_borrowing_by_id(self, id):
         borrowing = self.borrowing_repo.by_id(id=id)
         if not borrowing:
             raise ValueError("Borrowing not found")
         
-        return self.borrowing_repo.delete_by_id(id=id)
+        book_id, user_id = borrowing.book_id, borrowing.user_id
+        deleted = self.borrowing_repo.delete_by_id(id=id)
+        self._changed([book_id], [user_id])
+        return deleted
     
     def delete_borrowing_by_user(self, user_id):
-        return self.borrowing_repo.delete_by_user_id(user_id=user_id)
+        deleted = self.borrowing_repo.delete_by_user_id(user_id=user_id)
+        if self.cache and deleted:
+            # which books got copies back isn't known here
+            self.cache.invalidate(f"user:{user_id}", "catalog", "books")
+        return deleted
     
     def delete_borrowing_by_book(self, book_id):
         book = self.book_repo.by_id(id=book_id)
@@ -142,4 +272,7 @@ class BorrowingService:
         if not borrowing:
             raise ValueError("Borrowing not found")
         
-        return self.borrowing_repo.delete_by_book_id(book_id=book_id)
\ No newline at end of file
+        users = {b.user_id for b in borrowing}
+        deleted = self.borrowing_repo.delete_by_book_id(book_id=book_id)
+        self._changed([book_id], users)
+        return deleted
\ No newline at end of file
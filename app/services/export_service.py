@@ -0,0 +1,210 @@
+from datetime import date, datetime, timezone
+from sqlalchemy import BigInteger, Boolean, DateTime, Integer, SmallInteger
+import csv
+import io
+import json
+
+from ..repositories.export_repository import ExportRepository, EXPORT_TABLES
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class _Chunks(io.RawIOBase):
+    '''write-only file that hands back what was written since the last drain'''
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+class ExportPlan:
+    '''what one export reads: a table, a time window and maybe a feed mark'''
+
+    def __init__(self, table, fmt, since=None, until=None, feed=None):
+        self.table = table
+        self.fmt = fmt
+        self.since = since
+        self.until = until
+        self.feed = feed
+
+    @property
+    def filename(self):
+        stamp = (self.until or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%S")
+        return f"{self.table}-{stamp}.{self.fmt}"
+
+    @property
+    def mimetype(self):
+        return EXPORT_FORMATS[self.fmt]
+
+class ExportService:
+    '''
+    Streams books, borrowings, activities and favorites as CSV, JSONL or
+    Parquet (needs pyarrow). Rows come from a server-side cursor and go
+    out `chunk_size` at a time, so an export never holds a whole table.
+
+    Incremental feeds export the rows changed since the feed's last run,
+    up to `lag` seconds ago by the database clock and no further than the
+    oldest transaction still open: its rows carry its start time, not
+    their commit time, and are left to the next run instead of skipped.
+    Deletes are not exported.
+    '''
+
+    def __init__(self, repo: ExportRepository, chunk_size=1000, lag=300):
+        self.repo = repo
+        self.chunk_size = chunk_size
+        self.lag = lag
+
+    def _parse_date(self, value, name):
+        if not value or isinstance(value, datetime):
+            return value
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"Invalid '{name}' date, use ISO 8601")
+
+        # the tables store naive UTC times
+        if value.tzinfo:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def plan(self, table, fmt="csv", since=None, until=None, feed=None, incremental=False):
+        if table not in EXPORT_TABLES:
+            raise ValueError(f"Can't export '{table}', pick one of: {', '.join(EXPORT_TABLES)}")
+
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+        if fmt == "parquet":
+            self._pyarrow()
+
+        if not incremental:
+            since = self._parse_date(since, "since")
+            until = self._parse_date(until, "until")
+            if since and until and since >= until:
+                raise ValueError("'since' must be before 'until'")
+            return ExportPlan(table, fmt, since, until)
+
+        if since or until:
+            raise ValueError("Incremental exports pick their own dates")
+
+        feed = feed or table
+        if len(feed) > 100:
+            raise ValueError("Feed name is too long")
+
+        until = self.repo.horizon(self.lag)
+        since = self.repo.mark(feed)
+        # ran again within the lag: an empty export, the mark stays put
+        if since and since > until:
+            until = since
+
+        return ExportPlan(table, fmt, since, until, feed)
+
+    def stream(self, plan):
+        '''
+        The export as chunks of bytes. The feed mark is left alone: the
+        caller moves it with save_mark() once the export is safely out,
+        so an interrupted one is repeated.
+        '''
+        columns = self.repo.columns(plan.table)
+        rows = self.repo.rows(
+            plan.table,
+            since=plan.since,
+            until=plan.until,
+            chunk_size=self.chunk_size
+        )
+        writer = {"csv": self._csv, "jsonl": self._jsonl, "parquet": self._parquet}[plan.fmt]
+
+        yield from writer(columns, rows)
+
+    # the next incremental run of the feed starts where this one ended
+    def save_mark(self, plan):
+        if plan.feed:
+            self.repo.save_mark(plan.feed, plan.until)
+
+    def _batches(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.chunk_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _csv(self, columns, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([c.name for c in columns])
+
+        for batch in self._batches(rows):
+            writer.writerows(batch)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    def _jsonl(self, columns, rows):
+        names = [c.name for c in columns]
+        for batch in self._batches(rows):
+            yield "".join(
+                json.dumps(dict(zip(names, row)), default=_json_value) + "\n"
+                for row in batch
+            ).encode()
+
+    def _pyarrow(self):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Parquet exports need pyarrow, pip install pyarrow")
+        return pyarrow
+
+    def _arrow_type(self, pa, column):
+        if isinstance(column.type, (Integer, BigInteger, SmallInteger)):
+            return pa.int64()
+        if isinstance(column.type, Boolean):
+            return pa.bool_()
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us")
+        return pa.string()
+
+    # one row group per chunk, the footer goes out last
+    def _parquet(self, columns, rows):
+        pa = self._pyarrow()
+        schema = pa.schema([(c.name, self._arrow_type(pa, c)) for c in columns])
+
+        sink = _Chunks()
+        with pa.parquet.ParquetWriter(pa.PythonFile(sink, mode="w"), schema) as writer:
+            for batch in self._batches(rows):
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)],
+                    schema=schema
+                ))
+                yield sink.drain()
+
+        yield sink.drain()
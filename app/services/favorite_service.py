@@ -7,11 +7,18 @@ class FavoriteService:
             self,
             favorites_repo: FavoritesRepository,
             users_repo:UsersRepository,
-            books_repo: BooksRepository
+            books_repo: BooksRepository,
+            cache=None
     ):
         self.favorites_repo = favorites_repo
         self.users_repo = users_repo
         self.books_repo = books_repo
+        self.cache = cache
+
+    # favorites are listed on the user's profile
+    def _changed(self, user_id):
+        if self.cache:
+            self.cache.invalidate(f"user:{user_id}")
 
     def create_new_favorite(self, user_id, book_id):
         if not self.users_repo.by_id(user_id):
@@ -23,7 +30,9 @@ class FavoriteService:
         if self.favorites_repo.exists(user_id, book_id):
             raise ValueError("Already favorited")
         
-        return self.favorites_repo.create(user_id, book_id)
+        favorite = self.favorites_repo.create(user_id, book_id)
+        self._changed(user_id)
+        return favorite
     
     def get_all_favorites(self):
         return self.favorites_repo.all()
@@ -48,13 +57,18 @@ class FavoriteService:
         return self.favorites_repo.by_id(fav_id)
     
     def delete_favorite(self, fav_id):
-        if not self.favorites_repo.by_id(fav_id):
+        fav = self.favorites_repo.by_id(fav_id)
+        if not fav:
             raise ValueError("Favorite not found")
         
-        return self.favorites_repo.delete(fav_id)
+        user_id = fav.user_id
+        deleted = self.favorites_repo.delete(fav_id)
+        self._changed(user_id)
+        return deleted
     
     def delete_all_by_user(self, user_id):
         self.favorites_repo.delete_by_user(user_id)
+        self._changed(user_id)
         return True
 
 
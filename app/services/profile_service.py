@@ -0,0 +1,91 @@
+from ..repositories.borrowings_repository import BorrowingsRepository
+from ..repositories.favorites_repository import FavoritesRepository
+from ..repositories.users_repository import UsersRepository
+
+class ProfileService:
+    '''
+    Read model behind /api/user/profile. Each part of the page is a single
+    joined query, so the cost doesn't grow with the user's history.
+    '''
+
+    def __init__(
+            self,
+            users_repo: UsersRepository,
+            borrowings_repo: BorrowingsRepository,
+            favorites_repo: FavoritesRepository,
+            cache=None
+    ):
+        self.users_repo = users_repo
+        self.borrowings_repo = borrowings_repo
+        self.favorites_repo = favorites_repo
+        self.cache = cache
+
+    def get_profile(self, user_id, history_page=1, history_per_page=20):
+        if history_page < 1:
+            raise ValueError("Invalid page count")
+        
+        if history_per_page < 1 or history_per_page > 100:
+            raise ValueError("Items per page must be between 1 and 100")
+        
+        build = lambda: self._profile(user_id, history_page, history_per_page)
+        if not self.cache:
+            return build()
+
+        # dropped by the user's borrows, returns, favorites and updates
+        return self.cache.get_or_set(
+            "users.profile",
+            (user_id, history_page, history_per_page),
+            build,
+            tags=(f"user:{user_id}",)
+        )
+
+    def _profile(self, user_id, history_page, history_per_page):
+        user = self.users_repo.by_id(user_id)
+        if not user:
+            raise ValueError("User not found")
+        
+        current = self.borrowings_repo.current_by_user(user_id)
+        history = self.borrowings_repo.history_by_user(
+            user_id,
+            page=history_page,
+            per_page=history_per_page
+        )
+        favorites = self.favorites_repo.titles_by_user(user_id)
+
+        return {
+            "id": user.id,
+            "username": user.username,
+            "email": user.email,
+            "joined_date": user.created_at.isoformat(),
+            "active_borrowings": self.serialize_borrowings(current),
+            "history": {
+                "current_page": history.page,
+                "items_per_page": history.per_page,
+                "total_items": history.total,
+                "total_pages": history.pages,
+                "borrowings": self.serialize_borrowings(history.items)
+            },
+            "favorites": [
+                {
+                    "id": f.id,
+                    "book_id": f.book_id,
+                    "title": f.title
+                }
+                for f in favorites
+            ]
+        }
+    
+    def serialize_borrowings(self, rows):
+        return [
+            {
+                "id": b.id,
+                "book_id": b.book_id,
+                "title": b.title,
+                "author": b.author,
+                "borrowed_at": b.borrowed_at,
+                "due_at": b.due_at,
+                "returned_at": b.returned_at,
+                "status": b.status
+            }
+            for b in rows
+        ]
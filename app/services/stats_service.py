@@ -0,0 +1,32 @@
+from ..repositories.stats_repository import StatsRepository
+
+class StatsService:
+    def __init__(self, repo: StatsRepository):
+        self.repo = repo
+
+    # admin dashboard figures, read from the counters table
+    def get_stats(self):
+        totals, daily = self.repo.snapshot()
+
+        return {
+            "books": {
+                "total": totals["books"],
+                "copies": totals["copies"],
+                "available_copies": totals["available_copies"],
+                "out_of_stock": totals["out_of_stock_books"]
+            },
+            "users": {
+                "total": totals["users"],
+                "new_today": daily["new_users"]
+            },
+            "borrowings": {
+                "total": totals["borrowings"],
+                "active": totals["active_loans"],
+                "overdue": totals["overdue_loans"],
+                "borrowed_today": daily["borrowings"],
+                "returned_today": daily["returns"]
+            }
+        }
+    
+    def rebuild(self):
+        return self.repo.rebuild()
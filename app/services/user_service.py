@@ -1,10 +1,32 @@
 from ..repositories.users_repository import UsersRepository
-from werkzeug.security import check_password_hash, generate_password_hash
+from ..passwords import PasswordHasher, HasherBusy, password_hasher
 from email_validator import validate_email, EmailNotValidError
 
+# "auto" leaves histories above PURGE_THRESHOLD rows to the purger
+DELETE_MODES = ("auto", "now", "background")
+
 class UserService:
-    def __init__(self, repo: UsersRepository):
+    def __init__(
+            self,
+            repo: UsersRepository,
+            principals=None,
+            hasher: PasswordHasher = password_hasher,
+            purger=None,
+            cache=None
+    ):
         self.repo = repo
+        self.principals = principals
+        self.hasher = hasher
+        self.purger = purger
+        self.cache = cache
+
+    # the role and everything cached for the user's pages; a deleted
+    # user's loans also put copies back on the shelf
+    def _changed(self, user_id, deleted=False):
+        if self.principals:
+            self.principals.invalidate(user_id)
+        if self.cache:
+            self.cache.invalidate(f"user:{user_id}", *(("catalog", "books") if deleted else ()))
 
     def create_new_user(self, username, email, password):
         if not username:
@@ -41,12 +63,15 @@ class UserService:
         return self.repo.create(
             username=username,
             email=normalized_email,
-            password=generate_password_hash(password)
+            password=self.hasher.hash(password)
         )
     
     def get_or_create_google_user(self, email, username):
         user = self.repo.by_email(email=email)
 
+        if user and user.purge_requested_at:
+            raise ValueError("Account is being deleted")
+
         if user:
             return user
         
@@ -64,7 +89,7 @@ class UserService:
     def get_user_by_id(self, id):
         user = self.repo.by_id(id=id)
 
-        if not user:
+        if not user or user.purge_requested_at:
             raise ValueError("User not found")
         
         return user
@@ -95,7 +120,11 @@ class UserService:
         if not updates:
             raise ValueError("No updates provided")
         
-        return self.repo.update(user_id=user_id, updates=updates)
+        updated = self.repo.update(user_id=user_id, updates=updates)
+
+        # the role may have changed
+        self._changed(user_id)
+        return updated
     
     def update_password(self, user_id, current_pass, new_pass, confirm_pass):
         user = self.repo.by_id(user_id)
@@ -103,7 +132,7 @@ class UserService:
             raise ValueError("User not found")
 
         if current_pass and new_pass and confirm_pass:
-            if not check_password_hash(user.password, current_pass):
+            if not self.hasher.verify(user.password, current_pass):
                 raise ValueError("Invalid password for the user")
             
             if new_pass != confirm_pass:
@@ -112,22 +141,60 @@ class UserService:
             raise ValueError("Password cannot be empty")
         
         # if passed hash and update password
-        hashed = generate_password_hash(new_pass)
+        hashed = self.hasher.hash(new_pass)
 
         return self.repo.update(
             user_id=user_id,
             updates={"password": hashed}
         )
 
-    # delete by id
-    def delete_user_by_id(self, id):
+    # delete by id, returns "deleted" or "queued" for the purger
+    def delete_user_by_id(self, id, mode="auto"):
+        if mode not in DELETE_MODES:
+            raise ValueError("Mode must be 'auto', 'now' or 'background'")
+
         user = self.repo.by_id(id)
 
         if not user:
             raise ValueError("User not found")
 
-        self.repo.delete(id=id)
-        return True
+        if self.purger and mode != "now" and (
+            mode == "background"
+            or self.repo.history_size(id, self.purger.threshold) >= self.purger.threshold
+        ):
+            self.repo.request_purge(id)
+            self.purger.wake()
+
+            # gone as far as anyone can tell, the rows follow later
+            self._changed(id, deleted=True)
+            return "queued"
+
+        deleted = self.repo.delete(id=id)
+
+        self._changed(id, deleted=True)
+        return "deleted" if deleted else None
+
+    # history in batches, then the user, stops early once `stopping` is set
+    def purge_user(self, id, batch_size=1000, stopping=None):
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+
+        while self.repo.purge_batch(id, batch_size):
+            if stopping and stopping.is_set():
+                return False
+
+        deleted = self.repo.delete(id=id)
+
+        self._changed(id, deleted=True)
+        return deleted
+
+    def purge_pending(self, batch_size=1000, stopping=None):
+        purged = 0
+        for id in self.repo.pending_purges():
+            if stopping and stopping.is_set():
+                break
+            purged += int(bool(self.purge_user(id, batch_size, stopping)))
+        return purged
 
     # validate user's credentials
     def check_user_credentials(self, username_or_email, password):
@@ -140,13 +207,23 @@ class UserService:
         if not user:
             user = self.repo.by_email(email=username_or_email)
 
-        # check if exist
-        if not user:
+        # check if exist, a user queued for the purger is already gone
+        if not user or user.purge_requested_at:
             raise ValueError(f"No account found for user: {username_or_email}")
         
         # check password for username
-        if not check_password_hash(user.password, password):
+        if not self.hasher.verify(user.password, password):
             raise ValueError(f"Wrong password for user '{username_or_email}'")
+        
+        # upgrade hashes made with older parameters while we have the password
+        if self.hasher.needs_rehash(user.password):
+            try:
+                self.repo.update(
+                    user_id=user.id,
+                    updates={"password": self.hasher.hash(password)}
+                )
+            except HasherBusy:
+                pass
             
         return user
 
@@ -103,6 +103,7 @@ export const ProfileController = {
     views.ProfileView.init({
       profile: this.profile,
       onReturnClicked: this.handleReturn.bind(this),
+      onHistoryPageChange: this.handleHistoryPage.bind(this),
       onRemoveFavoriteClicked: this.handleRemoveFavorite.bind(this),
       onUpdateUsername: this.handleUsernameUpdate.bind(this),
       onUpdateEmail: this.handleEmailUpdate.bind(this),
@@ -179,18 +180,25 @@ export const ProfileController = {
       // Reload active borrowings
       views.ProfileView.renderActiveBorrowings(refreshedProfile);
 
-      const refreshedHistory = refreshedProfile.all_borrowings.filter(
-        (b) => b.status === "returned"
-      );
-
       // Reload history
-      views.ProfileView.renderBorrowingsHistory(refreshedHistory);
+      views.ProfileView.renderBorrowingsHistory(refreshedProfile);
     } else if (response.status === 400) {
       // Show error toast notification
       utils.UI.showToast(data.msg, data.type);
     }
   },
 
+  // history is paginated, only that table is reloaded
+  async handleHistoryPage(page) {
+    const history = this.profile.history;
+    if (page < 1 || page > history.total_pages) return;
+
+    this.profile = await services.UserService.loadProfile({
+      history_page: page,
+    });
+    views.ProfileView.renderBorrowingsHistory(this.profile);
+  },
+
   // remove favorite book
   async handleRemoveFavorite(favId) {
     const { response, data } = await services.Api.request("/favorites/delete", {
@@ -220,17 +228,14 @@ export const ProfileController = {
 
 export const AdminController = {
   async init() {
-    this.borrowings = await services.BorrowingService.loadAll();
-    this.users = await services.UserService.loadAll();
-    this.books = await services.BookService.loadForAdmin();
+    // counters are kept up to date on the server, no rows are downloaded
+    this.stats = await services.StatsService.load();
     this.activity = await services.ActivityService.loadRecent();
 
     views.AdminView.init();
 
     views.AdminView.render({
-      users: this.users,
-      books: this.books,
-      borrowings: this.borrowings,
+      stats: this.stats,
       activity: this.activity,
     });
   },
@@ -242,10 +247,21 @@ export const AdminController = {
 
 export const AllActivityController = {
   async init() {
-    this.activity = await services.ActivityService.loadAll();
+    this.page = await services.ActivityService.loadAll();
 
-    views.AllActivityView.init();
-    views.AllActivityView.render(this.activity);
+    views.AllActivityView.init({
+      onLoadMore: this.handleLoadMore.bind(this),
+    });
+    views.AllActivityView.render(this.page);
+  },
+
+  async handleLoadMore() {
+    if (!this.page.next_cursor) return;
+
+    this.page = await services.ActivityService.loadAll({
+      cursor: this.page.next_cursor,
+    });
+    views.AllActivityView.append(this.page);
   },
 };
 
@@ -254,39 +270,78 @@ export const AllActivityController = {
 ======================== */
 
 export const ManageBooksController = {
-  searchQuery: "",
-  visibleBooks: [],
+  query: {
+    page: 1,
+    per_page: 25,
+    sort: "id",
+    order: "asc",
+    q: "",
+    availability: "",
+  },
 
   async init() {
-    this.allBooks = await services.BookService.loadForAdmin();
-    this.visibleBooks = [...this.allBooks];
+    this.data = await this.load();
 
     views.ManageBooksView.init({
-      books: this.visibleBooks,
+      data: this.data,
       onSearch: this.handleSearch.bind(this),
+      onSort: this.handleSort.bind(this),
+      onFilter: this.handleFilter.bind(this),
+      onPageChange: this.handlePageChange.bind(this),
       onDeleteBookClicked: this.handleDeleteBook.bind(this),
       onAddBookSubmit: this.handleAddBook.bind(this),
       onEditBookSubmit: this.handleEditBook.bind(this),
     });
   },
 
-  handleSearch(query) {
-    this.searchQuery = query;
+  // only send the params that are set
+  async load() {
+    const params = Object.fromEntries(
+      Object.entries(this.query).filter(([, value]) => value)
+    );
 
-    let data = [...this.allBooks];
+    return await services.BookService.loadForAdmin(params);
+  },
 
-    if (this.searchQuery) {
-      const q = this.searchQuery.trim().toLowerCase();
+  async refresh() {
+    this.data = await this.load();
+    views.ManageBooksView.render(this.data, this.query);
+  },
 
-      data = data.filter(
-        (book) =>
-          book.title.toLowerCase().includes(q) ||
-          book.author.toLowerCase().includes(q)
-      );
+  handleSearch(query) {
+    clearTimeout(this.searchTimer);
+
+    // wait for the user to stop typing before asking the server
+    this.searchTimer = setTimeout(() => {
+      this.query.q = query.trim();
+      this.query.page = 1;
+      this.refresh();
+    }, 250);
+  },
+
+  handleSort(column) {
+    if (this.query.sort === column) {
+      this.query.order = this.query.order === "asc" ? "desc" : "asc";
+    } else {
+      this.query.sort = column;
+      this.query.order = "asc";
     }
 
-    this.visibleBooks = data;
-    views.ManageBooksView.renderBooksTable(this.visibleBooks);
+    this.query.page = 1;
+    this.refresh();
+  },
+
+  handleFilter(availability) {
+    this.query.availability = availability;
+    this.query.page = 1;
+    this.refresh();
+  },
+
+  handlePageChange(page) {
+    if (page < 1 || page > this.data.total_pages) return;
+
+    this.query.page = page;
+    this.refresh();
   },
 
   async handleAddBook(form) {
@@ -296,8 +351,7 @@ export const ManageBooksController = {
     utils.UI.showToast(data.msg, data.type);
 
     if (response.status === 201) {
-      const refreshed = await services.BookService.loadForAdmin();
-      views.ManageBooksView.render(refreshed);
+      this.refresh();
     }
   },
 
@@ -311,7 +365,7 @@ export const ManageBooksController = {
     utils.UI.showToast(data.msg, data.type);
 
     if (response.status === 200) {
-      this.init();
+      this.refresh();
     }
   },
 
@@ -321,8 +375,7 @@ export const ManageBooksController = {
     utils.UI.showToast(data.msg, data.type);
 
     if (response.status === 200) {
-      const refreshed = await services.BookService.loadForAdmin();
-      views.ManageBooksView.render(refreshed);
+      this.refresh();
     }
   },
 };
@@ -421,54 +474,67 @@ export const ManageUsersController = {
 ======================== */
 
 export const ManageBorrowingsController = {
-  visibleBorrowings: [],
+  query: {
+    page: 1,
+    per_page: 25,
+    status: "",
+    q: "",
+  },
 
   async init() {
-    this.allBorrowings = await services.BorrowingService.loadAll();
-    this.visibleBorrowings = [...this.allBorrowings];
+    this.data = await this.load();
 
     views.ManageBorrowingsView.init({
-      books: this.allBorrowings,
+      data: this.data,
       applyFilters: this.handleFiltering.bind(this),
+      onPageChange: this.handlePageChange.bind(this),
       onReturnClicked: this.handleForceReturn.bind(this),
     });
   },
 
+  // only send the params that are set
+  async load() {
+    const params = Object.fromEntries(
+      Object.entries(this.query).filter(([, value]) => value)
+    );
+
+    return await services.BorrowingService.loadAll(params);
+  },
+
+  async refresh() {
+    this.data = await this.load();
+    views.ManageBorrowingsView.render(this.data);
+  },
+
   async handleForceReturn(borrowingId) {
     const { response, data } = await services.BorrowingService.returnBook(
       borrowingId
     );
 
+    utils.UI.showToast(data.msg, data.type);
+
     if (response.status === 200) {
-      utils.UI.showToast(data.msg, data.type);
-      const refreshed = await services.BorrowingService.loadAll();
-      views.ManageBorrowingsView.render(refreshed);
-    } else {
-      utils.UI.showToast(data.msg, data.type);
+      this.refresh();
     }
   },
 
   handleFiltering(options) {
-    let data = [...this.allBorrowings];
+    clearTimeout(this.searchTimer);
 
-    // Status
-    if (options.statusFilter !== "all") {
-      data = data.filter(
-        (b) => b.status.toLowerCase() === options.statusFilter
-      );
-    }
+    // wait for the user to stop typing before asking the server
+    this.searchTimer = setTimeout(() => {
+      this.query.status = options.statusFilter === "all" ? "" : options.statusFilter;
+      this.query.q = options.searchQuery.trim();
+      this.query.page = 1;
+      this.refresh();
+    }, 250);
+  },
 
-    // Search
-    if (options.searchQuery) {
-      const q = options.searchQuery.trim().toLowerCase();
-      data = data.filter(
-        (b) =>
-          b.user.toLowerCase().includes(q) || b.book.toLowerCase().includes(q)
-      );
-    }
+  handlePageChange(page) {
+    if (page < 1 || page > this.data.total_pages) return;
 
-    this.visibleBorrowings = data;
-    views.ManageBorrowingsView.renderBorrowingsTable(this.visibleBorrowings);
+    this.query.page = page;
+    this.refresh();
   },
 };
 
@@ -683,17 +749,25 @@ export const BrowseBookController = {
   },
 
   async handleSearch(q) {
-    // set param value
-    const url = new URL(window.location);
-    url.searchParams.set("q", q);
-    url.searchParams.set("page", 1);
-
-    // push to url
-    window.history.pushState({}, "", url);
-
-    // render
-    const searched = await services.BookService.loadAll();
-    views.BrowseBookView.render(searched);
+    // suggestions are cheap, show them on every keystroke
+    const suggested = await services.BookService.suggest(q);
+    views.BrowseBookView.renderSuggestions(suggested);
+
+    // the full listing waits for the user to stop typing
+    clearTimeout(this.searchTimer);
+    this.searchTimer = setTimeout(async () => {
+      // set param value
+      const url = new URL(window.location);
+      url.searchParams.set("q", q);
+      url.searchParams.set("page", 1);
+
+      // push to url
+      window.history.pushState({}, "", url);
+
+      // render
+      const searched = await services.BookService.loadAll();
+      views.BrowseBookView.render(searched);
+    }, 300);
   },
 
   async handleClearSearch() {
@@ -85,8 +85,10 @@ export const AuthService = {
 ======================== */
 
 export const BookService = {
-  async loadForAdmin() {
-    const { response, data } = await Api.request("/books/admin", {
+  async loadForAdmin(params = {}) {
+    const q = new URLSearchParams(params).toString();
+
+    const { response, data } = await Api.request(`/books/admin?${q}`, {
       method: "GET",
     });
 
@@ -123,6 +125,18 @@ export const BookService = {
     return [];
   },
 
+  // Lightweight completions for the search box
+  async suggest(q) {
+    const params = new URLSearchParams({ q }).toString();
+
+    const { response, data } = await Api.request(`/books/suggest?${params}`, {
+      method: "GET",
+    });
+
+    if (response.ok) return data;
+    return { did_you_mean: false, suggestions: [] };
+  },
+
   async loadById(bookId) {
     const { response, data } = await Api.request(`/books/${bookId}`, {
       method: "GET",
@@ -186,8 +200,10 @@ export const BorrowingService = {
     return { response, data };
   },
 
-  async loadAll() {
-    const { response, data } = await Api.request("/borrowings/all", {
+  async loadAll(params = {}) {
+    const q = new URLSearchParams(params).toString();
+
+    const { response, data } = await Api.request(`/borrowings/all?${q}`, {
       method: "GET",
     });
 
@@ -209,13 +225,29 @@ export const BorrowingService = {
   },
 };
 
+/* ========================
+   ADMIN STATS
+======================== */
+
+export const StatsService = {
+  async load() {
+    const { response, data } = await Api.request("/admin/stats", {
+      method: "GET",
+    });
+    if (!response.ok) return null;
+    return data;
+  },
+};
+
 /* ========================
    USER
 ======================== */
 
 export const UserService = {
-  async loadProfile() {
-    const { response, data } = await Api.request("/user/profile", {
+  async loadProfile(params = {}) {
+    const q = new URLSearchParams(params).toString();
+
+    const { response, data } = await Api.request(`/user/profile?${q}`, {
       method: "GET",
     });
     if (!response.ok) return null;
@@ -301,11 +333,14 @@ export const AdminService = {
 ======================== */
 
 export const ActivityService = {
-  async loadAll() {
-    const { response, data } = await Api.request("/activities/all", {
+  // One page of the feed, pass { cursor } for the next one
+  async loadAll(params = {}) {
+    const q = new URLSearchParams(params).toString();
+
+    const { response, data } = await Api.request(`/activities/all?${q}`, {
       method: "GET",
     });
-    if (!response.ok) return [];
+    if (!response.ok) return { activities: [], next_cursor: null };
     return data;
   },
 
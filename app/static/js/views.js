@@ -112,6 +112,7 @@ export const ProfileView = {
   init({
     profile,
     onReturnClicked,
+    onHistoryPageChange,
     onRemoveFavoriteClicked,
     onUpdateUsername,
     onUpdateEmail,
@@ -134,6 +135,12 @@ export const ProfileView = {
     this.history = document.getElementById("borrowings-history");
     this.favorites = document.getElementById("favorite-books");
 
+    // history pagination
+    this.historyPagination = document.getElementById("history-pagination");
+    this.historyPageTrack = document.getElementById("history-page-track");
+    this.historyNextBtn = document.getElementById("history-next-btn");
+    this.historyPrevBtn = document.getElementById("history-prev-btn");
+
     if (
       !this.active ||
       !this.username ||
@@ -151,6 +158,7 @@ export const ProfileView = {
     this.bindEvents(
       profile,
       onReturnClicked,
+      onHistoryPageChange,
       onRemoveFavoriteClicked,
       onUpdateUsername,
       onUpdateEmail,
@@ -191,6 +199,7 @@ export const ProfileView = {
   bindEvents(
     profile,
     onReturnClicked,
+    onHistoryPageChange,
     onRemoveFavoriteClicked,
     onUpdateUsername,
     onUpdateEmail,
@@ -237,6 +246,15 @@ export const ProfileView = {
       onReturnClicked(borrowingId);
     });
 
+    // History pages
+    this.historyNextBtn.addEventListener("click", () => {
+      onHistoryPageChange(this.historyPage + 1);
+    });
+
+    this.historyPrevBtn.addEventListener("click", () => {
+      onHistoryPageChange(this.historyPage - 1);
+    });
+
     // Remove favorite
     this.favorites.addEventListener("click", (e) => {
       const removeFavoriteBtn = e.target.closest(".remove-favorite-btn");
@@ -411,9 +429,7 @@ export const ProfileView = {
     tbody.innerHTML = "";
 
     // Active borrowings
-    const activeBorrowings = profile.all_borrowings.filter(
-      (b) => b.status === "active" || b.status === "overdue"
-    );
+    const activeBorrowings = profile.active_borrowings;
 
     // empty state
     if (activeBorrowings.length === 0) {
@@ -472,9 +488,8 @@ export const ProfileView = {
     const table = this.historyTable;
     tbody.innerHTML = "";
 
-    const borrowingsHistory = profile.all_borrowings.filter(
-      (b) => b.status === "returned"
-    );
+    const borrowingsHistory = profile.history.borrowings;
+    this.renderHistoryPagination(profile.history);
 
     if (borrowingsHistory.length === 0) {
       table.classList.add("is-empty");
@@ -515,6 +530,17 @@ export const ProfileView = {
     });
   },
 
+  renderHistoryPagination(history) {
+    this.historyPage = history.current_page;
+
+    const hidePagination = history.total_pages <= 1;
+    this.historyPagination.classList.toggle("hidden", hidePagination);
+
+    this.historyPageTrack.textContent = `${history.current_page} of ${history.total_pages}`;
+    this.historyPrevBtn.disabled = history.current_page <= 1;
+    this.historyNextBtn.disabled = history.current_page >= history.total_pages;
+  },
+
   // Favorites
   renderFavorites(profile) {
     const tbody = this.favorites;
@@ -595,24 +621,24 @@ export const AdminView = {
   },
 
   // render admin overview page
-  render({ users, books, borrowings, activity }) {
+  render({ stats, activity }) {
+    const { users, books, borrowings } = stats;
+
     // attention required
-    const overdues = borrowings.filter((b) => b.status === "overdue");
-    if (overdues.length > 0) {
+    if (borrowings.overdue > 0) {
       document.getElementById("overdue-link").classList.remove("hidden");
-      this.overdueAttentionCount.textContent = overdues.length;
+      this.overdueAttentionCount.textContent = borrowings.overdue;
     }
 
-    const outOfStockBooks = books.filter((b) => b.total_copies === 0);
-    if (outOfStockBooks.length > 0) {
+    if (books.out_of_stock > 0) {
       document.getElementById("stock-link").classList.remove("hidden");
-      this.stockAttentionCount.textContent = outOfStockBooks.length;
+      this.stockAttentionCount.textContent = books.out_of_stock;
     }
 
     // KPIs
-    this.borrowingsCount.textContent = `${borrowings.length}`;
-    this.usersCount.textContent = `${users.length}`;
-    this.booksCount.textContent = `${books.length}`;
+    this.borrowingsCount.textContent = `${borrowings.total}`;
+    this.usersCount.textContent = `${users.total}`;
+    this.booksCount.textContent = `${books.total}`;
 
     // recent activity
     this.renderRecentActivity(activity);
@@ -659,6 +685,8 @@ export const AdminView = {
         return `<p><span class="user">${username}</span> borrowed <span class="book">${bookTitle}</span></p>`;
       case "RETURN_BOOK":
         return `<p><span class="user">${username}</span> returned <span class="book">${bookTitle}</span></p>`;
+      case "OVERDUE_BOOK":
+        return `<p><span class="user">${username}</span> is late returning <span class="book">${bookTitle}</span></p>`;
       case "REGISTER":
         return `<p><span class="user">${username}</span> has signed up</p>`;
       default:
@@ -672,25 +700,34 @@ export const AdminView = {
 ======================== */
 
 export const AllActivityView = {
-  init() {
+  init({ onLoadMore }) {
     this.list = document.getElementById("all-activity");
+    this.loadMoreBtn = document.getElementById("load-more");
+
+    if (!this.list || !this.loadMoreBtn) return;
+
+    this.loadMoreBtn.addEventListener("click", () => onLoadMore());
+  },
 
-    if (!this.list) return;
+  render(page) {
+    this.list.innerHTML = "";
+    this.append(page);
   },
 
-  render(activities) {
-    this.renderAllActivityList(activities);
+  // add a page of the feed below what is already shown
+  append(page) {
+    this.renderAllActivityList(page.activities);
+    this.loadMoreBtn.classList.toggle("hidden", !page.next_cursor);
   },
 
   renderAllActivityList(activities) {
     // if there's no activitie
-    if (!activities) {
+    if (!activities.length && !this.list.children.length) {
       this.list.innerHTML = "No activities found 👀..";
       return;
     }
 
     // if there's activities
-    this.list.innerHTML = "";
     activities.forEach((act) => {
       const activity = `
         <li class="recent-activity-list-item">
@@ -713,6 +750,8 @@ export const AllActivityView = {
         return `<p><span class="user">${username}</span> borrowed <span class="book">${bookTitle}</span></p>`;
       case "RETURN_BOOK":
         return `<p><span class="user">${username}</span> returned <span class="book">${bookTitle}</span></p>`;
+      case "OVERDUE_BOOK":
+        return `<p><span class="user">${username}</span> is late returning <span class="book">${bookTitle}</span></p>`;
       case "REGISTER":
         return `<p><span class="user">${username}</span> has signed up</p>`;
       default:
@@ -1028,8 +1067,11 @@ export const NavbarView = {
 
 export const ManageBooksView = {
   init({
-    books,
+    data,
     onSearch,
+    onSort,
+    onFilter,
+    onPageChange,
     onDeleteBookClicked,
     onAddBookSubmit,
     onEditBookSubmit,
@@ -1038,6 +1080,13 @@ export const ManageBooksView = {
 
     this.searchField = document.getElementById("search-field");
     this.clearSearch = document.getElementById("clear-search");
+    this.filters = document.getElementById("books-filters");
+
+    // pagination
+    this.pagination = document.getElementById("pagination");
+    this.pageTrack = document.getElementById("page-track");
+    this.nextBtn = document.getElementById("next-btn");
+    this.prevBtn = document.getElementById("prev-btn");
 
     this.addFormImgFile = document.getElementById("add-form-img-file");
     this.addBookFileName = document.getElementById("add-book-file-name");
@@ -1048,22 +1097,36 @@ export const ManageBooksView = {
     if (!this.container || !this.addFormImgFile || !this.editFormImgFile)
       return;
 
-    this.books = books;
-
-    this.render(books);
+    this.render(data);
     this.bindEvents(
       onSearch,
+      onSort,
+      onFilter,
+      onPageChange,
       onDeleteBookClicked,
       onAddBookSubmit,
       onEditBookSubmit
     );
   },
 
-  render(books) {
-    this.renderBooksTable(books);
+  render(data, query) {
+    this.books = data.books;
+    this.currentPage = data.current_page;
+
+    this.renderBooksTable(data.books);
+    this.renderPagination(data);
+    if (query) this.renderSortState(query);
   },
 
-  bindEvents(onSearch, onDeleteBookClicked, onAddBookSubmit, onEditBookSubmit) {
+  bindEvents(
+    onSearch,
+    onSort,
+    onFilter,
+    onPageChange,
+    onDeleteBookClicked,
+    onAddBookSubmit,
+    onEditBookSubmit
+  ) {
     this.searchField.addEventListener("input", (e) => {
       onSearch(e.target.value);
 
@@ -1077,6 +1140,23 @@ export const ManageBooksView = {
     this.clearSearch.addEventListener("click", () => {
       this.searchField.value = "";
       this.clearSearch.classList.add("hidden");
+      onSearch("");
+    });
+
+    this.filters.addEventListener("change", (e) => {
+      onFilter(e.target.value);
+    });
+
+    document.querySelectorAll(".books th[data-sort]").forEach((th) => {
+      th.addEventListener("click", () => onSort(th.dataset.sort));
+    });
+
+    this.nextBtn.addEventListener("click", () => {
+      onPageChange(this.currentPage + 1);
+    });
+
+    this.prevBtn.addEventListener("click", () => {
+      onPageChange(this.currentPage - 1);
     });
 
     this.container.addEventListener("click", async (e) => {
@@ -1181,6 +1261,22 @@ export const ManageBooksView = {
     document.querySelector("[data-modal]:not(.hidden)").classList.add("hidden");
   },
 
+  renderPagination(data) {
+    const hidePagination = data.total_pages <= 1;
+    this.pagination.classList.toggle("hidden", hidePagination);
+
+    this.pageTrack.textContent = `${data.current_page} of ${data.total_pages}`;
+    this.prevBtn.disabled = data.current_page <= 1;
+    this.nextBtn.disabled = data.current_page >= data.total_pages;
+  },
+
+  renderSortState(query) {
+    document.querySelectorAll(".books th[data-sort]").forEach((th) => {
+      th.classList.remove("asc", "desc");
+      if (th.dataset.sort === query.sort) th.classList.add(query.order);
+    });
+  },
+
   renderBooksTable(books) {
     const tbody = this.container;
     const table = document.querySelector(".books");
@@ -1216,7 +1312,7 @@ export const ManageBooksView = {
         <td class="id">${b.id}</td>
         <td class="title">${b.title}</td>
         <td class="author">${b.author}</td>
-        <td class="copies">${b.total_copies}</td>
+        <td class="copies">${b.available_copies}/${b.total_copies}</td>
         <td>
           <div class="table-btns">
             <button
@@ -1457,7 +1553,7 @@ export const ManageBorrowingsView = {
     statusFilter: "all",
   },
 
-  init({ books, applyFilters, onReturnClicked }) {
+  init({ data, applyFilters, onPageChange, onReturnClicked }) {
     this.container = document.getElementById("manage-borrowings-data");
 
     this.searchField = document.getElementById("search-field");
@@ -1465,17 +1561,34 @@ export const ManageBorrowingsView = {
 
     this.filters = document.getElementById("borrowings-filters");
 
+    // pagination
+    this.pagination = document.getElementById("pagination");
+    this.pageTrack = document.getElementById("page-track");
+    this.nextBtn = document.getElementById("next-btn");
+    this.prevBtn = document.getElementById("prev-btn");
+
     if (!this.container || !this.filters || !this.searchField) return;
 
-    this.render(books);
-    this.bindEvents(applyFilters, onReturnClicked);
+    this.render(data);
+    this.bindEvents(applyFilters, onPageChange, onReturnClicked);
   },
 
-  render(books) {
-    this.renderBorrowingsTable(books);
+  render(data) {
+    this.currentPage = data.current_page;
+    this.renderBorrowingsTable(data.borrowings);
+    this.renderPagination(data);
+  },
+
+  renderPagination(data) {
+    const hidePagination = data.total_pages <= 1;
+    this.pagination.classList.toggle("hidden", hidePagination);
+
+    this.pageTrack.textContent = `${data.current_page} of ${data.total_pages}`;
+    this.prevBtn.disabled = data.current_page <= 1;
+    this.nextBtn.disabled = data.current_page >= data.total_pages;
   },
 
-  bindEvents(applyFilters, onReturnClicked) {
+  bindEvents(applyFilters, onPageChange, onReturnClicked) {
     // Search listener
     this.searchField.addEventListener("input", (e) => {
       this.options.searchQuery = e.target.value;
@@ -1503,6 +1616,14 @@ export const ManageBorrowingsView = {
       applyFilters(this.options);
     });
 
+    this.nextBtn.addEventListener("click", () => {
+      onPageChange(this.currentPage + 1);
+    });
+
+    this.prevBtn.addEventListener("click", () => {
+      onPageChange(this.currentPage - 1);
+    });
+
     // Force return with admin
     this.container.addEventListener("click", async (e) => {
       e.preventDefault();
@@ -1597,6 +1718,8 @@ export const BrowseBookView = {
     // search
     this.searchInput = document.getElementById("search-field");
     this.clearSearch = document.getElementById("clear-search");
+    this.suggestions = document.getElementById("search-suggestions");
+    this.didYouMean = document.getElementById("did-you-mean");
 
     // counters
     this.booksCount = document.getElementById("books-count");
@@ -1626,9 +1749,15 @@ export const BrowseBookView = {
     // clear search
     this.clearSearch.addEventListener("click", (e) => {
       this.hideClearSearch();
+      this.hideSuggestions();
       onClearSearch();
     });
 
+    // close suggestions when leaving the search box
+    this.searchInput.addEventListener("blur", () => {
+      setTimeout(() => this.hideSuggestions(), 150);
+    });
+
     this.nextBtn.addEventListener("click", () => {
       this.onPageChange(this.currentPage + 1);
     });
@@ -1646,6 +1775,48 @@ export const BrowseBookView = {
     this.clearSearch.classList.add("hidden");
   },
 
+  hideSuggestions() {
+    this.suggestions.classList.add("hidden");
+  },
+
+  renderSuggestions(data) {
+    this.suggestions.innerHTML = "";
+
+    if (!data.suggestions.length) {
+      this.hideSuggestions();
+      return;
+    }
+
+    if (data.did_you_mean) {
+      this.suggestions.insertAdjacentHTML(
+        "beforeend",
+        `<li class="suggestion-hint">Did you mean</li>`
+      );
+    }
+
+    data.suggestions.forEach((b) => {
+      this.suggestions.insertAdjacentHTML(
+        "beforeend",
+        `
+          <li>
+            <a href="/books/${b.id}">
+              <span class="suggestion-title">${b.title}</span>
+              <span class="suggestion-author">${b.author}</span>
+            </a>
+          </li>
+        `
+      );
+    });
+
+    this.suggestions.classList.remove("hidden");
+  },
+
+  renderDidYouMean(titles = []) {
+    this.didYouMean.textContent = titles.length
+      ? `Did you mean: ${titles.join(", ")}?`
+      : "";
+  },
+
   render(data, onPageChange) {
     this.currentPage = data.current_page;
     this.onPageChange = onPageChange;
@@ -1655,6 +1826,7 @@ export const BrowseBookView = {
 
     this.renderTotalItems(data);
     this.renderBooks(data.books);
+    this.renderDidYouMean(data.did_you_mean);
 
     const hidePagination = isEmpty || isSingePage;
 
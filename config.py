@@ -6,6 +6,91 @@ load_dotenv()
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DB_URL")
     SECRET_KEY = os.getenv("SECRET_KEY")
+
+    # DATABASE SESSIONS (timestamps are naive UTC: now() defaults must be
+    # stamped in UTC whatever the server's timezone)
+    SQLALCHEMY_ENGINE_OPTIONS = {"connect_args": {"options": "-c timezone=UTC"}}
+
+    # BOOK SEARCH ("fulltext" or "basic" for plain ILIKE matching)
+    BOOK_SEARCH_MODE = os.getenv("BOOK_SEARCH_MODE", "fulltext")
+
+    # SEARCH SUGGESTIONS
+    SUGGEST_LIMIT = int(os.getenv("SUGGEST_LIMIT", 8))
+    SUGGEST_TIMEOUT_MS = int(os.getenv("SUGGEST_TIMEOUT_MS", 150))
+
+    # IN-MEMORY CATALOG INDEX (rebuilt when older than MAX_AGE seconds)
+    CATALOG_INDEX_ENABLED = os.getenv("CATALOG_INDEX_ENABLED", "false").lower() == "true"
+    CATALOG_INDEX_MAX_AGE = int(os.getenv("CATALOG_INDEX_MAX_AGE", 300))
+    
+    # CATALOG HTTP CACHING (seconds clients may reuse a catalog response
+    # without asking, 0 revalidates every time with If-None-Match)
+    CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", 0))
+    
+    # RESPONSE CACHE (catalog pages, book pages and profiles for up to TTL
+    # seconds, dropped early by the writes that change them; STORAGE_URI is
+    # memory:// per worker or sqlite:///<path> shared by the workers on a
+    # host, sqlite:/// alone for a file in the instance folder)
+    CACHE_ENABLED = os.getenv("CACHE_ENABLED", "false").lower() == "true"
+    CACHE_TTL = int(os.getenv("CACHE_TTL", 30))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+    CACHE_STORAGE_URI = os.getenv("CACHE_STORAGE_URI", "memory://")
+    
+    # CATALOG IMPORT (rows saved per INSERT ... ON CONFLICT)
+    BOOK_IMPORT_BATCH_SIZE = int(os.getenv("BOOK_IMPORT_BATCH_SIZE", 1000))
+    
+    # EXPORTS (rows per server-side cursor fetch / output chunk, and how many
+    # seconds incremental feeds stay behind the database clock; they also
+    # stop short of the oldest transaction still open)
+    EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 1000))
+    EXPORT_LAG = int(os.getenv("EXPORT_LAG", 300))
+    
+    # ADMIN ROLE CACHE (seconds a role may be served without a db lookup)
+    PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+    
+    # PASSWORD HASHING (werkzeug method with every parameter spelled out,
+    # e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:1000000"; older hashes are
+    # upgraded on the next sign-in. WORKERS=0 hashes on the request thread)
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", 0)) or None
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 10))
+    
+    # RATE LIMITING (token buckets per route and user/IP for write requests,
+    # shared by the workers on a host through a SQLite file in the instance
+    # folder unless RATELIMIT_STORAGE_URI is "memory://" or "sqlite:///<path>")
+    RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "true").lower() == "true"
+    RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI")
+    # share of a bucket a worker may take at once and spend locally
+    RATELIMIT_LEASE = float(os.getenv("RATELIMIT_LEASE", 0.1))
+    RATELIMIT_RULES = {
+        "auth_routes": os.getenv("RATELIMIT_AUTH", "10/minute"),
+        "borrowings_routes": os.getenv("RATELIMIT_WRITES", "30/minute"),
+        "favorites_routes": os.getenv("RATELIMIT_WRITES", "30/minute"),
+    }
+    
+    # ACTIVITY LOG ("sync" writes each event with the request, "async" queues
+    # up to QUEUE events for a background thread that inserts them BATCH at a
+    # time or INTERVAL seconds after the first one)
+    ACTIVITY_SINK_MODE = os.getenv("ACTIVITY_SINK_MODE", "sync")
+    ACTIVITY_SINK_BATCH = int(os.getenv("ACTIVITY_SINK_BATCH", 500))
+    ACTIVITY_SINK_INTERVAL = float(os.getenv("ACTIVITY_SINK_INTERVAL", 1.0))
+    ACTIVITY_SINK_QUEUE = int(os.getenv("ACTIVITY_SINK_QUEUE", 10000))
+    
+    # ACTIVITY PARTITIONS (monthly partitions created ahead of time, and full
+    # months kept before older ones are rolled up into daily counts and dropped)
+    ACTIVITY_PARTITIONS_AHEAD = int(os.getenv("ACTIVITY_PARTITIONS_AHEAD", 2))
+    ACTIVITY_RETENTION_MONTHS = int(os.getenv("ACTIVITY_RETENTION_MONTHS", 12))
+    
+    # OVERDUE SWEEPER (loans past due are marked BATCH at a time by
+    # `flask borrowings sweep-overdue`, or every INTERVAL seconds by each web
+    # worker when INTERVAL is above 0)
+    OVERDUE_SWEEP_INTERVAL = int(os.getenv("OVERDUE_SWEEP_INTERVAL", 0))
+    OVERDUE_SWEEP_BATCH = int(os.getenv("OVERDUE_SWEEP_BATCH", 1000))
+    
+    # PURGES (users and books with more than THRESHOLD rows of history are
+    # deleted in the background, BATCH_SIZE rows per table per transaction)
+    PURGE_THRESHOLD = int(os.getenv("PURGE_THRESHOLD", 10000))
+    PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", 1000))
     
     # GOOGLE AUTH
     GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
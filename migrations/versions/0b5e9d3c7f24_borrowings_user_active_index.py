@@ -0,0 +1,26 @@
+"""borrowings user active index
+
+Revision ID: 0b5e9d3c7f24
+Revises: f2b7d4e8a1c6
+Create Date: 2026-01-16 14:08:22.907115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b5e9d3c7f24'
+down_revision = 'f2b7d4e8a1c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('borrowings', schema=None) as batch_op:
+        batch_op.create_index('ix_borrowings_user_id_active', ['user_id', 'book_id'], unique=False, postgresql_where=sa.text('returned_at IS NULL'))
+
+
+def downgrade():
+    with op.batch_alter_table('borrowings', schema=None) as batch_op:
+        batch_op.drop_index('ix_borrowings_user_id_active', postgresql_where=sa.text('returned_at IS NULL'))
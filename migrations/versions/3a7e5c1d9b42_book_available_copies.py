@@ -0,0 +1,41 @@
+"""book available copies
+
+Revision ID: 3a7e5c1d9b42
+Revises: b1898daa033b
+Create Date: 2026-01-05 14:12:37.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a7e5c1d9b42'
+down_revision = 'b1898daa033b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('available_copies', sa.Integer(), server_default='1', nullable=False))
+
+    # borrowing used to decrement total_copies, so the stored value is
+    # what is left on the shelf: move it over and add the active loans
+    # back to get the real stock
+    op.execute("""
+        UPDATE books
+        SET available_copies = books.total_copies,
+            total_copies = books.total_copies + (
+                SELECT COUNT(*) FROM borrowings
+                WHERE borrowings.book_id = books.id
+                AND borrowings.returned_at IS NULL
+            )
+    """)
+
+
+def downgrade():
+    op.execute("UPDATE books SET total_copies = available_copies")
+
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_column('available_copies')
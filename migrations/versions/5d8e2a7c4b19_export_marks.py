@@ -0,0 +1,51 @@
+"""export marks
+
+Revision ID: 5d8e2a7c4b19
+Revises: 0b5e9d3c7f24
+Create Date: 2026-01-17 09:42:51.306218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d8e2a7c4b19'
+down_revision = '0b5e9d3c7f24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('export_marks',
+    sa.Column('feed', sa.String(length=100), nullable=False),
+    sa.Column('exported_until', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('feed')
+    )
+
+    # existing loans count as changed now, so the first incremental
+    # export after the upgrade includes all of them
+    with op.batch_alter_table('borrowings', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True))
+        batch_op.create_index('ix_borrowings_updated_at_id', ['updated_at', 'id'], unique=False)
+
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.create_index('ix_books_updated_at_id', ['updated_at', 'id'], unique=False)
+
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.create_index('ix_favorites_created_at_id', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('favorites', schema=None) as batch_op:
+        batch_op.drop_index('ix_favorites_created_at_id')
+
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_index('ix_books_updated_at_id')
+
+    with op.batch_alter_table('borrowings', schema=None) as batch_op:
+        batch_op.drop_index('ix_borrowings_updated_at_id')
+        batch_op.drop_column('updated_at')
+
+    op.drop_table('export_marks')
@@ -0,0 +1,43 @@
+"""books full text search
+
+Revision ID: 7d21f4b8c6e0
+Revises: 3a7e5c1d9b42
+Create Date: 2026-01-08 11:40:02.913377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '7d21f4b8c6e0'
+down_revision = '3a7e5c1d9b42'
+branch_labels = None
+depends_on = None
+
+# keep in sync with BOOK_SEARCH_DOCUMENT in app/models.py
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(author, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(subtitle, '')), 'B') || "
+    "setweight(to_tsvector('simple', coalesce(publisher, '')), 'C') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'D')"
+)
+
+
+def upgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.add_column(sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_DOCUMENT, persisted=True),
+            nullable=True
+        ))
+        batch_op.create_index('ix_books_search_vector', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_index('ix_books_search_vector', postgresql_using='gin')
+        batch_op.drop_column('search_vector')
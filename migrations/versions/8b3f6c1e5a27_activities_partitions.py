@@ -0,0 +1,106 @@
+"""activities partitions
+
+Revision ID: 8b3f6c1e5a27
+Revises: 5d8e2a7c4b19
+Create Date: 2026-01-18 10:05:37.614529
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3f6c1e5a27'
+down_revision = '5d8e2a7c4b19'
+branch_labels = None
+depends_on = None
+
+
+# activities is rebuilt as a table partitioned by month on created_at and
+# the rows copied over; it is locked while this runs
+def upgrade():
+    op.create_table('activity_daily_counts',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('activity_type', sa.String(length=255), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'activity_type')
+    )
+
+    op.execute("ALTER TABLE activities RENAME TO activities_unpartitioned")
+    op.execute("ALTER TABLE activities_unpartitioned RENAME CONSTRAINT activities_pkey TO activities_unpartitioned_pkey")
+    op.execute("ALTER INDEX ix_activities_created_at_id RENAME TO ix_activities_unpartitioned_created_at_id")
+
+    op.execute("""
+        CREATE TABLE activities (
+            id INTEGER NOT NULL DEFAULT nextval('activities_id_seq'),
+            activity_type VARCHAR(255) NOT NULL,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            target_id INTEGER REFERENCES books (id),
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+
+    # one partition per month from the oldest activity to two months out
+    op.execute("""
+        DO $$
+        DECLARE month timestamp;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    date_trunc('month', LEAST(COALESCE((SELECT MIN(created_at) FROM activities_unpartitioned), now()), now())),
+                    date_trunc('month', now()) + interval '2 months',
+                    interval '1 month'
+                )
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF activities FOR VALUES FROM (%L) TO (%L)',
+                    'activities_p' || to_char(month, 'YYYY_MM'),
+                    month,
+                    month + interval '1 month'
+                );
+            END LOOP;
+        END $$
+    """)
+    op.execute("CREATE TABLE activities_default PARTITION OF activities DEFAULT")
+
+    op.execute("""
+        INSERT INTO activities (id, activity_type, user_id, target_id, created_at)
+        SELECT id, activity_type, user_id, target_id, COALESCE(created_at, now())
+        FROM activities_unpartitioned
+    """)
+
+    op.create_index('ix_activities_created_at_id', 'activities', ['created_at', 'id'], unique=False)
+    op.create_index('ix_activities_user_id', 'activities', ['user_id'], unique=False)
+
+    op.execute("ALTER SEQUENCE activities_id_seq OWNED BY activities.id")
+    op.drop_table('activities_unpartitioned')
+
+
+# back to a plain table, the rolled up counts are lost
+def downgrade():
+    op.execute("ALTER TABLE activities RENAME TO activities_partitioned")
+    op.execute("ALTER TABLE activities_partitioned RENAME CONSTRAINT activities_pkey TO activities_partitioned_pkey")
+    op.execute("ALTER INDEX ix_activities_created_at_id RENAME TO ix_activities_partitioned_created_at_id")
+    op.execute("ALTER INDEX ix_activities_user_id RENAME TO ix_activities_partitioned_user_id")
+
+    op.execute("""
+        CREATE TABLE activities (
+            id INTEGER NOT NULL DEFAULT nextval('activities_id_seq'),
+            activity_type VARCHAR(255) NOT NULL,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            target_id INTEGER REFERENCES books (id),
+            created_at TIMESTAMP WITHOUT TIME ZONE,
+            PRIMARY KEY (id)
+        )
+    """)
+    op.execute("""
+        INSERT INTO activities (id, activity_type, user_id, target_id, created_at)
+        SELECT id, activity_type, user_id, target_id, created_at
+        FROM activities_partitioned
+    """)
+    op.create_index('ix_activities_created_at_id', 'activities', ['created_at', 'id'], unique=False)
+
+    op.execute("ALTER SEQUENCE activities_id_seq OWNED BY activities.id")
+    op.drop_table('activities_partitioned')
+    op.drop_table('activity_daily_counts')
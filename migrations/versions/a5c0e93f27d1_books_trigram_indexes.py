@@ -0,0 +1,31 @@
+"""books trigram indexes
+
+Revision ID: a5c0e93f27d1
+Revises: 7d21f4b8c6e0
+Create Date: 2026-01-09 16:25:48.204611
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5c0e93f27d1'
+down_revision = '7d21f4b8c6e0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.create_index('ix_books_title_trgm', ['title'], unique=False, postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+        batch_op.create_index('ix_books_author_trgm', ['author'], unique=False, postgresql_using='gin', postgresql_ops={'author': 'gin_trgm_ops'})
+
+
+def downgrade():
+    # the extension is left installed, other objects may depend on it
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_index('ix_books_author_trgm', postgresql_using='gin')
+        batch_op.drop_index('ix_books_title_trgm', postgresql_using='gin')
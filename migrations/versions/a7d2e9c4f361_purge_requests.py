@@ -0,0 +1,36 @@
+"""purge requests
+
+Revision ID: a7d2e9c4f361
+Revises: e3c5a7f9b1d4
+Create Date: 2026-01-27 11:02:18.604933
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d2e9c4f361'
+down_revision = 'e3c5a7f9b1d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('purge_requested_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_users_purge_requested_at', ['purge_requested_at'], unique=False, postgresql_where=sa.text('purge_requested_at IS NOT NULL'))
+
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('purge_requested_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_books_purge_requested_at', ['purge_requested_at'], unique=False, postgresql_where=sa.text('purge_requested_at IS NOT NULL'))
+
+
+def downgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_index('ix_books_purge_requested_at', postgresql_where=sa.text('purge_requested_at IS NOT NULL'))
+        batch_op.drop_column('purge_requested_at')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_purge_requested_at', postgresql_where=sa.text('purge_requested_at IS NOT NULL'))
+        batch_op.drop_column('purge_requested_at')
@@ -0,0 +1,30 @@
+"""overdue loans counter
+
+Revision ID: b8e4f0a2c6d3
+Revises: a7d2e9c4f361
+Create Date: 2026-10-18 10:42:17.583920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4f0a2c6d3'
+down_revision = 'a7d2e9c4f361'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # same count as `flask stats rebuild`
+    op.execute("""
+        INSERT INTO stats_counters (period, name, shard, value)
+        SELECT 'total', 'overdue_loans', 0, COUNT(*) FROM borrowings
+        WHERE returned_at IS NULL AND overdue_at IS NOT NULL
+        ON CONFLICT (period, name, shard) DO UPDATE SET value = excluded.value
+    """)
+
+
+def downgrade():
+    op.execute("DELETE FROM stats_counters WHERE period = 'total' AND name = 'overdue_loans'")
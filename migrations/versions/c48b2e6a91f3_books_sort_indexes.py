@@ -0,0 +1,44 @@
+"""books sort indexes
+
+Revision ID: c48b2e6a91f3
+Revises: a5c0e93f27d1
+Create Date: 2026-01-12 10:03:51.640982
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c48b2e6a91f3'
+down_revision = 'a5c0e93f27d1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('borrow_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute("""
+        UPDATE books
+        SET borrow_count = (
+            SELECT COUNT(*) FROM borrowings
+            WHERE borrowings.book_id = books.id
+        )
+    """)
+
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.create_index('ix_books_created_at_id', ['created_at', 'id'], unique=False)
+        batch_op.create_index('ix_books_title_id', ['title', 'id'], unique=False)
+        batch_op.create_index('ix_books_author_id', ['author', 'id'], unique=False)
+        batch_op.create_index('ix_books_borrow_count_id', ['borrow_count', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_index('ix_books_borrow_count_id')
+        batch_op.drop_index('ix_books_author_id')
+        batch_op.drop_index('ix_books_title_id')
+        batch_op.drop_index('ix_books_created_at_id')
+        batch_op.drop_column('borrow_count')
@@ -0,0 +1,77 @@
+"""foreign key indexes
+
+Revision ID: d94b1f6e2a38
+Revises: 8b3f6c1e5a27
+Create Date: 2026-01-19 11:26:04.518930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd94b1f6e2a38'
+down_revision = '8b3f6c1e5a27'
+branch_labels = None
+depends_on = None
+
+
+# (name, table, columns, options), all built without blocking writes
+INDEXES = [
+    # a user's or a book's whole history, and the foreign key checks
+    # when a user or a book is deleted
+    ('ix_borrowings_user_id', 'borrowings', ['user_id'], {}),
+    ('ix_borrowings_book_id', 'borrowings', ['book_id'], {}),
+    # who has a book out right now
+    ('ix_borrowings_book_id_active', 'borrowings', ['book_id'], {'postgresql_where': sa.text('returned_at IS NULL')}),
+    # a book is favorited once per user, also serves the user's list
+    ('ix_favorites_user_id_book_id', 'favorites', ['user_id', 'book_id'], {'unique': True}),
+    ('ix_favorites_book_id', 'favorites', ['book_id'], {}),
+]
+
+
+def _drop_invalid(name):
+    # a concurrent build that failed leaves an invalid index behind
+    invalid = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_index WHERE indexrelid = to_regclass(:name) AND NOT indisvalid"
+    ), {'name': name}).scalar()
+    if invalid:
+        op.drop_index(name, postgresql_concurrently=True)
+
+
+def upgrade():
+    # the unique index can't be built over duplicate favorites, keep the oldest
+    op.execute("""
+        DELETE FROM favorites duplicate
+        USING favorites kept
+        WHERE duplicate.user_id = kept.user_id
+          AND duplicate.book_id = kept.book_id
+          AND duplicate.id > kept.id
+    """)
+
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            _drop_invalid(name)
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **options)
+
+        # a partitioned table can't be indexed concurrently: create the
+        # parent index empty, build one per partition and attach them
+        op.execute("CREATE INDEX IF NOT EXISTS ix_activities_target_id ON ONLY activities (target_id)")
+        partitions = op.get_bind().execute(sa.text(
+            "SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'activities'::regclass"
+        )).scalars().all()
+        for partition in partitions:
+            name = f"{partition}_target_id_idx"
+            _drop_invalid(name)
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {partition} (target_id)")
+            op.execute(f"ALTER INDEX ix_activities_target_id ATTACH PARTITION {name}")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        # drops the partition indexes along with it
+        op.drop_index('ix_activities_target_id', table_name='activities')
+
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,56 @@
+"""overdue sweeper
+
+Revision ID: e3c5a7f9b1d4
+Revises: d94b1f6e2a38
+Create Date: 2026-01-20 09:14:47.382016
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3c5a7f9b1d4'
+down_revision = 'd94b1f6e2a38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('overdue_loans', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('borrowings', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('overdue_at', sa.DateTime(), nullable=True))
+
+    # loans already overdue are marked here, without OVERDUE activities,
+    # so nobody can borrow past them before the first sweep
+    op.execute("""
+        UPDATE borrowings SET overdue_at = now()
+        WHERE returned_at IS NULL AND due_at < now()
+    """)
+    op.execute("""
+        UPDATE users SET overdue_loans = overdue.count
+        FROM (
+            SELECT user_id, count(*) AS count FROM borrowings
+            WHERE returned_at IS NULL AND overdue_at IS NOT NULL
+            GROUP BY user_id
+        ) AS overdue
+        WHERE users.id = overdue.user_id
+    """)
+
+    with op.batch_alter_table('borrowings', schema=None) as batch_op:
+        batch_op.drop_index('ix_borrowings_due_at_active', postgresql_where=sa.text('returned_at IS NULL'))
+        batch_op.create_index('ix_borrowings_due_at_pending', ['due_at'], unique=False, postgresql_where=sa.text('returned_at IS NULL AND overdue_at IS NULL'))
+        batch_op.create_index('ix_borrowings_overdue', ['borrowed_at', 'id'], unique=False, postgresql_where=sa.text('returned_at IS NULL AND overdue_at IS NOT NULL'))
+
+
+def downgrade():
+    with op.batch_alter_table('borrowings', schema=None) as batch_op:
+        batch_op.drop_index('ix_borrowings_overdue', postgresql_where=sa.text('returned_at IS NULL AND overdue_at IS NOT NULL'))
+        batch_op.drop_index('ix_borrowings_due_at_pending', postgresql_where=sa.text('returned_at IS NULL AND overdue_at IS NULL'))
+        batch_op.create_index('ix_borrowings_due_at_active', ['due_at'], unique=False, postgresql_where=sa.text('returned_at IS NULL'))
+        batch_op.drop_column('overdue_at')
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('overdue_loans')
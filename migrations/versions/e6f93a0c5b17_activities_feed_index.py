@@ -0,0 +1,26 @@
+"""activities feed index
+
+Revision ID: e6f93a0c5b17
+Revises: c48b2e6a91f3
+Create Date: 2026-01-14 09:47:12.385520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6f93a0c5b17'
+down_revision = 'c48b2e6a91f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.create_index('ix_activities_created_at_id', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('activities', schema=None) as batch_op:
+        batch_op.drop_index('ix_activities_created_at_id')
@@ -0,0 +1,57 @@
+"""stats counters
+
+Revision ID: f2b7d4e8a1c6
+Revises: e6f93a0c5b17
+Create Date: 2026-01-15 11:26:40.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2b7d4e8a1c6'
+down_revision = 'e6f93a0c5b17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stats_counters',
+    sa.Column('period', sa.String(length=10), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('shard', sa.SmallInteger(), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('period', 'name', 'shard')
+    )
+
+    with op.batch_alter_table('borrowings', schema=None) as batch_op:
+        batch_op.create_index('ix_borrowings_due_at_active', ['due_at'], unique=False, postgresql_where=sa.text('returned_at IS NULL'))
+
+    # same counts as `flask stats rebuild`
+    op.execute("""
+        INSERT INTO stats_counters (period, name, shard, value)
+        SELECT 'total', 'users', 0, COUNT(*) FROM users
+        UNION ALL SELECT 'total', 'books', 0, COUNT(*) FROM books
+        UNION ALL SELECT 'total', 'copies', 0, COALESCE(SUM(total_copies), 0) FROM books
+        UNION ALL SELECT 'total', 'available_copies', 0, COALESCE(SUM(available_copies), 0) FROM books
+        UNION ALL SELECT 'total', 'out_of_stock_books', 0, COUNT(*) FROM books WHERE available_copies <= 0
+        UNION ALL SELECT 'total', 'borrowings', 0, COUNT(*) FROM borrowings
+        UNION ALL SELECT 'total', 'active_loans', 0, COUNT(*) FROM borrowings WHERE returned_at IS NULL
+        UNION ALL
+            SELECT to_char(created_at, 'YYYY-MM-DD'), 'new_users', 0, COUNT(*)
+            FROM users WHERE created_at IS NOT NULL GROUP BY 1
+        UNION ALL
+            SELECT to_char(borrowed_at, 'YYYY-MM-DD'), 'borrowings', 0, COUNT(*)
+            FROM borrowings WHERE borrowed_at IS NOT NULL GROUP BY 1
+        UNION ALL
+            SELECT to_char(returned_at, 'YYYY-MM-DD'), 'returns', 0, COUNT(*)
+            FROM borrowings WHERE returned_at IS NOT NULL GROUP BY 1
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('borrowings', schema=None) as batch_op:
+        batch_op.drop_index('ix_borrowings_due_at_active', postgresql_where=sa.text('returned_at IS NULL'))
+
+    op.drop_table('stats_counters')
@@ -0,0 +1,149 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+import os
+import jwt
+import pytest
+
+# the suite runs against a throwaway Postgres database: every table in
+# it is dropped and created again, then emptied after each test
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+if TEST_DATABASE_URL:
+    # read by config.py, so set before the app is imported
+    os.environ["DB_URL"] = TEST_DATABASE_URL
+    os.environ.setdefault("SECRET_KEY", "test")
+    os.environ["RATELIMIT_ENABLED"] = "false"
+
+
+def pytest_collection_modifyitems(config, items):
+    if TEST_DATABASE_URL:
+        return
+
+    skip = pytest.mark.skip(reason="set TEST_DATABASE_URL to a throwaway Postgres database")
+    for item in items:
+        item.add_marker(skip)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from sqlalchemy.exc import DBAPIError
+    from app import create_app
+    from app.extentions import db
+    from app.models import Book
+    from app.repositories.activities_repository import ActivitiesRepository
+
+    app = create_app()
+    app.config["TESTING"] = True
+
+    with app.app_context():
+        db.drop_all()
+        try:
+            with db.engine.begin() as connection:
+                connection.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except DBAPIError:
+            # only the "did you mean" search needs it
+            for index in list(Book.__table__.indexes):
+                if index.name.endswith("_trgm"):
+                    Book.__table__.indexes.discard(index)
+        db.create_all()
+        ActivitiesRepository(db).ensure_partitions()
+
+    yield app
+
+
+@pytest.fixture(autouse=True)
+def ctx(app):
+    from sqlalchemy import text
+    from app.extentions import db
+    from app.auth import principal_cache
+    from app.cache import cache
+
+    with app.app_context():
+        yield
+
+        db.session.remove()
+        tables = ", ".join(table.name for table in db.metadata.sorted_tables)
+        with db.engine.begin() as connection:
+            connection.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+        principal_cache.clear()
+        cache.clear()
+
+
+@pytest.fixture
+def make_user():
+    from app.extentions import db
+    from app.repositories.users_repository import UsersRepository
+
+    def make(name="reader", is_admin=False):
+        user = UsersRepository(db).create(username=name, email=f"{name}@example.com", password=None)
+        if is_admin:
+            user.is_admin = True
+            db.session.commit()
+        return user.id
+
+    return make
+
+
+@pytest.fixture
+def make_book():
+    from app.extentions import db
+    from app.repositories.books_repository import BooksRepository
+
+    def make(title="Clean Code", copies=1):
+        return BooksRepository(db).create(
+            isbn=f"isbn-{title}",
+            title=title,
+            subtitle=None,
+            author="Robert Martin",
+            page_count=1,
+            description=None,
+            book_img=None,
+            language="en",
+            total_copies=copies,
+            publisher="Prentice Hall",
+            published_at=None
+        ).id
+
+    return make
+
+
+# borrow through the service from 8 threads at once, True per loan made
+@pytest.fixture
+def borrow(app):
+    from app.extentions import db
+    from app.routes.dependencies.deps import borrowing_service
+
+    def borrow(plan, due_at=None):
+        due_at = due_at or datetime.now(timezone.utc) + timedelta(days=1)
+
+        def one(args):
+            with app.app_context():
+                try:
+                    borrowing_service(db).create_new_borrowing(*args, due_at=due_at)
+                    return True
+                except ValueError:
+                    return False
+
+        with ThreadPoolExecutor(8) as pool:
+            return list(pool.map(one, plan))
+
+    return borrow
+
+
+@pytest.fixture
+def client_for(app):
+    from app.auth import TOKEN_COOKIE, TOKEN_ISSUER
+
+    def client(user_id=None):
+        client = app.test_client()
+        if user_id:
+            now = datetime.now(timezone.utc)
+            token = jwt.encode(
+                {"user_id": user_id, "exp": now + timedelta(hours=1), "iat": now, "iss": TOKEN_ISSUER},
+                app.config["SECRET_KEY"],
+                algorithm="HS256"
+            )
+            client.set_cookie(TOKEN_COOKIE, token)
+        return client
+
+    return client
@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import event
+
+
+@pytest.fixture
+def statements():
+    from app.extentions import db
+
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(db.engine, "before_cursor_execute", record)
+
+
+def test_catalog_page_costs_the_same_whatever_its_size(make_book, client_for, statements):
+    client = client_for()
+    make_book("Book 0")
+    statements.clear()
+    client.get("/api/books/all?per_page=50")
+    one_book = len(statements)
+
+    for i in range(1, 20):
+        make_book(f"Book {i}")
+    statements.clear()
+    assert len(client.get("/api/books/all?per_page=50").get_json()) == 20
+    assert len(statements) == one_book
+
+
+def test_available_copies_follow_borrows_and_returns(make_user, make_book, borrow):
+    from app.extentions import db
+    from app.models import Book, Borrowing
+    from app.routes.dependencies.deps import borrowing_service
+
+    book_id = make_book(copies=3)
+    borrow([(make_user(f"reader{i}"), book_id) for i in range(2)])
+    db.session.expire_all()
+    assert db.session.get(Book, book_id).available_copies == 1
+
+    borrowing_service(db).return_borrowed_book(Borrowing.query.first().id)
+    db.session.expire_all()
+    book = db.session.get(Book, book_id)
+    assert (book.total_copies, book.available_copies) == (3, 2)
+
+
+def test_total_copies_cannot_drop_below_the_loans(make_user, make_book, borrow):
+    from app.extentions import db
+    from app.routes.dependencies.deps import book_service
+
+    book_id = make_book(copies=3)
+    borrow([(make_user(f"reader{i}"), book_id) for i in range(2)])
+
+    with pytest.raises(ValueError):
+        book_service(db).update_book_by_id(book_id, {"total_copies": 1})
+
+    book = book_service(db).update_book_by_id(book_id, {"total_copies": 5})
+    assert (book.total_copies, book.available_copies) == (5, 3)
+
+
+def test_reconcile_counters_repairs_drift(app, make_user, make_book, borrow):
+    from sqlalchemy import update
+    from app.extentions import db
+    from app.models import Book
+
+    book_id = make_book(copies=2)
+    borrow([(make_user(), book_id)])
+    db.session.execute(update(Book).where(Book.id == book_id).values(available_copies=2))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["books", "reconcile-counters"])
+
+    assert "Reconciled counters for 1 book(s)" in result.output
+    db.session.expire_all()
+    assert db.session.get(Book, book_id).available_copies == 1
@@ -0,0 +1,74 @@
+def test_last_copy_goes_to_one_borrower(make_user, make_book, borrow):
+    from app.extentions import db
+    from app.models import Book, Borrowing
+
+    book_id = make_book(copies=1)
+
+    results = borrow([(make_user(f"reader{i}"), book_id) for i in range(16)])
+
+    db.session.expire_all()
+    assert results.count(True) == 1
+    assert Borrowing.query.filter_by(book_id=book_id).count() == 1
+    assert db.session.get(Book, book_id).available_copies == 0
+
+
+def test_one_copy_per_reader(make_user, make_book, borrow):
+    book_id = make_book(copies=5)
+    reader = make_user()
+
+    assert borrow([(reader, book_id)] * 4).count(True) == 1
+
+
+def test_stress_borrows_never_oversell(app):
+    result = app.test_cli_runner().invoke(
+        args=["borrowings", "stress", "--threads", "8", "--attempts", "40", "--books", "2", "--copies", "5"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "10 borrowed, 30 refused" in result.output
+    assert "No overselling" in result.output
+
+
+def test_stress_cleans_up(app):
+    from app.extentions import db
+    from app.models import Book, Borrowing, User
+
+    app.test_cli_runner().invoke(args=["borrowings", "stress", "--attempts", "10", "--copies", "2"])
+
+    db.session.expire_all()
+    assert Book.query.count() == User.query.count() == Borrowing.query.count() == 0
+
+
+def test_bulk_return_logs_each_borrower(make_user, make_book, borrow, client_for):
+    from app.extentions import db
+    from app.models import Activity, Book, Borrowing
+
+    admin_id = make_user("admin", is_admin=True)
+    readers = [make_user(f"reader{i}") for i in range(3)]
+    book_id = make_book(copies=3)
+    borrow([(reader, book_id) for reader in readers])
+    loans = [b.id for b in Borrowing.query]
+
+    response = client_for(admin_id).put("/api/borrowings/bulk-return", json={"borrowing_ids": loans + [999]})
+
+    assert response.status_code == 200
+    assert (response.get_json()["returned"], response.get_json()["failed"]) == (3, 1)
+    returns = Activity.query.filter_by(activity_type="RETURN_BOOK").all()
+    assert sorted(a.user_id for a in returns) == sorted(readers)
+    db.session.expire_all()
+    assert db.session.get(Book, book_id).available_copies == 3
+
+
+def test_active_listing_keeps_overdue_loans(app, make_user, make_book, borrow, client_for):
+    from datetime import datetime, timezone, timedelta
+
+    client = client_for()
+    borrow([(make_user("late"), make_book("Late"))], due_at=datetime.now(timezone.utc) - timedelta(days=1))
+    borrow([(make_user("on-time"), make_book("On time"))])
+    app.test_cli_runner().invoke(args=["borrowings", "sweep-overdue"])
+
+    active = client.get("/api/borrowings/active").get_json()["borrowings"]
+    assert sorted((b["book"], b["status"]) for b in active) == [("Late", "overdue"), ("On time", "active")]
+
+    filtered = client.get("/api/borrowings/all?status=active").get_json()["borrowings"]
+    assert [b["book"] for b in filtered] == ["On time"]
@@ -0,0 +1,63 @@
+import pytest
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, app, tmp_path):
+    from app.cache import cache
+
+    uri = "memory://" if request.param == "memory" else f"sqlite:///{tmp_path}/cache.sqlite3"
+    app.config.update(CACHE_ENABLED=True, CACHE_STORAGE_URI=uri)
+    cache.init_app(app)
+    yield cache
+
+    app.config["CACHE_ENABLED"] = False
+    cache.init_app(app)
+
+
+def test_book_page_is_served_from_the_cache(cache, make_book, client_for):
+    book_id = make_book()
+    client = client_for()
+
+    assert client.get(f"/api/books/{book_id}").status_code == 200
+    assert client.get(f"/api/books/{book_id}").status_code == 200
+    assert cache.metrics()["books.detail"]["hits"] == 1
+
+
+def test_borrow_drops_the_book_page_and_profile(cache, make_user, make_book, client_for):
+    book_id = make_book(copies=2)
+    reader = client_for(make_user())
+    assert reader.get(f"/api/books/{book_id}").get_json()["available_copies"] == 2
+    assert reader.get("/api/user/profile").get_json()["active_borrowings"] == []
+
+    reader.post("/api/borrowings/borrow", json={"book_id": book_id})
+
+    assert reader.get(f"/api/books/{book_id}").get_json()["available_copies"] == 1
+    assert len(reader.get("/api/user/profile").get_json()["active_borrowings"]) == 1
+
+
+def test_edit_drops_the_catalog(cache, make_book, client_for):
+    from app.extentions import db
+    from app.routes.dependencies.deps import book_service
+
+    book_id = make_book("Clean Code")
+    client = client_for()
+    assert [b["title"] for b in client.get("/api/books/all").get_json()] == ["Clean Code"]
+
+    book_service(db).update_book_by_id(book_id, {"title": "Cleaner Code"})
+
+    assert [b["title"] for b in client.get("/api/books/all").get_json()] == ["Cleaner Code"]
+    assert client.get(f"/api/books/{book_id}").get_json()["title"] == "Cleaner Code"
+
+
+def test_delete_drops_the_catalog(cache, make_book, client_for):
+    from app.extentions import db
+    from app.routes.dependencies.deps import book_service
+
+    make_book("Clean Code")
+    book_id = make_book("Refactoring")
+    client = client_for()
+    assert len(client.get("/api/books/all").get_json()) == 2
+
+    book_service(db).delete_book(book_id, mode="now")
+
+    assert [b["title"] for b in client.get("/api/books/all").get_json()] == ["Clean Code"]
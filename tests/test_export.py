@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone
+from threading import Event, Thread
+
+
+def export(app, *args):
+    result = app.test_cli_runner().invoke(args=["export", "books", *args])
+    assert result.exit_code == 0, result.output
+    return result.output.splitlines()[1:]
+
+
+def test_incremental_feed_exports_each_change_once(app, make_book):
+    app.config["EXPORT_LAG"] = 0
+    make_book("Clean Code")
+
+    assert len(export(app, "--incremental")) == 1
+    assert export(app, "--incremental") == []
+
+    make_book("Refactoring")
+    assert [row.split(",")[2] for row in export(app, "--incremental")] == ["Refactoring"]
+
+
+def test_feed_stops_before_an_open_transaction(app, make_book):
+    from sqlalchemy import text
+    from app.extentions import db
+
+    app.config["EXPORT_LAG"] = 0
+    opened, done = Event(), Event()
+    engine = db.engine
+
+    # a write whose transaction started before the export and commits after it
+    def slow_writer():
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            opened.set()
+            done.wait(5)
+            connection.execute(text(
+                "INSERT INTO books (isbn, title, author, page_count, language, total_copies, available_copies, borrow_count, publisher) "
+                "VALUES ('slow', 'Slow', 'A', 1, 'en', 1, 1, 0, 'P')"
+            ))
+            connection.commit()
+
+    writer = Thread(target=slow_writer)
+    writer.start()
+    opened.wait(5)
+    make_book("Quick")
+
+    # the open transaction holds the window back, Quick waits for the next run
+    assert export(app, "--incremental") == []
+    done.set()
+    writer.join()
+
+    assert sorted(row.split(",")[2] for row in export(app, "--incremental")) == ["Quick", "Slow"]
+
+
+def test_horizon_is_utc(app):
+    from app.extentions import db
+    from app.repositories.export_repository import ExportRepository
+
+    horizon = ExportRepository(db).horizon(0)
+
+    assert abs(horizon - datetime.now(timezone.utc).replace(tzinfo=None)) < timedelta(seconds=5)
@@ -0,0 +1,48 @@
+def revalidate(client, url, etag):
+    return client.get(url, headers={"If-None-Match": etag})
+
+
+def test_book_page_revalidates(make_book, client_for):
+    book_id = make_book()
+    client = client_for()
+
+    first = client.get(f"/api/books/{book_id}")
+    assert first.status_code == 200 and first.headers["ETag"]
+
+    cached = revalidate(client, f"/api/books/{book_id}", first.headers["ETag"])
+    assert cached.status_code == 304
+    assert cached.data == b""
+
+
+def test_book_page_changes_after_a_borrow(make_user, make_book, client_for):
+    book_id = make_book(copies=2)
+    reader = client_for(make_user())
+    etag = reader.get(f"/api/books/{book_id}").headers["ETag"]
+
+    assert reader.post("/api/borrowings/borrow", json={"book_id": book_id}).status_code == 201
+
+    fresh = revalidate(reader, f"/api/books/{book_id}", etag)
+    assert fresh.status_code == 200
+    assert fresh.get_json()["available_copies"] == 1
+
+
+def test_missing_book_is_not_cached(client_for):
+    response = client_for().get("/api/books/999")
+
+    assert response.status_code == 400
+    assert "ETag" not in response.headers
+
+
+def test_catalog_revalidates_until_a_book_is_added(make_book, client_for):
+    make_book("Clean Code")
+    client = client_for()
+
+    first = client.get("/api/books/all")
+    assert first.status_code == 200
+    assert revalidate(client, "/api/books/all", first.headers["ETag"]).status_code == 304
+
+    make_book("Refactoring")
+    fresh = revalidate(client, "/api/books/all", first.headers["ETag"])
+    assert fresh.status_code == 200
+    assert len(fresh.get_json()) == 2
+
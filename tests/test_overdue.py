@@ -0,0 +1,78 @@
+from datetime import datetime, timezone, timedelta
+
+PAST = datetime.now(timezone.utc) - timedelta(days=1)
+
+
+def overdue(client):
+    return client.get("/api/admin/stats").get_json()["borrowings"]["overdue"]
+
+
+def test_sweep_marks_loans_past_due(app, make_user, make_book, borrow):
+    from app.extentions import db
+    from app.models import Activity, User
+
+    reader = make_user()
+    borrow([(reader, make_book(f"Book {i}")) for i in range(3)], due_at=PAST)
+    borrow([(reader, make_book("Not due yet"))])
+
+    result = app.test_cli_runner().invoke(args=["borrowings", "sweep-overdue"])
+
+    assert "Marked 3 loan(s) overdue" in result.output
+    assert db.session.get(User, reader).overdue_loans == 3
+    assert Activity.query.filter_by(activity_type="OVERDUE_BOOK").count() == 3
+    assert "Marked 0" in app.test_cli_runner().invoke(args=["borrowings", "sweep-overdue"]).output
+
+
+def test_overdue_reader_cannot_borrow(app, make_user, make_book, borrow):
+    reader = make_user()
+    borrow([(reader, make_book("Late"))], due_at=PAST)
+    app.test_cli_runner().invoke(args=["borrowings", "sweep-overdue"])
+
+    assert borrow([(reader, make_book("Next"))]) == [False]
+
+
+def test_overdue_count_follows_returns_extensions_and_deletes(app, make_user, make_book, borrow, client_for):
+    from app.extentions import db
+    from app.models import Borrowing, User
+    from app.routes.dependencies.deps import book_service, borrowing_service
+
+    admin = client_for(make_user("admin", is_admin=True))
+    reader = make_user()
+    books = [make_book(f"Book {i}") for i in range(4)]
+    borrow([(reader, book_id) for book_id in books], due_at=PAST)
+    app.test_cli_runner().invoke(args=["borrowings", "sweep-overdue"])
+    assert overdue(admin) == 4
+
+    loans = [b.id for b in Borrowing.query.order_by(Borrowing.book_id)]
+    service = borrowing_service(db)
+    service.return_borrowed_book(loans[0])
+    service.return_many([loans[1]])
+    service.extend_many([loans[2]], days=7)
+    assert overdue(admin) == 1
+
+    book_service(db).delete_book(books[3], mode="now")
+    assert overdue(admin) == 0
+    db.session.expire_all()
+    assert db.session.get(User, reader).overdue_loans == 0
+
+
+def test_drifted_count_keeps_the_dashboard_in_step(app, make_user, make_book, borrow, client_for):
+    from sqlalchemy import update
+    from app.extentions import db
+    from app.models import Borrowing, User
+    from app.routes.dependencies.deps import borrowing_service
+
+    admin = client_for(make_user("admin", is_admin=True))
+    reader = make_user()
+    borrow([(reader, make_book())], due_at=PAST)
+
+    # flagged behind the counters' back, the reader's count stays 0
+    db.session.execute(update(Borrowing).values(overdue_at=PAST))
+    db.session.commit()
+    assert overdue(admin) == 0
+
+    borrowing_service(db).return_borrowed_book(Borrowing.query.one().id)
+
+    db.session.expire_all()
+    assert db.session.get(User, reader).overdue_loans == 0
+    assert overdue(admin) == 0
@@ -0,0 +1,72 @@
+from threading import Thread
+import time
+import pytest
+
+CHEAP = "pbkdf2:sha256:1000"
+
+
+@pytest.fixture
+def hasher():
+    from app.passwords import PasswordHasher
+
+    hasher = PasswordHasher()
+    hasher.method = CHEAP
+    hasher.workers = 1
+    hasher.queue_size = 1
+    yield hasher
+    hasher.shutdown()
+
+
+def test_pool_hashes_and_verifies(hasher):
+    pwhash = hasher.hash("correct horse")
+
+    assert pwhash.startswith(CHEAP)
+    assert hasher.verify(pwhash, "correct horse")
+    assert not hasher.verify(pwhash, "wrong horse")
+
+
+def test_full_queue_is_refused_at_once(hasher):
+    from app.passwords import HasherBusy
+
+    hasher.verify(hasher.hash("warm up"), "warm up")
+    slow = Thread(target=hasher.hash, args=("slow",))
+    hasher.method = "pbkdf2:sha256:2000000"
+    slow.start()
+    while hasher._slots._value:
+        time.sleep(0.001)
+
+    started = time.perf_counter()
+    with pytest.raises(HasherBusy):
+        hasher.verify("pbkdf2:sha256:1000$x$y", "correct horse")
+    assert time.perf_counter() - started < 0.1
+    slow.join()
+
+
+def test_sign_in_upgrades_an_old_hash(app, client_for):
+    from werkzeug.security import generate_password_hash
+    from app.extentions import db
+    from app.models import User
+    from app.passwords import password_hasher
+
+    client = client_for()
+    signup = client.post("/api/auth/signup", data={"username": "reader", "email": "reader@example.com", "password": "correct horse"})
+    assert signup.status_code == 201, signup.get_json()
+
+    user = User.query.filter_by(username="reader").one()
+    user.password = generate_password_hash("correct horse", CHEAP)
+    db.session.commit()
+
+    signin = client.post("/api/auth/signin", data={"username-or-email": "reader", "password": "correct horse"})
+    assert signin.status_code == 200, signin.get_json()
+    db.session.expire_all()
+    assert db.session.get(User, user.id).password.split("$", 1)[0] == password_hasher.method
+
+
+def test_bench_signin(app):
+    result = app.test_cli_runner().invoke(
+        args=["users", "bench-signin", "--workers", "0,1", "--requests", "4", "--concurrency", "2"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "workers  0" in result.output
+    assert "workers  1" in result.output
@@ -0,0 +1,51 @@
+import time
+
+
+def test_index_matches_every_word_and_a_prefix(make_book):
+    from app.search_index import CatalogIndex
+
+    for title in ("Clean Code", "Clean Architecture", "Refactoring"):
+        make_book(title)
+    index = CatalogIndex()
+    index.rebuild()
+
+    assert [b.title for b in index.search("clean arch")] == ["Clean Architecture"]
+    assert index.search("clean").total == 2
+    assert index.search().total == 3
+
+
+def test_stale_index_is_served_while_it_rebuilds(app, make_book):
+    from app.search_index import CatalogIndex
+
+    make_book("Clean Code")
+    index = CatalogIndex()
+    index.init_app(app)
+    index.enabled = True
+    index.rebuild()
+    index.max_age = 0.01
+
+    make_book("Clean Architecture")
+    time.sleep(0.02)
+    assert index.can_serve("clean")
+    assert index.search("clean").total in (1, 2)
+
+    index._refresher.join(5)
+    assert index.search("clean").total == 2
+
+
+def test_bench_search(app, make_book):
+    for title in ("Clean Code", "Clean Architecture", "Refactoring"):
+        make_book(title)
+
+    result = app.test_cli_runner().invoke(args=["books", "bench-search", "--requests", "20"])
+
+    assert result.exit_code == 0, result.output
+    assert "Index built over 3 book(s)" in result.output
+    assert "sql" in result.output and "index" in result.output
+
+
+def test_bench_search_needs_books(app):
+    result = app.test_cli_runner().invoke(args=["books", "bench-search"])
+
+    assert result.exit_code != 0
+    assert "The catalog is empty" in result.output
@@ -0,0 +1,40 @@
+from datetime import datetime, timezone, timedelta
+
+
+def dashboard(client):
+    return client.get("/api/admin/stats").get_json()
+
+
+def test_dashboard_counts_books_and_loans(make_user, make_book, borrow, client_for):
+    admin = client_for(make_user("admin", is_admin=True))
+    book_id = make_book(copies=3)
+    make_book("Refactoring", copies=1)
+    borrow([(make_user(f"reader{i}"), book_id) for i in range(3)])
+
+    stats = dashboard(admin)
+
+    assert stats["books"] == {"total": 2, "copies": 4, "available_copies": 1, "out_of_stock": 1}
+    assert stats["users"]["total"] == 4
+    assert stats["borrowings"]["active"] == stats["borrowings"]["borrowed_today"] == 3
+
+
+def test_counters_match_a_rebuild(app, make_user, make_book, borrow, client_for):
+    from app.extentions import db
+    from app.models import Borrowing
+    from app.routes.dependencies.deps import borrowing_service
+
+    admin = client_for(make_user("admin", is_admin=True))
+    book_id = make_book(copies=4)
+    borrow(
+        [(make_user(f"reader{i}"), book_id) for i in range(6)],
+        due_at=datetime.now(timezone.utc) - timedelta(days=1)
+    )
+    app.test_cli_runner().invoke(args=["borrowings", "sweep-overdue"])
+    borrowing_service(db).return_borrowed_book(Borrowing.query.first().id)
+
+    counted = dashboard(admin)
+    app.test_cli_runner().invoke(args=["stats", "rebuild"])
+
+    assert dashboard(admin) == counted
+    assert counted["books"]["available_copies"] == 1
+    assert counted["borrowings"]["active"] == counted["borrowings"]["overdue"] == 3
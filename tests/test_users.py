@@ -0,0 +1,52 @@
+import pytest
+
+
+# queues every delete, the rows stay until the test purges them
+class QueueOnly:
+    threshold = 1
+
+    def wake(self):
+        pass
+
+
+@pytest.fixture
+def users():
+    from app.auth import principal_cache
+    from app.cache import cache
+    from app.extentions import db
+    from app.passwords import password_hasher
+    from app.repositories.users_repository import UsersRepository
+    from app.services.user_service import UserService
+
+    return UserService(UsersRepository(db), principal_cache, password_hasher, QueueOnly(), cache)
+
+
+def test_queued_delete_signs_the_user_out(users, make_user, client_for):
+    from app.auth import principal_cache
+
+    admin_id = make_user("admin", is_admin=True)
+    client = client_for(admin_id)
+    assert client.get("/api/auth/me").status_code == 200
+    assert principal_cache.is_admin(admin_id)
+
+    assert users.delete_user_by_id(admin_id, mode="background") == "queued"
+
+    assert not principal_cache.is_admin(admin_id)
+    assert client.get("/api/auth/me").status_code == 401
+    assert client.post("/api/user/create-with-admin").status_code == 401
+
+
+def test_queued_user_is_missing(users, make_user, client_for):
+    user_id = make_user("reader")
+    users.delete_user_by_id(user_id, mode="background")
+
+    signin = client_for().post("/api/auth/signin", data={"username-or-email": "reader", "password": "secret"})
+    assert signin.status_code == 400
+    assert "No account found" in signin.get_json()["msg"]
+
+    with pytest.raises(ValueError, match="User not found"):
+        users.get_user_by_id(user_id)
+
+    # the purge still finds it
+    assert users.purge_pending() == 1
+    assert users.repo.by_id(user_id) is None